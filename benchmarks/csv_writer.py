@@ -0,0 +1,73 @@
+# Compares the core CSV renderer with the runner batch CSV renderer on synthetic rows:
+#
+#   python benchmarks/csv_writer.py --rows 5000000 --batch-size 1000
+#
+# Rows are generated upfront so only the writers are timed. Both renderers must produce
+# byte-identical files, the benchmark fails otherwise.
+import argparse
+import hashlib
+import tempfile
+import time
+from datetime import datetime
+
+from connect.reports.datamodels import Account, Report
+from connect.reports.renderers import CSVRenderer
+
+from executor.batches import to_batches
+from executor.renderers import BatchCSVRenderer
+
+
+def generate_rows(count):
+    for idx in range(count):
+        yield (
+            f'PR-{idx:010d}',
+            'approved' if idx % 3 else 'pending',
+            idx,
+            idx * 1.25,
+            None if idx % 7 else 'has "quotes"; and separators',
+            datetime(2023, 1, 1 + idx % 28).isoformat(),
+        )
+
+
+def measure(renderer, data, output_file):
+    started = time.perf_counter()
+    output_file = renderer.generate_report(data, output_file)
+    elapsed = time.perf_counter() - started
+    digest = hashlib.sha256()
+    with open(output_file, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return elapsed, digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    options = parser.parse_args()
+
+    args = (
+        'benchmark',
+        '.',
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {}),
+    )
+    rows = list(generate_rows(options.rows))
+    batches = list(to_batches(rows, options.batch_size))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        core_time, core_digest = measure(CSVRenderer(*args), iter(rows), f'{tmpdir}/core')
+        batch_time, batch_digest = measure(
+            BatchCSVRenderer(*args),
+            iter(batches),
+            f'{tmpdir}/batch',
+        )
+
+    if core_digest != batch_digest:
+        raise SystemExit('The batch CSV renderer output differs from the core renderer.')
+    print(f'core:  {core_time:.3f}s ({options.rows / core_time:,.0f} rows/s)')
+    print(f'batch: {batch_time:.3f}s ({options.rows / batch_time:,.0f} rows/s)')
+    print(f'speedup: {core_time / batch_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# Compares the JSON decoders available to the runner on synthetic Connect collection pages:
+#
+#   python benchmarks/json_decoder.py --pages 200 --page-size 500
+#
+# Pages mimic subscription assets as returned with the default report client limit. Every
+# decoder must produce the same objects as the stdlib json module, the benchmark fails otherwise.
+# The cyclic garbage collector is paused while timing, collections triggered by the allocated
+# objects cost the same for every decoder; pass --gc to keep it enabled.
+import argparse
+import gc
+import json
+import time
+
+from executor.decoding import DECODERS
+
+
+def generate_asset(idx):
+    return {
+        'id': f'AS-{idx // 10000:04d}-{idx % 10000:04d}-{idx % 7919:04d}',
+        'status': 'active' if idx % 5 else 'suspended',
+        'external_id': str(100000 + idx),
+        'external_uid': f'{idx:08x}-7d2e-4f1a-9c3b-0242ac120002',
+        'product': {
+            'id': f'PRD-{idx % 97:03d}-000-001',
+            'name': f'Cloud Product {idx % 97}',
+            'icon': '/media/VA-000-001/PRD-000-000-001/media/icon.png',
+            'status': 'published',
+        },
+        'connection': {
+            'id': f'CT-{idx % 13:04d}-000-0001',
+            'type': 'production',
+            'provider': {'id': 'PA-000-001', 'name': 'Provider'},
+            'vendor': {'id': 'VA-000-001', 'name': 'Vendor'},
+            'hub': {'id': 'HB-0000-0001', 'name': 'Hub'},
+        },
+        'items': [
+            {
+                'id': f'PRD_000_000_001_{item:04d}',
+                'global_id': f'PRD-000-000-001-{item:04d}',
+                'mpn': f'MPN-{item}',
+                'quantity': str((idx + item) % 100),
+                'old_quantity': '0',
+                'item_type': 'Reservation',
+                'period': 'Monthly',
+                'type': 'Users',
+                'display_name': f'Item {item}',
+            }
+            for item in range(idx % 4 + 1)
+        ],
+        'params': [
+            {
+                'id': f'param_{param}',
+                'name': f'param_{param}',
+                'type': 'text',
+                'value': f'value {idx} {param}',
+                'phase': 'ordering',
+                'constraints': {'hidden': False, 'required': param % 2 == 0, 'unique': False},
+            }
+            for param in range(6)
+        ],
+        'tiers': {
+            'customer': {
+                'id': f'TA-{idx % 1000:04d}-0000-0001',
+                'name': f'Customer {idx}',
+                'external_id': str(idx),
+                'contact_info': {
+                    'address_line1': 'Calle Principal 1',
+                    'city': 'Madrid',
+                    'country': 'ES',
+                    'postal_code': '28001',
+                    'contact': {'email': f'customer{idx}@example.com', 'first_name': 'Jane'},
+                },
+            },
+            'tier1': {'id': 'TA-0000-0000-0002', 'name': 'Reseller', 'external_id': '2'},
+        },
+        'marketplace': {'id': 'MP-00001', 'name': 'Marketplace'},
+        'contract': {'id': 'CRD-00000-00000-00001', 'name': 'Contract'},
+        'events': {
+            'created': {'at': '2023-01-03T10:00:00+00:00'},
+            'updated': {'at': '2023-02-01T11:30:00+00:00', 'by': {'id': 'SU-000-000-001'}},
+        },
+        'billing': {'period': {'delta': 1.0, 'uom': 'monthly'}, 'price': idx * 0.15},
+    }
+
+
+def generate_pages(count, size):
+    return [
+        json.dumps([generate_asset(page * size + idx) for idx in range(size)]).encode('utf-8')
+        for page in range(count)
+    ]
+
+
+def available_decoders():
+    for name, factory in DECODERS.items():
+        try:
+            decode, _ = factory()
+        except ImportError:
+            print(f'{name}: not installed, skipped')
+            continue
+        yield name, decode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--gc', action='store_true')
+    args = parser.parse_args()
+
+    pages = generate_pages(args.pages, args.page_size)
+    megabytes = sum(len(page) for page in pages) / 1024 / 1024
+    expected = [json.loads(page) for page in pages[:5]]
+    print(f'{args.pages} pages of {args.page_size} assets, {megabytes:.1f} MB')
+
+    timings = {}
+    for name, decode in available_decoders():
+        gc.collect()
+        if not args.gc:
+            gc.disable()
+        started = time.perf_counter()
+        for page in pages:
+            decode(page)
+        timings[name] = time.perf_counter() - started
+        gc.enable()
+        if [decode(page) for page in pages[:5]] != expected:
+            raise SystemExit(f'{name} decoded different objects than json.')
+        print(
+            f'{name}: {timings[name]:.2f}s, {megabytes / timings[name]:.1f} MB/s, '
+            f'{args.pages * args.page_size / timings[name]:.0f} resources/s',
+        )
+
+    for name, timing in timings.items():
+        if name != 'json':
+            print(f'{name} speedup over json: {timings["json"] / timing:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Measures the time from `docker run` to the first `get_report` call of the executor:
+#
+#   python benchmarks/startup.py connect-reports-runner:old connect-reports-runner:new --runs 5
+#
+# A local HTTP server plays the Connect API, the executor runs with host networking against it.
+import argparse
+import statistics
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPORT_ID = 'REP-000-000-0000-000000'
+
+
+class ConnectStub(BaseHTTPRequestHandler):
+    first_get = None
+
+    def do_GET(self):
+        if ConnectStub.first_get is None and self.path.endswith(f'/reports/{REPORT_ID}'):
+            ConnectStub.first_get = time.monotonic()
+        self._reply(404)
+
+    def do_POST(self):
+        self._reply(200)
+
+    def _reply(self, status):
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(image, port):
+    ConnectStub.first_get = None
+    started = time.monotonic()
+    subprocess.run(
+        [
+            'docker', 'run', '--rm', '--network', 'host',
+            '-e', f'REPORT_ID={REPORT_ID}',
+            '-e', 'CLIENT_TOKEN=ApiKey SU-000:benchmark',
+            '-e', f'API_ENDPOINT=http://127.0.0.1:{port}/public/v1',
+            image, 'python', '-m', 'executor.executor',
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if ConnectStub.first_get is None:
+        raise RuntimeError(f'{image} never requested the report.')
+    return ConnectStub.first_get - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    options = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', options.port), ConnectStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for image in options.images:
+            timings = [measure(image, options.port) for _ in range(options.runs)]
+            print(
+                f'{image}: median {statistics.median(timings):.3f}s '
+                f'min {min(timings):.3f}s max {max(timings):.3f}s',
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
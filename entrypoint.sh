@@ -23,6 +23,9 @@ if [[ "$@" == *"cextrun"* ]]; then
         echo "Error switching to commit"
         exit 1
     fi
+
+    PYTHON=$(python -m executor.dependencies ${EXTENSION_DIR})
+    ${PYTHON:-python} -m executor.warmup ${EXTENSION_DIR} || echo "Error warming up report repository"
 fi
 
 exec "$@"
\ No newline at end of file
@@ -0,0 +1,88 @@
+import inspect
+import os
+from functools import partial
+from itertools import islice
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_batch_size():
+    return int(os.getenv('REPORTS_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+
+def accepts_batches(renderer):
+    return getattr(renderer, 'accepts_batches', False)
+
+
+def batch_rows(batch):
+    if isinstance(batch, dict):
+        return list(zip(*batch.values()))
+    return batch
+
+
+def normalize_batches(batches):
+    for batch in batches:
+        yield batch_rows(batch)
+
+
+async def normalize_batches_async(batches):
+    if not inspect.isasyncgen(batches):
+        for batch in batches:
+            yield batch_rows(batch)
+        return
+    async for batch in batches:
+        yield batch_rows(batch)
+
+
+def from_batches(batches):
+    for batch in batches:
+        yield from batch_rows(batch)
+
+
+async def from_batches_async(batches):
+    if not inspect.isasyncgen(batches):
+        for row in from_batches(batches):
+            yield row
+        return
+    async for batch in batches:
+        for row in batch_rows(batch):
+            yield row
+
+
+def to_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def to_batches_async(rows, batch_size=DEFAULT_BATCH_SIZE):
+    if not inspect.isasyncgen(rows):
+        for batch in to_batches(rows, batch_size):
+            yield batch
+        return
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_batch_processor(yields_batches, renderer):
+    if yields_batches:
+        if accepts_batches(renderer):
+            return normalize_batches, normalize_batches_async
+        return from_batches, from_batches_async
+    if accepts_batches(renderer):
+        batch_size = get_batch_size()
+        return (
+            partial(to_batches, batch_size=batch_size),
+            partial(to_batches_async, batch_size=batch_size),
+        )
+    return None
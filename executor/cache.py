@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+
+logger = logging.getLogger('executor')
+
+DEFAULT_CACHE_TTL = 600
+DEFAULT_CACHE_MAX_SIZE = 1024 * 1024 * 1024
+# Parameter types whose selected values are a set, their order doesn't change the report. Other
+# lists, like an object parameter, may be ordered and are kept as they are.
+SET_PARAMETER_TYPES = ('checkbox',)
+SELECTION_PARAMETER_TYPES = ('product', 'marketplace', 'hub')
+
+
+def get_cache_dir():
+    return os.getenv('REPORTS_RESULT_CACHE_DIR')
+
+
+def get_cache_ttl():
+    return int(os.getenv('REPORTS_RESULT_CACHE_TTL', DEFAULT_CACHE_TTL))
+
+
+def get_cache_max_size():
+    return int(os.getenv('REPORTS_RESULT_CACHE_MAX_SIZE', DEFAULT_CACHE_MAX_SIZE))
+
+
+def _sorted(values):
+    return sorted(values, key=lambda item: json.dumps(item, sort_keys=True, default=str))
+
+
+def _canonical(value, parameter_type):
+    if parameter_type in SET_PARAMETER_TYPES and isinstance(value, list):
+        return _sorted(value)
+    if (
+        parameter_type in SELECTION_PARAMETER_TYPES
+        and isinstance(value, dict)
+        and isinstance(value.get('choices'), list)
+    ):
+        return dict(value, choices=_sorted(value['choices']))
+    return value
+
+
+def get_cache_key(connect_report, report_definition, parameters):
+    template = connect_report['template']
+    commit = template.get('repository', {}).get('git', {}).get('commit')
+    if not commit:
+        return None
+    parameter_types = {
+        parameter['id']: parameter.get('type') for parameter in connect_report.get('parameters', [])
+    }
+    data = {
+        'commit': commit,
+        'template': template['id'],
+        'entrypoint': report_definition.entrypoint,
+        'renderer': connect_report['renderer'],
+        'owner': connect_report['owner']['id'],
+        'parameters': {
+            name: _canonical(value, parameter_types.get(name))
+            for name, value in parameters.items()
+        },
+    }
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode('utf-8'),
+    ).hexdigest()
+
+
+def _get_entry_dir(cache_dir, cache_key):
+    return os.path.join(cache_dir, cache_key)
+
+
+def _get_entry(entry_dir):
+    try:
+        names = os.listdir(entry_dir)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    for name in names:
+        path = os.path.join(entry_dir, name)
+        if name.endswith('.tmp'):
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        return stat.st_mtime, stat.st_size, path
+
+
+def _list_entries(cache_dir):
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = _get_entry(os.path.join(cache_dir, name))
+        if entry:
+            entries.append(entry)
+    return sorted(entries)
+
+
+def _remove_entry(path):
+    os.remove(path)
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def _is_expired(mtime):
+    return time.time() - mtime > get_cache_ttl()
+
+
+def lookup_result(cache_key):
+    cache_dir = get_cache_dir()
+    if not cache_key or not cache_dir:
+        return None
+    entry = _get_entry(_get_entry_dir(cache_dir, cache_key))
+    if not entry:
+        return None
+    mtime, _, path = entry
+    if _is_expired(mtime):
+        _remove_entry(path)
+        return None
+    return path
+
+
+def evict_results(cache_dir):
+    max_size = get_cache_max_size()
+    entries = []
+    for mtime, size, path in _list_entries(cache_dir):
+        if _is_expired(mtime):
+            _remove_entry(path)
+        else:
+            entries.append((size, path))
+    total_size = sum(size for size, _ in entries)
+    for size, path in entries:
+        if total_size <= max_size:
+            break
+        _remove_entry(path)
+        total_size -= size
+
+
+def store_result(cache_key, result):
+    cache_dir = get_cache_dir()
+    if not cache_key or not cache_dir:
+        return None
+    entry_dir = _get_entry_dir(cache_dir, cache_key)
+    os.makedirs(entry_dir, exist_ok=True)
+    cached_file = os.path.join(entry_dir, os.path.basename(result))
+    tmp_file = f'{cached_file}.{os.getpid()}.tmp'
+    shutil.copyfile(result, tmp_file)
+    os.replace(tmp_file, cached_file)
+    evict_results(cache_dir)
+    return cached_file
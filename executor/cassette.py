@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import fcntl
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from http import HTTPStatus
+
+import httpx
+import requests
+from connect.client import AsyncConnectClient, ConnectClient
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from executor.decoding import DECODING_CLIENTS, DecodingAsyncConnectClient, DecodingConnectClient
+from executor.exceptions import RunnerException
+
+
+CASSETTE_MODES = ('record', 'replay')
+# Bodies are stored decoded, the transport headers of the original response no longer apply.
+SKIPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+
+def _recorded_headers(headers):
+    return {
+        name: value for name, value in headers.items() if name.lower() not in SKIPPED_HEADERS
+    }
+
+
+class Cassette:
+    def __init__(self, path, mode='replay', latency=None):
+        if mode not in CASSETTE_MODES:
+            raise RunnerException(f'Unknown cassette mode {mode}.')
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._interactions = None
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def record(self, method, url, status, headers, body, elapsed):
+        line = json.dumps(
+            {
+                'method': method.upper(),
+                'url': str(url),
+                'status': status,
+                'headers': _recorded_headers(headers),
+                'body': base64.b64encode(body).decode(),
+                'elapsed': elapsed,
+            },
+        )
+        # Every record is its own gzip member, an interrupted run leaves a readable cassette. The
+        # file lock keeps the members of partition workers recording at once from interleaving.
+        with self._lock, open(self.path, 'ab') as raw:
+            fcntl.flock(raw, fcntl.LOCK_EX)
+            with gzip.GzipFile(fileobj=raw, mode='ab') as fp:
+                fp.write(f'{line}\n'.encode())
+
+    def _load(self):
+        interactions = defaultdict(deque)
+        with gzip.open(self.path, 'rt') as fp:
+            for line in fp:
+                interaction = json.loads(line)
+                interactions[(interaction['method'], interaction['url'])].append(interaction)
+        return interactions
+
+    def play(self, method, url):
+        key = (method.upper(), str(url))
+        with self._lock:
+            if self._interactions is None:
+                self._interactions = self._load()
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise RunnerException(f'No recorded response for {key[0]} {key[1]}.')
+            # The last response of a request is replayed for any further identical request.
+            interaction = interactions.popleft() if len(interactions) > 1 else interactions[0]
+        return (
+            interaction['status'],
+            interaction['headers'],
+            base64.b64decode(interaction['body']),
+            self.get_delay(interaction),
+        )
+
+    def get_delay(self, interaction):
+        if self.latency == 'recorded':
+            return interaction['elapsed']
+        return float(self.latency or 0)
+
+
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, *args, **kwargs):
+        if self.cassette.recording:
+            started = time.monotonic()
+            response = super().send(request, *args, **kwargs)
+            self.cassette.record(
+                request.method,
+                request.url,
+                response.status_code,
+                response.headers,
+                response.content,
+                time.monotonic() - started,
+            )
+            return response
+        status, headers, body, delay = self.cassette.play(request.method, request.url)
+        time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = body
+        return response
+
+
+class CassetteAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.transport = httpx.AsyncHTTPTransport() if cassette.recording else None
+
+    async def handle_async_request(self, request):
+        if self.cassette.recording:
+            started = time.monotonic()
+            response = await self.transport.handle_async_request(request)
+            body = await response.aread()
+            await response.aclose()
+            status, headers = response.status_code, _recorded_headers(response.headers)
+            self.cassette.record(
+                request.method,
+                request.url,
+                status,
+                headers,
+                body,
+                time.monotonic() - started,
+            )
+        else:
+            status, headers, body, delay = self.cassette.play(request.method, request.url)
+            await asyncio.sleep(delay)
+        return httpx.Response(status, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        if self.transport:
+            await self.transport.aclose()
+
+
+class CassetteConnectClient(DecodingConnectClient):
+    def __init__(self, *args, cassette=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cassette = cassette
+
+    @property
+    def session(self):
+        if not hasattr(self._thread_locals, 'session'):
+            session = requests.Session()
+            adapter = CassetteAdapter(self.cassette)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._thread_locals.session = session
+        return self._thread_locals.session
+
+
+class CassetteAsyncConnectClient(DecodingAsyncConnectClient):
+    def __init__(self, *args, cassette=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cassette = cassette
+
+    @property
+    def session(self):
+        value = self._session.get()
+        if not value:
+            value = httpx.AsyncClient(transport=CassetteAsyncTransport(self.cassette))
+            self._session.set(value)
+        return value
+
+
+CASSETTE_CLIENTS = {
+    ConnectClient: CassetteConnectClient,
+    AsyncConnectClient: CassetteAsyncConnectClient,
+}
+
+
+@lru_cache(maxsize=None)
+def open_cassette(path, mode, latency):
+    return Cassette(path, mode, latency)
+
+
+def get_cassette():
+    path = os.getenv('REPORTS_CASSETTE')
+    if not path:
+        return None
+    return open_cassette(
+        path,
+        os.getenv('REPORTS_CASSETTE_MODE', 'replay'),
+        os.getenv('REPORTS_CASSETTE_LATENCY'),
+    )
+
+
+def create_client(client_class, **kwargs):
+    cassette = get_cassette()
+    if not cassette:
+        return DECODING_CLIENTS.get(client_class, client_class)(**kwargs)
+    return CASSETTE_CLIENTS[client_class](cassette=cassette, **kwargs)
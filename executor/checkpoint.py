@@ -0,0 +1,167 @@
+import inspect
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+
+
+logger = logging.getLogger('executor')
+
+DEFAULT_CHECKPOINT_BATCH_SIZE = 1000
+
+_active = None
+
+
+class Checkpoint:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+def get_checkpoint_dir():
+    return os.getenv('REPORTS_CHECKPOINT_DIR')
+
+
+class ReportCheckpoint:
+    def __init__(self, directory, batch_size=DEFAULT_CHECKPOINT_BATCH_SIZE, batches=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.batches = batches
+        self.journaling = None
+        self._ignored = False
+        self._buffer = []
+        self._connection = sqlite3.connect(
+            os.path.join(directory, 'checkpoint.sqlite'),
+            check_same_thread=False,
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=FULL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS rows (row BLOB NOT NULL, size INTEGER NOT NULL)',
+        )
+        self._connection.execute('CREATE TABLE IF NOT EXISTS cursor (value BLOB NOT NULL)')
+        self._connection.commit()
+        self.resumed_rows = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM rows',
+        ).fetchone()[0]
+        cursor = self._connection.execute('SELECT value FROM cursor').fetchone()
+        self.cursor = pickle.loads(cursor[0]) if cursor else None
+
+    def _append(self, row):
+        self._buffer.append(
+            (
+                pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL),
+                len(row) if self.batches else 1,
+            ),
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._write()
+
+    def _write(self):
+        if self._buffer:
+            self._connection.executemany(
+                'INSERT INTO rows (row, size) VALUES (?, ?)',
+                self._buffer,
+            )
+            self._buffer = []
+
+    def save(self, cursor):
+        self._write()
+        self._connection.execute('DELETE FROM cursor')
+        self._connection.execute(
+            'INSERT INTO cursor (value) VALUES (?)',
+            (pickle.dumps(cursor, protocol=pickle.HIGHEST_PROTOCOL),),
+        )
+        self._connection.commit()
+        self.cursor = cursor
+
+    def _resumed(self):
+        cursor = self._connection.execute('SELECT row FROM rows ORDER BY rowid')
+        try:
+            while True:
+                batch = cursor.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                for (row,) in batch:
+                    yield pickle.loads(row)
+        finally:
+            cursor.close()
+
+    # Only reports yielding a Checkpoint before their first row are journaled, rows yielded
+    # before it could not be replayed on resume.
+    def _track_item(self, item):
+        if isinstance(item, Checkpoint):
+            if self.journaling is None:
+                self.journaling = True
+            if self.journaling:
+                self.save(item.cursor)
+            elif not self._ignored:
+                logger.warning(
+                    'Checkpoint markers yielded after the first row are ignored, the report '
+                    'cannot be resumed.',
+                )
+                self._ignored = True
+            return False
+        if self.journaling is None:
+            self.journaling = False
+        if self.journaling:
+            self._append(item)
+        return True
+
+    def track(self, data):
+        yield from self._resumed()
+        for item in data:
+            if self._track_item(item):
+                yield item
+
+    async def track_async(self, data):
+        for row in self._resumed():
+            yield row
+        if not inspect.isasyncgen(data):
+            for item in data:
+                if self._track_item(item):
+                    yield item
+            return
+        async for item in data:
+            if self._track_item(item):
+                yield item
+
+    def remove(self):
+        global _active
+        if _active is self:
+            _active = None
+        self._connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def open_checkpoint(report_id, batches=False):
+    global _active
+    checkpoint_dir = get_checkpoint_dir()
+    if not checkpoint_dir:
+        return None
+    _active = ReportCheckpoint(os.path.join(checkpoint_dir, report_id), batches=batches)
+    return _active
+
+
+def discard_checkpoint():
+    if _active:
+        _active.remove()
+
+
+def get_resume_cursor():
+    return _active.cursor if _active else None
+
+
+def skip_checkpoints(data):
+    return (item for item in data if not isinstance(item, Checkpoint))
+
+
+async def skip_checkpoints_async(data):
+    if not inspect.isasyncgen(data):
+        for item in skip_checkpoints(data):
+            yield item
+        return
+    async for item in data:
+        if not isinstance(item, Checkpoint):
+            yield item
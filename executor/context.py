@@ -0,0 +1,26 @@
+from executor.utils import get_default_reports_dir, get_report_client
+
+
+class ExecutionContext:
+    def __init__(self, report_env, control_client, report=None, report_definition=None):
+        self.report_env = report_env
+        self.control_client = control_client
+        self.report = report
+        self.report_definition = report_definition
+        self.reports_dir = get_default_reports_dir()
+        self.projection = None
+        self._report_clients = {}
+
+    @property
+    def report_id(self):
+        return self.report_env['report_id']
+
+    def get_report_client(self, is_async=False):
+        if is_async not in self._report_clients:
+            client = get_report_client(self.report_env, is_async)
+            if self.projection:
+                # Async clients refetch projected out fields through the sync client.
+                fallback = self.get_report_client() if is_async else client
+                self.projection.install(client, fallback)
+            self._report_clients[is_async] = client
+        return self._report_clients[is_async]
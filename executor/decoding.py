@@ -0,0 +1,100 @@
+import json
+import os
+from functools import lru_cache
+
+from connect.client import AsyncConnectClient, ConnectClient
+
+from executor.exceptions import RunnerException
+from executor.metrics import track_api_call
+
+
+DECODER_PREFERENCE = ('orjson', 'msgspec')
+
+
+def _orjson():
+    import orjson
+
+    return orjson.loads, orjson.JSONDecodeError
+
+
+def _msgspec():
+    import msgspec
+
+    return msgspec.json.decode, msgspec.DecodeError
+
+
+def _stdlib():
+    return json.loads, json.JSONDecodeError
+
+
+DECODERS = {
+    'orjson': _orjson,
+    'msgspec': _msgspec,
+    'json': _stdlib,
+}
+
+
+def get_json_decoder_name():
+    return os.getenv('REPORTS_JSON_DECODER', 'auto').lower()
+
+
+@lru_cache(maxsize=None)
+def get_json_decoder(name='auto'):
+    if name == 'auto':
+        for candidate in DECODER_PREFERENCE:
+            try:
+                return DECODERS[candidate]()
+            except ImportError:
+                continue
+        return _stdlib()
+    if name not in DECODERS:
+        raise RunnerException(f'Unknown JSON decoder {name}.')
+    try:
+        return DECODERS[name]()
+    except ImportError:
+        raise RunnerException(f'The JSON decoder {name} is not installed.')
+
+
+def loads(data):
+    decode, error = get_json_decoder(get_json_decoder_name())
+    try:
+        return decode(data)
+    except error:
+        return json.loads(data)
+
+
+def install_decoder(response):
+    decode, error = get_json_decoder(get_json_decoder_name())
+    if decode is json.loads:
+        return response
+    fallback = response.json
+
+    # Payloads the fast decoder rejects go through the client library so errors keep their type.
+    def decode_json(**kwargs):
+        try:
+            return decode(response.content)
+        except error:
+            return fallback(**kwargs)
+
+    response.json = decode_json
+    return response
+
+
+class DecodingConnectClient(ConnectClient):
+    def _execute_http_call(self, method, url, kwargs):
+        with track_api_call():
+            super()._execute_http_call(method, url, kwargs)
+        install_decoder(self.response)
+
+
+class DecodingAsyncConnectClient(AsyncConnectClient):
+    async def _execute_http_call(self, method, url, kwargs):
+        with track_api_call():
+            await super()._execute_http_call(method, url, kwargs)
+        install_decoder(self.response)
+
+
+DECODING_CLIENTS = {
+    ConnectClient: DecodingConnectClient,
+    AsyncConnectClient: DecodingAsyncConnectClient,
+}
@@ -0,0 +1,132 @@
+import fcntl
+import hashlib
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+from importlib.metadata import distributions
+
+from executor.exceptions import RunnerException
+from executor.log import configure_logging
+from executor.utils import get_default_reports_dir
+
+
+logger = logging.getLogger('executor')
+
+REQUIREMENTS_FILE = 'requirements.txt'
+CONSTRAINTS_FILE = 'constraints.txt'
+COMPLETE_MARKER = '.complete'
+
+
+def get_venv_cache_dir():
+    return os.getenv('REPORTS_VENV_CACHE_DIR')
+
+
+# The venv sees the runner packages, reports must not upgrade or downgrade them.
+def get_runner_constraints():
+    versions = {}
+    for distribution in distributions():
+        name = distribution.metadata['Name']
+        if name:
+            versions.setdefault(name.lower(), distribution.version)
+    return ''.join(f'{name}=={version}\n' for name, version in sorted(versions.items()))
+
+
+def get_requirements_hash(requirements_file, constraints=''):
+    digest = hashlib.sha256()
+    digest.update(f'{platform.machine()}-{sys.version_info[0]}.{sys.version_info[1]}'.encode())
+    with open(requirements_file, 'rb') as fp:
+        digest.update(fp.read())
+    digest.update(constraints.encode())
+    return digest.hexdigest()
+
+
+def get_venv_python(venv_dir):
+    return os.path.join(venv_dir, 'bin', 'python')
+
+
+def get_package_source():
+    wheelhouse = os.getenv('REPORTS_WHEELHOUSE')
+    index_url = os.getenv('REPORTS_PIP_INDEX_URL')
+    if wheelhouse and index_url:
+        raise RunnerException(
+            'REPORTS_WHEELHOUSE and REPORTS_PIP_INDEX_URL cannot be used together.',
+        )
+    if wheelhouse:
+        return ['--no-index', '--find-links', wheelhouse]
+    if index_url:
+        return ['--index-url', index_url]
+    return None
+
+
+def get_pip_install_args(requirements_file, constraints_file):
+    args = ['-m', 'pip', 'install', '--no-input', '--disable-pip-version-check']
+    args.extend(get_package_source())
+    return args + ['-c', constraints_file, '-r', requirements_file]
+
+
+def build_environment(venv_dir, requirements_file, constraints):
+    logger.info(f'Installing report dependencies into {venv_dir}.')
+    try:
+        subprocess.run(
+            [sys.executable, '-m', 'venv', '--system-site-packages', venv_dir],
+            check=True,
+            capture_output=True,
+        )
+        constraints_file = os.path.join(venv_dir, CONSTRAINTS_FILE)
+        with open(constraints_file, 'w') as fp:
+            fp.write(constraints)
+        subprocess.run(
+            [get_venv_python(venv_dir)]
+            + get_pip_install_args(requirements_file, constraints_file),
+            check=True,
+            capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(venv_dir, ignore_errors=True)
+        raise
+    open(os.path.join(venv_dir, COMPLETE_MARKER), 'w').close()
+
+
+def ensure_environment(reports_dir):
+    cache_dir = get_venv_cache_dir()
+    requirements_file = os.path.join(reports_dir, REQUIREMENTS_FILE)
+    if not cache_dir or not os.path.isfile(requirements_file):
+        return None
+    if get_package_source() is None:
+        logger.warning(
+            'Report dependencies are not installed, neither REPORTS_WHEELHOUSE nor '
+            'REPORTS_PIP_INDEX_URL is set.',
+        )
+        return None
+
+    constraints = get_runner_constraints()
+    venv_dir = os.path.join(cache_dir, get_requirements_hash(requirements_file, constraints))
+    if os.path.exists(os.path.join(venv_dir, COMPLETE_MARKER)):
+        return get_venv_python(venv_dir)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f'{venv_dir}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(os.path.join(venv_dir, COMPLETE_MARKER)):
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            build_environment(venv_dir, requirements_file, constraints)
+    return get_venv_python(venv_dir)
+
+
+def get_executor_python(reports_dir):
+    try:
+        return ensure_environment(reports_dir) or 'python'
+    except (OSError, subprocess.CalledProcessError, RunnerException) as e:
+        stderr = getattr(e, 'stderr', None)
+        logger.error(
+            f'Cannot install report dependencies: {e} {stderr.decode() if stderr else ""}',
+        )
+        return 'python'
+
+
+if __name__ == '__main__':  # pragma: no cover
+    configure_logging()
+    print(get_executor_python(sys.argv[1] if len(sys.argv) > 1 else get_default_reports_dir()))
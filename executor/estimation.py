@@ -0,0 +1,112 @@
+import asyncio
+import inspect
+import logging
+import os
+from collections import namedtuple
+
+from executor.exceptions import RunnerException
+from executor.utils import get_report_hook
+
+
+logger = logging.getLogger('executor')
+
+# EX_TEMPFAIL, the scheduler retries the report on a larger resource class.
+RESCHEDULE_EXIT_CODE = 75
+DEFAULT_ROW_BYTES = 512
+
+PROCEED = 'proceed'
+RESCHEDULE = 'reschedule'
+REJECT = 'reject'
+
+Estimate = namedtuple('Estimate', ('rows', 'bytes'))
+
+
+def _get_limit(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def get_reschedule_limits():
+    return Estimate(
+        _get_limit('REPORTS_RESCHEDULE_ROWS'),
+        _get_limit('REPORTS_RESCHEDULE_BYTES'),
+    )
+
+
+def get_max_limits():
+    return Estimate(_get_limit('REPORTS_MAX_ROWS'), _get_limit('REPORTS_MAX_BYTES'))
+
+
+def _get_collection(client, path):
+    *namespaces, name = path.strip('/').split('/')
+    for namespace in namespaces:
+        client = client.ns(namespace)
+    return client.collection(name)
+
+
+def count_collections(definition, client, parameters):
+    default_row_bytes = definition.get('row_bytes', DEFAULT_ROW_BYTES)
+    rows = size = 0
+    for query in definition.get('collections', []):
+        try:
+            resources = _get_collection(client, query['collection']).all()
+            if query.get('filter'):
+                resources = resources.filter(query['filter'].format_map(parameters))
+        except KeyError as e:
+            raise RunnerException(f'Estimate query requires the {e} attribute or parameter.')
+        count = resources.count()
+        rows += count
+        size += count * query.get('row_bytes', default_row_bytes)
+    return Estimate(rows, size)
+
+
+def _to_estimate(value):
+    if value is None or isinstance(value, Estimate):
+        return value
+    if isinstance(value, int):
+        return Estimate(value, None)
+    if isinstance(value, dict):
+        return Estimate(value.get('rows'), value.get('bytes'))
+    return Estimate(*value)
+
+
+# Async clients are bound to the loop they first run in, the estimate gets its own one.
+async def _estimate_async(estimator, get_client, parameters):
+    return await estimator(get_client(True), parameters)
+
+
+def estimate_report(report_definition, get_client, parameters):
+    estimator = get_report_hook(report_definition.entrypoint, 'estimate')
+    if estimator is None:
+        return None
+    if isinstance(estimator, dict):
+        return count_collections(estimator, get_client(False), parameters)
+    if inspect.iscoroutinefunction(estimator):
+        return _to_estimate(asyncio.run(_estimate_async(estimator, get_client, parameters)))
+    return _to_estimate(estimator(get_client(False), parameters))
+
+
+def _exceeds(estimate, limits):
+    return any(
+        value is not None and limit is not None and value > limit
+        for value, limit in zip(estimate, limits)
+    )
+
+
+def admit(estimate):
+    if estimate is None:
+        return PROCEED
+    if _exceeds(estimate, get_max_limits()):
+        return REJECT
+    if _exceeds(estimate, get_reschedule_limits()):
+        return RESCHEDULE
+    return PROCEED
+
+
+def describe_estimate(estimate):
+    parts = []
+    if estimate.rows is not None:
+        parts.append(f'{estimate.rows:,} rows')
+    if estimate.bytes is not None:
+        parts.append(f'{estimate.bytes / 1024 / 1024:,.1f} MB')
+    return ' and '.join(parts) or 'an unknown size'
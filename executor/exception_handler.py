@@ -3,7 +3,10 @@ from http import HTTPStatus
 
 from connect.client import ClientError
 
-from executor.utils import get_report, get_report_env
+from executor.checkpoint import discard_checkpoint
+from executor.exceptions import RunnerException
+from executor.metrics import FAILURES
+from executor.outbox import is_retryable, post_report_action
 
 
 C_SUPPORT = '. Please contact support.'
@@ -48,50 +51,51 @@ def report_to_be_blocked(e: Exception, report_type):
     return True if report_type == 'custom' else False
 
 
-def handle_exception(e: Exception, client, report=None):
-    report_env = get_report_env()
-    api_endpoint = report_env['api_endpoint']
+def client_error_to_be_blocked(e: ClientError, report_type, api_endpoint):
+    exception_cause = e.__cause__
+    if e.status_code in UNAUTHORIZED and report_type == 'custom':
+        return True
+    # We will not block in the use case of exception caused by using any endpoint
+    # More information at LITE-16960
+    # to enable back, return exception_cause.request.url.startswith(api_endpoint)
+    return False if exception_cause.request.url.startswith(api_endpoint) else False
 
-    if not report:
-        report = get_report(client, report_env['report_id'])
 
-    block = report_to_be_blocked(e, report['template']['type'])
-    reason = get_reason(e, report['template']['type'])
+# Only transient API failures are worth resuming, other failures would fail again.
+def is_resumable(e: Exception):
+    return isinstance(e, ClientError) and is_retryable(e)
 
-    if isinstance(e, ClientError):
 
-        exception_cause = e.__cause__
+def handle_exception(e: Exception, context):
+    api_endpoint = context.report_env['api_endpoint']
+    report_type = context.report['template']['type']
+
+    block = report_to_be_blocked(e, report_type)
+    reason = get_reason(e, report_type)
 
+    if not is_resumable(e):
+        discard_checkpoint()
+
+    if isinstance(e, ClientError):
+        exception_cause = e.__cause__
         if exception_cause.request and exception_cause.request.url:  # pragma: no branch
-            if e.status_code in UNAUTHORIZED and report['template']['type'] == 'custom':
-                block = True
-            else:
-                # We will not block in the use case of exception caused by using any endpoint
-                # More information at LITE-16960
-                # to enable back, change the False to True on the else sentence
-                block = False if exception_cause.request.url.startswith(api_endpoint) else False
-
-        fail_report(
-            client,
-            report_env['report_id'],
-            reason,
-            block,
-        )
-        raise e
+            block = client_error_to_be_blocked(e, report_type, api_endpoint)
+
+    FAILURES.inc(category='report_to_be_blocked' if block else 'execution')
     fail_report(
-        client,
-        report_env['report_id'],
+        context.control_client,
+        context.report_id,
         reason,
         block,
     )
     raise e
 
 
-def handle_preparation_exception(e: Exception, client):
-    report_env = get_report_env()
+def handle_preparation_exception(e: Exception, context):
+    FAILURES.inc(category='preparation')
     fail_report(
-        client,
-        report_env['report_id'],
+        context.control_client,
+        context.report_id,
         "An error happened while preparing report execution, please try again later or contact "
         "support",
         False,
@@ -100,20 +104,34 @@ def handle_preparation_exception(e: Exception, client):
     raise e
 
 
-def handle_post_execution_exception(e: Exception, client):
-    report_env = get_report_env()
-    report_id = report_env['report_id']
+def handle_post_execution_exception(e: Exception, context):
+    FAILURES.inc(category='post_execution')
     fail_report(
-        client,
-        report_id,
+        context.control_client,
+        context.report_id,
         f'Error storing the report{C_SUPPORT}',
         False,
     )
     raise e
 
 
+def handle_estimate_rejection(reason, context):
+    FAILURES.inc(category='estimate')
+    fail_report(
+        context.control_client,
+        context.report_id,
+        reason,
+        False,
+        reason,
+    )
+    raise RunnerException(reason)
+
+
 def fail_report(client, report_id, reason, block, failure_stdout=None):
-    return client.ns('reporting').reports[report_id].action('fail').post(
+    return post_report_action(
+        client,
+        report_id,
+        'fail',
         {
             "notes": reason,
             "block": block,
@@ -3,21 +3,53 @@ import inspect
 import logging
 import sys
 from datetime import datetime
+from functools import partial
 
 import pytz
-from connect.client import AsyncConnectClient, ClientError, ConnectClient
+from connect.client import ClientError, ConnectClient
 from connect.reports.constants import REPORTS_ENV
 from connect.reports.datamodels import Account, Report
-from connect.reports.renderers import get_renderer
 
+from executor.batches import get_batch_processor
+from executor.cache import get_cache_key, lookup_result, store_result
+from executor.cassette import create_client
+from executor.checkpoint import open_checkpoint, skip_checkpoints, skip_checkpoints_async
+from executor.context import ExecutionContext
+from executor.estimation import (
+    REJECT,
+    RESCHEDULE,
+    RESCHEDULE_EXIT_CODE,
+    admit,
+    describe_estimate,
+    estimate_report,
+)
 from executor.exception_handler import (
+    handle_estimate_rejection,
     handle_exception,
     handle_post_execution_exception,
     handle_preparation_exception,
 )
+from executor.incremental import get_key_column, load_state
+from executor.log import configure_logging, set_log_context
+from executor.metrics import PHASE_DURATION, MetricsRequestLogger, setup_metrics
+from executor.partitions import get_partitions, partitioned_entrypoint
+from executor.postprocessing import get_post_processor
+from executor.projection import open_projection
+from executor.renderers import (
+    MultiRenderer,
+    accumulates_rows,
+    check_row_shapes,
+    get_renderer,
+)
+from executor.spill import (
+    get_spill_dir,
+    is_spill_enabled,
+    spill_rows,
+    spill_rows_async,
+)
 from executor.utils import (
-    get_default_reports_dir,
     get_report,
+    get_report_client,
     get_report_definition,
     get_report_entrypoint,
     get_report_env,
@@ -32,8 +64,10 @@ logger = logging.getLogger('executor')
 def start():
     logger.info("Preparing environment for report execution")
     report_env = get_report_env()
+    set_log_context(report_id=report_env['report_id'])
 
-    client = ConnectClient(
+    client = create_client(
+        ConnectClient,
         endpoint=report_env['api_endpoint'],
         use_specs=False,
         api_key=report_env["client_token"],
@@ -41,29 +75,111 @@ def start():
         default_limit=500,
         default_headers=get_user_agent(),
         timeout=(180, 1500),
+        logger=MetricsRequestLogger(),
     )
+    context = ExecutionContext(report_env, client)
 
     try:
-        report_to_execute = get_report(client, report_env["report_id"])
-        logger.info(f"Preparing execution of report {report_to_execute}")
-        report_definition = get_report_definition(report_to_execute['template']['entrypoint'])
+        with PHASE_DURATION.time(phase='prepare'):
+            context.report = get_report(client, context.report_id)
+            set_log_context(
+                template=context.report['template']['id'],
+                renderer=context.report['renderer'],
+            )
+            logger.info(f"Preparing execution of report {context.report}")
+            context.report_definition = get_report_definition(
+                context.report['template']['entrypoint'],
+            )
+            context.projection = open_projection(context.report['template']['id'])
 
     except (ClientError, Exception) as e:
         logger.exception('An error occurred while preparing the execution environment.')
-        handle_preparation_exception(e, client)
+        handle_preparation_exception(e, context)
 
-    result = execute_report(
-        control_client=client,
-        report_definition=report_definition,
-        connect_report=report_to_execute,
+    cache_key = get_cache_key(
+        context.report,
+        context.report_definition,
+        normalize_parameters(context.report.get('parameters', [])),
     )
+    result = get_cached_result(cache_key)
+    if result:
+        logger.info(f'Report result found in cache: {result}')
+    else:
+        with PHASE_DURATION.time(phase='estimate'):
+            admit_report(context)
+        with PHASE_DURATION.time(phase='execute'):
+            result = execute_report(context)
+        if result:  # pragma: no branch
+            cache_result(cache_key, result)
+            save_projection(context.projection)
 
     if result:  # pragma: no branch
         try:
-            upload_file(client, result, report_env["report_id"], report_to_execute['owner']['id'])
+            with PHASE_DURATION.time(phase='upload'):
+                upload_file(client, result, context.report_id, context.report['owner']['id'])
         except (ClientError, Exception) as e:
             logger.exception('An error occurred during report upload.')
-            handle_post_execution_exception(e, client)
+            handle_post_execution_exception(e, context)
+
+
+def admit_report(context):
+    if context.reports_dir not in sys.path:
+        sys.path.append(context.reports_dir)
+    parameters = normalize_parameters(context.report.get('parameters', []))
+    try:
+        estimate = estimate_report(
+            context.report_definition,
+            partial(get_report_client, context.report_env),
+            parameters,
+        )
+    except Exception:
+        logger.warning('Cannot estimate the report size, executing it anyway.', exc_info=True)
+        return
+    decision = admit(estimate)
+    if decision == REJECT:
+        handle_estimate_rejection(
+            f'Report is estimated to produce {describe_estimate(estimate)}, which exceeds '
+            'the maximum allowed size. Please narrow it down using the report parameters '
+            '(for example a shorter date range) and try again.',
+            context,
+        )
+    if decision == RESCHEDULE:
+        logger.info(
+            f'Report is estimated to produce {describe_estimate(estimate)}, '
+            'rescheduling it on a larger resource class.',
+        )
+        sys.exit(RESCHEDULE_EXIT_CODE)
+    if estimate:
+        logger.info(f'Report is estimated to produce {describe_estimate(estimate)}.')
+
+
+def get_cached_result(cache_key):
+    try:
+        return lookup_result(cache_key)
+    except OSError:
+        logger.warning('Cannot read the report result cache.', exc_info=True)
+
+
+def cache_result(cache_key, result):
+    try:
+        store_result(cache_key, result)
+    except OSError:
+        logger.warning('Cannot store the report result in cache.', exc_info=True)
+
+
+def save_projection(projection):
+    if not projection:
+        return
+    try:
+        projection.save()
+    except OSError:
+        logger.warning('Cannot store the learned projection.', exc_info=True)
+
+
+def normalize_renderers(connect_renderer):
+    if isinstance(connect_renderer, str):
+        return [renderer_id.strip() for renderer_id in connect_renderer.split(',')]
+    return connect_renderer
 
 
 def normalize_parameters(connect_parameters):
@@ -74,11 +190,15 @@ def normalize_parameters(connect_parameters):
     return parameters
 
 
-async def execute_report_async(entrypoint, args, renderer, output_file):
+async def execute_report_async(entrypoint, args, renderer, output_file, processors=()):
     if inspect.iscoroutinefunction(entrypoint):
         data = await entrypoint(*args)
     else:
         data = entrypoint(*args)
+    for _, process_async in processors:
+        data = process_async(data)
+        if inspect.isawaitable(data):
+            data = await data
     return await renderer.render_async(
         data,
         output_file,
@@ -86,23 +206,28 @@ async def execute_report_async(entrypoint, args, renderer, output_file):
     )
 
 
-def _run_render(is_async, entrypoint, args, renderer, output_file):
+def _run_render(is_async, entrypoint, args, renderer, output_file, processors=()):
     if is_async:
-        return asyncio.run(execute_report_async(entrypoint, args, renderer, output_file))
+        return asyncio.run(
+            execute_report_async(entrypoint, args, renderer, output_file, processors),
+        )
     else:
         data = entrypoint(*args)
+        for process, _ in processors:
+            data = process(data)
         return renderer.render(data, output_file, start_time=datetime.now(tz=pytz.utc))
 
 
-def execute_report(control_client, report_definition, connect_report):  # noqa: CCR001
-    report_env = get_report_env()
-    reports_dir = get_default_reports_dir()
+def execute_report(context):  # noqa: CCR001
+    report_definition = context.report_definition
+    connect_report = context.report
+    reports_dir = context.reports_dir
 
     connect_parameters = connect_report.get('parameters', [])
     parameters = normalize_parameters(connect_parameters)
 
-    def progress(current_value, max_value):
-        report = False
+    def progress(current_value, max_value, force=False):
+        report = force
         if (
             max_value < 100 and current_value % 10 == 0
             or max_value < 1000 and current_value % 20 == 0
@@ -111,9 +236,9 @@ def execute_report(control_client, report_definition, connect_report):  # noqa:
         ):
             report = True
         if report:  # pragma: no branch
-            control_client.ns(
+            context.control_client.ns(
                 'reporting',
-            ).reports[report_env['report_id']].action(
+            ).reports[context.report_id].action(
                 'progress',
             ).post(
                 {
@@ -130,68 +255,150 @@ def execute_report(control_client, report_definition, connect_report):  # noqa:
         report_entry_point = get_report_entrypoint(report_definition.entrypoint)
     except (ImportError, AttributeError) as e:
         logger.exception('An error occurred while importing report entrypoint.')
-        handle_preparation_exception(e, control_client)
+        handle_preparation_exception(e, context)
 
     is_async = (
         inspect.isasyncgenfunction(report_entry_point)
         or inspect.iscoroutinefunction(report_entry_point)
     )
 
-    client_class = AsyncConnectClient if is_async else ConnectClient
-    report_client = client_class(
-        endpoint=report_env["api_endpoint"],
-        use_specs=False,
-        api_key=report_env["client_token"],
-        max_retries=5,
-        default_limit=500,
-        default_headers=get_user_agent(),
-        timeout=(180, 1500),
-        resourceset_append=False,
+    report = Report(
+        report_definition.local_id,
+        report_definition.name,
+        report_definition.description,
+        parameters,
     )
+    renderer_definitions = [
+        next(
+            filter(
+                lambda renderer: renderer.id == renderer_id, report_definition.renderers,
+            ),
+        )
+        for renderer_id in normalize_renderers(connect_report['renderer'])
+    ]
+    renderers = [
+        (
+            renderer_definition.id,
+            get_renderer(
+                renderer_definition.type,
+                REPORTS_ENV,
+                reports_dir,
+                Account(connect_report['owner']['id'], connect_report['owner']['name']),
+                report,
+                renderer_definition.template,
+                renderer_definition.args,
+            ),
+        )
+        for renderer_definition in renderer_definitions
+    ]
+    renderer_definition = renderer_definitions[0]
+    renderer = renderers[0][1] if len(renderers) == 1 else MultiRenderer(renderers)
 
-    renderer_id = connect_report['renderer']
-    renderer_definition = next(
-        filter(
-            lambda renderer: renderer.id == renderer_id, report_definition.renderers,
-        ),
-    )
+    try:
+        check_row_shapes(renderer_definitions)
+        output_processors = []
+        if context.projection:
+            output_processors.append(
+                (context.projection.mark_rows, context.projection.mark_rows_async),
+            )
+        yields_batches = report_definition.report_spec == '4'
+        post_processor = get_post_processor(renderer_definitions, yields_batches)
+        if post_processor:
+            output_processors.append(post_processor)
+            yields_batches = False
+        # Spilled rows are released before an accumulating renderer builds its own copy of them.
+        spill_processors = []
+        spill_requested = any(is_spill_enabled(definition) for definition in renderer_definitions)
+        if spill_requested and accumulates_rows(renderer):
+            spill_dir = get_spill_dir()
+            spill_processors.append(
+                (
+                    partial(spill_rows, directory=spill_dir),
+                    partial(spill_rows_async, directory=spill_dir),
+                ),
+            )
+        batch_processor = get_batch_processor(yields_batches, renderer)
+        if batch_processor:
+            output_processors.append(batch_processor)
 
-    renderer = get_renderer(
-        renderer_definition.type,
-        REPORTS_ENV,
-        reports_dir,
-        Account(connect_report['owner']['id'], connect_report['owner']['name']),
-        Report(
-            report_definition.local_id,
-            report_definition.name,
-            report_definition.description,
-            parameters,
-        ),
-        renderer_definition.template,
-        renderer_definition.args,
-    )
+        partitions = get_partitions(report_definition, parameters)
+        if partitions:
+            logger.info(f'Executing report in {len(partitions)} partitions.')
+            report_entry_point = partitioned_entrypoint(
+                report_definition.entrypoint,
+                partitions,
+                reports_dir,
+                context.report_env,
+                get_spill_dir(),
+            )
+            is_async = False
+            # Every partition builds its own client in its worker process.
+            report_client = None
+        else:
+            report_client = context.get_report_client(is_async)
+
+        # Checkpoint cursors of separate partitions cannot resume a single run.
+        checkpoint = None if partitions else open_checkpoint(
+            context.report_id,
+            batches=report_definition.report_spec == '4',
+        )
+        if checkpoint:
+            if checkpoint.cursor is not None:
+                logger.info(
+                    f'Resuming report from checkpoint after {checkpoint.resumed_rows} rows.',
+                )
+            input_processors = spill_processors + [(checkpoint.track, checkpoint.track_async)]
+        else:
+            input_processors = spill_processors + [(skip_checkpoints, skip_checkpoints_async)]
 
-    try:
         args = [report_client, parameters, progress]
-        if report_definition.report_spec == '2':
+        if report_definition.report_spec in ('2', '3', '4'):
             args.extend(
                 [
                     renderer_definition.type,
                     renderer.set_extra_context,
                 ],
             )
-        return _run_render(is_async, report_entry_point, args, renderer, '/report')
+        if report_definition.report_spec != '3':
+            result = _run_render(
+                is_async,
+                report_entry_point,
+                args,
+                renderer,
+                '/report',
+                input_processors + output_processors,
+            )
+        else:
+            template_id = connect_report['template']['id']
+            owner_id = connect_report['owner']['id']
+            key_column = get_key_column(renderer_definitions)
+            state = load_state(template_id, owner_id, parameters, key_column)
+            state.cursor = checkpoint.cursor if checkpoint else None
+            args.append(state)
+            try:
+                result = _run_render(
+                    is_async,
+                    report_entry_point,
+                    args,
+                    renderer,
+                    '/report',
+                    input_processors + [(state.merge, state.merge_async)] + output_processors,
+                )
+                state.save()
+            finally:
+                state.close()
+        if checkpoint:
+            checkpoint.remove()
+        return result
     except Exception as e:
-        handle_exception(e, control_client, connect_report)
+        handle_exception(e, context)
 
 
 # Launch main process
 if __name__ == '__main__':  # pragma: no cover
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s %(name)s %(levelname)s PID_%(process)d %(message)s',
-    )
+    configure_logging()
+    setup_metrics('executor', serve=True)
     try:  # pragma: no cover
         start()
-    except BaseException:
+    except Exception:
         logger.critical('Unhandled exception has ocurred.', exc_info=True)
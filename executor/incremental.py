@@ -0,0 +1,251 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+from datetime import date, datetime, time
+from decimal import Decimal
+from urllib.parse import quote
+
+from executor.exceptions import RunnerException
+
+
+logger = logging.getLogger('executor')
+
+STATE_VERSION = 1
+
+_DECODERS = {
+    'datetime': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'time': time.fromisoformat,
+    'decimal': Decimal,
+}
+
+# Fresh rows replace every previous row with the same key at the position of the first one, rows
+# of new keys go last, rows of one run keep their order.
+_MERGE_QUERY = '''
+SELECT key, row FROM (
+    SELECT seq AS position, 0 AS run, seq, key, row FROM previous.rows
+    WHERE NOT EXISTS (SELECT 1 FROM fresh WHERE fresh.key = previous.rows.key)
+    UNION ALL
+    SELECT COALESCE(
+        (SELECT MIN(seq) FROM previous.rows WHERE previous.rows.key = fresh.key),
+        :offset + fresh.seq
+    ), 1, fresh.seq, fresh.key, fresh.row FROM fresh
+) ORDER BY position, run, seq
+'''
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$type': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, date):
+        return {'$type': 'date', 'value': value.isoformat()}
+    if isinstance(value, time):
+        return {'$type': 'time', 'value': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$type': 'decimal', 'value': str(value)}
+    return str(value)
+
+
+def _decode_value(value):
+    if value.keys() == {'$type', 'value'} and value['$type'] in _DECODERS:
+        return _DECODERS[value['$type']](value['value'])
+    return value
+
+
+def encode(value):
+    return json.dumps(value, default=_encode_value, separators=(',', ':'))
+
+
+def decode(data):
+    return json.loads(data, object_hook=_decode_value)
+
+
+def get_key_column(renderer_definitions):
+    for definition in renderer_definitions:
+        key_column = (definition.args or {}).get('incremental_key')
+        if key_column is not None:
+            return key_column
+    raise RunnerException(
+        'Incremental reports require the incremental_key renderer argument with the column '
+        'that identifies each row.',
+    )
+
+
+class IncrementalState:
+    def __init__(self, high_water_mark=None, key_column=None, state_file=None, previous=False):
+        self.high_water_mark = high_water_mark
+        self.next_high_water_mark = high_water_mark
+        self.key_column = key_column
+        self.state_file = state_file
+        self.previous = previous
+        self.cursor = None
+        self.work_file = f'{state_file}.{os.getpid()}.tmp' if state_file else None
+        self._connection = None
+
+    def update(self, high_water_mark):
+        if high_water_mark is None:
+            return
+        if self.next_high_water_mark is None or high_water_mark > self.next_high_water_mark:
+            self.next_high_water_mark = high_water_mark
+
+    def key(self, row):
+        value = row[self.key_column]
+        if isinstance(value, (date, time)):
+            value = value.isoformat()
+        return json.dumps(value, default=str)
+
+    def rows(self):
+        if not self.previous:
+            return
+        connection = _connect_read_only(self.state_file)
+        try:
+            for (row,) in connection.execute('SELECT row FROM rows ORDER BY seq'):
+                yield decode(row)
+        finally:
+            connection.close()
+
+    def _open(self):
+        self.close()
+        os.makedirs(os.path.dirname(self.work_file), exist_ok=True)
+        self._connection = sqlite3.connect(self.work_file, check_same_thread=False)
+        self._connection.executescript(
+            '''
+            PRAGMA journal_mode=OFF;
+            PRAGMA synchronous=OFF;
+            CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE rows (seq INTEGER PRIMARY KEY, key TEXT NOT NULL, row TEXT NOT NULL);
+            CREATE TEMP TABLE fresh (
+                seq INTEGER PRIMARY KEY, key TEXT NOT NULL, row TEXT NOT NULL
+            );
+            ''',
+        )
+
+    def _write(self, table, seq, key, row):
+        self._connection.execute(
+            f'INSERT INTO {table} (seq, key, row) VALUES (?, ?, ?)',
+            (seq, key, row),
+        )
+
+    def _merged(self):
+        self._connection.execute('CREATE INDEX temp.fresh_key ON fresh (key)')
+        self._connection.execute('ATTACH DATABASE ? AS previous', (self.state_file,))
+        offset = self._connection.execute(
+            'SELECT COALESCE(MAX(seq), 0) + 1 FROM previous.rows',
+        ).fetchone()[0]
+        cursor = self._connection.execute(_MERGE_QUERY, {'offset': offset})
+        for seq, (key, row) in enumerate(cursor):
+            self._write('rows', seq, key, row)
+            yield decode(row)
+
+    # Rows are staged on disk, only the merged output streams through memory.
+    def merge(self, data):
+        if not self.state_file:
+            yield from data
+            return
+        self._open()
+        table = 'fresh' if self.previous else 'rows'
+        for seq, row in enumerate(data):
+            self._write(table, seq, self.key(row), encode(row))
+            if not self.previous:
+                yield row
+        if self.previous:
+            yield from self._merged()
+
+    async def merge_async(self, data):
+        if not inspect.isasyncgen(data):
+            for row in self.merge(data):
+                yield row
+            return
+        if not self.state_file:
+            async for row in data:
+                yield row
+            return
+        self._open()
+        table = 'fresh' if self.previous else 'rows'
+        seq = 0
+        async for row in data:
+            self._write(table, seq, self.key(row), encode(row))
+            seq += 1
+            if not self.previous:
+                yield row
+        if self.previous:
+            for row in self._merged():
+                yield row
+
+    def save(self):
+        if self._connection is None:
+            return
+        self._connection.executemany(
+            'INSERT INTO meta (name, value) VALUES (?, ?)',
+            (
+                ('version', encode(STATE_VERSION)),
+                ('high_water_mark', encode(self.next_high_water_mark)),
+                ('key_column', encode(self.key_column)),
+            ),
+        )
+        self._connection.execute('CREATE INDEX rows_key ON rows (key)')
+        self._connection.commit()
+        self._connection.close()
+        self._connection = None
+        os.replace(self.work_file, self.state_file)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self.work_file and os.path.exists(self.work_file):
+            os.remove(self.work_file)
+
+
+def get_state_dir():
+    return os.getenv('REPORTS_STATE_DIR')
+
+
+def get_state_file(state_dir, template_id, owner_id, parameters):
+    parameters_hash = hashlib.sha256(
+        json.dumps(parameters, sort_keys=True, default=str).encode('utf-8'),
+    ).hexdigest()
+    return os.path.join(state_dir, template_id, owner_id, f'{parameters_hash}.sqlite')
+
+
+def _connect_read_only(path):
+    return sqlite3.connect(f'file:{quote(path)}?mode=ro', uri=True)
+
+
+def _read_meta(state_file):
+    connection = _connect_read_only(state_file)
+    try:
+        return {
+            name: decode(value)
+            for name, value in connection.execute('SELECT name, value FROM meta')
+        }
+    finally:
+        connection.close()
+
+
+def load_state(template_id, owner_id, parameters, key_column):
+    state_dir = get_state_dir()
+    if not state_dir:
+        return IncrementalState(key_column=key_column)
+    state_file = get_state_file(state_dir, template_id, owner_id, parameters)
+    if not os.path.exists(state_file):
+        return IncrementalState(key_column=key_column, state_file=state_file)
+    try:
+        meta = _read_meta(state_file)
+        if meta['version'] != STATE_VERSION or meta['key_column'] != key_column:
+            raise ValueError('The state was saved by another runner version or key column.')
+    except Exception:
+        logger.warning(
+            f'Cannot load the incremental state {state_file}, running without previous state.',
+            exc_info=True,
+        )
+        return IncrementalState(key_column=key_column, state_file=state_file)
+    return IncrementalState(
+        high_water_mark=meta['high_water_mark'],
+        key_column=key_column,
+        state_file=state_file,
+        previous=True,
+    )
@@ -0,0 +1,130 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+
+
+LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s PID_%(process)d %(message)s'
+DEFAULT_LOG_RATE_LIMIT = 200
+CONTEXT_FIELDS = ('report_id', 'template', 'renderer')
+EXTRA_FIELDS = ('stdout', 'stderr', 'dropped_records')
+
+_log_context = {}
+
+
+def is_json_logging():
+    return os.getenv('REPORTS_LOG_FORMAT', '').lower() == 'json'
+
+
+def get_log_rate_limit():
+    return int(os.getenv('REPORTS_LOG_RATE_LIMIT', DEFAULT_LOG_RATE_LIMIT))
+
+
+def set_log_context(**kwargs):
+    _log_context.update(kwargs)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, _log_context.get(field))
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.windows = {}
+
+    def filter(self, record):
+        # Warnings and errors are never dropped.
+        if record.levelno >= logging.WARNING:
+            return True
+        now = int(time.monotonic())
+        window, count, dropped = self.windows.get(record.name, (now, 0, 0))
+        if window != now:
+            if dropped:
+                record.dropped_records = dropped
+            window, count, dropped = now, 0, 0
+        count += 1
+        allowed = count <= self.rate
+        if not allowed:
+            dropped += 1
+        self.windows[record.name] = (window, count, dropped)
+        return allowed
+
+    def flush(self, handler):
+        for name, (window, count, dropped) in list(self.windows.items()):
+            if not dropped:
+                continue
+            self.windows[name] = (window, count, 0)
+            record = logging.LogRecord(
+                name, logging.WARNING, __file__, 0,
+                f'{dropped} log records dropped by the rate limit.', None, None,
+            )
+            record.dropped_records = dropped
+            handler.handle(record)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS + EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    # The default prepare() appends the traceback to the message, keep it in exc_text instead.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging():
+    if not is_json_logging():
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+        return None
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    rate_filter = RateLimitFilter(get_log_rate_limit())
+    queue_handler.addFilter(rate_filter)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    # Registered last so it runs first at exit, while the listener is still running.
+    atexit.register(rate_filter.flush, queue_handler)
+    return listener
@@ -0,0 +1,161 @@
+import asyncio
+import os
+
+from connect.client import R
+from connect.client.models import AsyncCollection
+
+from executor.batches import to_batches, to_batches_async
+
+
+DEFAULT_LOOKUP_BATCH_SIZE = 100
+
+
+def get_lookup_batch_size():
+    return int(os.getenv('REPORTS_LOOKUP_BATCH_SIZE', DEFAULT_LOOKUP_BATCH_SIZE))
+
+
+def _chunks(ids, size):
+    for idx in range(0, len(ids), size):
+        yield ids[idx:idx + size]
+
+
+def _fail(futures, error):
+    for future in futures.values():
+        if future.done():
+            continue
+        if error is None:
+            future.cancel()
+        else:
+            future.set_exception(error)
+
+
+class _Lookup:
+    def __init__(self, collection, field='id', batch_size=None, select=None):
+        self.collection = collection
+        self.field = field
+        self.batch_size = batch_size or get_lookup_batch_size()
+        self.select = select or []
+        self.cache = {}
+
+    def _resources(self, ids):
+        resources = self.collection.filter(R().n(self.field).oneof(ids))
+        if self.select:
+            resources = resources.select(*self.select)
+        return resources
+
+    def _key(self, resource):
+        value = resource
+        for name in self.field.split('.'):
+            value = value.get(name) if isinstance(value, dict) else None
+        return value
+
+    def _store(self, ids, resources):
+        found = {self._key(resource): resource for resource in resources}
+        for id_ in ids:
+            self.cache[id_] = found.get(id_)
+
+    def _missing(self, ids):
+        return [id_ for id_ in dict.fromkeys(ids) if id_ is not None and id_ not in self.cache]
+
+
+class BatchLookup(_Lookup):
+    def __init__(self, collection, field='id', batch_size=None, select=None):
+        super().__init__(collection, field, batch_size, select)
+        self.pending = []
+
+    def prefetch(self, ids):
+        self.pending.extend(ids)
+
+    def flush(self):
+        missing, self.pending = self._missing(self.pending), []
+        for chunk in _chunks(missing, self.batch_size):
+            self._store(chunk, list(self._resources(chunk)))
+
+    def get(self, id_):
+        if id_ is not None and id_ not in self.cache:
+            self.prefetch([id_])
+            self.flush()
+        return self.cache.get(id_)
+
+    def get_many(self, ids):
+        ids = list(ids)
+        self.prefetch(ids)
+        self.flush()
+        return {id_: self.cache.get(id_) for id_ in ids}
+
+    def resolve(self, rows, key):
+        for window in to_batches(rows, self.batch_size):
+            self.prefetch(key(row) for row in window)
+            self.flush()
+            for row in window:
+                yield row, self.cache.get(key(row))
+
+
+class AsyncBatchLookup(_Lookup):
+    def __init__(self, collection, field='id', batch_size=None, select=None, window=0):
+        super().__init__(collection, field, batch_size, select)
+        self.window = window
+        self.futures = {}
+        self.in_flight = {}
+        self._timer = None
+        self._tasks = set()
+
+    async def _load(self, futures):
+        try:
+            for chunk in _chunks(list(futures), self.batch_size):
+                self._store(chunk, [resource async for resource in self._resources(chunk)])
+                for id_ in chunk:
+                    if not futures[id_].done():
+                        futures[id_].set_result(self.cache[id_])
+        except Exception as e:
+            _fail(futures, e)
+        except BaseException:
+            _fail(futures, None)
+            raise
+        finally:
+            for id_, future in futures.items():
+                if self.in_flight.get(id_) is future:
+                    del self.in_flight[id_]
+
+    def _dispatch(self):
+        futures, self.futures = self.futures, {}
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if futures:
+            self.in_flight.update(futures)
+            task = asyncio.ensure_future(self._load(futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def get(self, id_):
+        if id_ is None:
+            return None
+        if id_ in self.cache:
+            return self.cache[id_]
+        future = self.futures.get(id_) or self.in_flight.get(id_)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.futures[id_] = loop.create_future()
+            if len(self.futures) >= self.batch_size:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+        return await asyncio.shield(future)
+
+    async def get_many(self, ids):
+        ids = list(ids)
+        resources = await asyncio.gather(*[self.get(id_) for id_ in ids])
+        return dict(zip(ids, resources))
+
+    async def resolve(self, rows, key):
+        async for window in to_batches_async(rows, self.batch_size):
+            resources = await asyncio.gather(*[self.get(key(row)) for row in window])
+            for row, resource in zip(window, resources):
+                yield row, resource
+
+
+def batch_lookup(collection, **kwargs):
+    if isinstance(collection, AsyncCollection):
+        return AsyncBatchLookup(collection, **kwargs)
+    return BatchLookup(collection, **kwargs)
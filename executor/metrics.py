@@ -0,0 +1,247 @@
+import atexit
+import contextvars
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        raise NotImplementedError
+
+    def to_text(self, labels=()):
+        samples = list(self.samples())
+        if not samples:
+            return ''
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for name, sample_labels, value in samples:
+            lines.append(f'{name}{_format_labels(tuple(labels) + sample_labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}_total', labels, value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0, 0))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            }
+        for labels, (counts, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', labels + (('le', bound),), bucket_count
+            yield f'{self.name}_bucket', labels + (('le', '+Inf'),), count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def to_text(self, labels=()):
+        return ''.join(metric.to_text(labels) for metric in self.metrics)
+
+
+REGISTRY = Registry()
+
+EXECUTIONS = REGISTRY.register(
+    Counter('reports_executions', 'Report executions by result.'),
+)
+FAILURES = REGISTRY.register(
+    Counter('reports_failures', 'Report failures by reason category.'),
+)
+PHASE_DURATION = REGISTRY.register(
+    Histogram('reports_phase_duration_seconds', 'Duration of the report execution phases.'),
+)
+API_CALLS = REGISTRY.register(
+    Counter('reports_api_calls', 'Connect API calls by method and response status class.'),
+)
+API_RETRIES = REGISTRY.register(
+    Counter('reports_api_retries', 'Connect API calls retried after a failure.'),
+)
+UPLOADED_BYTES = REGISTRY.register(
+    Counter('reports_uploaded_bytes', 'Bytes of report results uploaded.'),
+)
+PEAK_RSS = REGISTRY.register(
+    Gauge('reports_peak_rss_bytes', 'Peak resident set size.'),
+)
+
+# The runner only waits for the executor, its peak is the one of the rendering process.
+RUSAGE_TARGETS = {'runner': resource.RUSAGE_CHILDREN}
+
+_process_name = None
+_call_attempts = contextvars.ContextVar('call_attempts', default=None)
+_request_method = contextvars.ContextVar('request_method', default='')
+
+
+@contextmanager
+def track_api_call():
+    token = _call_attempts.set(0)
+    try:
+        yield
+    finally:
+        _call_attempts.reset(token)
+
+
+class MetricsRequestLogger:
+    # Attempts are counted per client call, every attempt after the first one is a retry.
+    def log_request(self, method, url, kwargs):
+        attempts = _call_attempts.get()
+        if attempts is not None:
+            if attempts:
+                API_RETRIES.inc()
+            _call_attempts.set(attempts + 1)
+        _request_method.set(method)
+
+    def log_response(self, response):
+        API_CALLS.inc(
+            method=_request_method.get().upper(),
+            status=f'{response.status_code // 100}xx',
+        )
+
+
+def get_metrics_dir():
+    return os.getenv('REPORTS_METRICS_DIR')
+
+
+def get_metrics_port():
+    port = os.getenv('REPORTS_METRICS_PORT')
+    return int(port) if port else None
+
+
+def generate_metrics(labels=()):
+    if _process_name:
+        PEAK_RSS.set(
+            resource.getrusage(
+                RUSAGE_TARGETS.get(_process_name, resource.RUSAGE_SELF),
+            ).ru_maxrss * 1024,
+            process=_process_name,
+        )
+    return REGISTRY.to_text(labels)
+
+
+# Every report writes its own file with its own series, a textfile collector shared by several
+# executions would otherwise overwrite or collide on them.
+def write_metrics(metrics_dir):
+    report_id = os.getenv('REPORT_ID', 'unknown')
+    os.makedirs(metrics_dir, exist_ok=True)
+    metrics_file = os.path.join(metrics_dir, f'reports_{_process_name}_{report_id}.prom')
+    tmp_file = f'{metrics_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'w') as fp:
+        fp.write(generate_metrics((('report_id', report_id),)))
+    os.replace(tmp_file, metrics_file)
+    return metrics_file
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = generate_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def setup_metrics(process_name, serve=False):
+    global _process_name
+    _process_name = process_name
+    metrics_dir = get_metrics_dir()
+    if metrics_dir:
+        atexit.register(write_metrics, metrics_dir)
+    port = get_metrics_port()
+    if serve and port:
+        return start_metrics_server(port)
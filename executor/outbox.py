@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from connect.client import ClientError
+
+
+logger = logging.getLogger('executor')
+
+TERMINAL_ACTIONS = ('fail', 'upload')
+RETRYABLE_STATUSES = (429,)
+DEFAULT_OUTBOX_RETRIES = 5
+DEFAULT_OUTBOX_BACKOFF = 1
+MAX_OUTBOX_BACKOFF = 60
+
+
+def get_outbox_dir():
+    return os.getenv('REPORTS_OUTBOX_DIR')
+
+
+def get_outbox_retries():
+    return int(os.getenv('REPORTS_OUTBOX_RETRIES', DEFAULT_OUTBOX_RETRIES))
+
+
+def is_retryable(e: ClientError):
+    return (
+        e.status_code is None
+        or e.status_code >= 500
+        or e.status_code in RETRYABLE_STATUSES
+    )
+
+
+# The outbox retries with its own backoff, a retrying client would multiply the attempts.
+def without_retries(client):
+    if client.max_retries == 0:
+        return client
+    attributes = vars(client)
+    kwargs = {
+        name: attributes[name]
+        for name in ('endpoint', 'api_key', 'default_headers', 'default_limit', 'logger', 'timeout')
+    }
+    if 'cassette' in attributes:
+        kwargs['cassette'] = attributes['cassette']
+    return type(client)(use_specs=False, max_retries=0, **kwargs)
+
+
+class Outbox:
+    def __init__(self, directory, report_id, retries=None, backoff=DEFAULT_OUTBOX_BACKOFF):
+        self.directory = os.path.join(directory, report_id)
+        self.report_id = report_id
+        self.retries = get_outbox_retries() if retries is None else retries
+        self.backoff = backoff
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def terminal_file(self):
+        return os.path.join(self.directory, 'terminal')
+
+    def _write(self, path, data):
+        tmp_file = f'{path}.tmp'
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_file, path)
+
+    def add(self, action, payload, headers=None):
+        entry = {
+            'id': uuid.uuid4().hex,
+            'action': action,
+            'payload': payload,
+            'headers': headers or {},
+        }
+        path = os.path.join(self.directory, f'{time.time_ns()}-{action}.json')
+        self._write(path, entry)
+        return path
+
+    def pending(self):
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith('.json')
+        )
+
+    def _send(self, client, entry):
+        headers = dict(entry['headers'], **{'Idempotency-Key': entry['id']})
+        return client.ns('reporting').reports[self.report_id].action(entry['action']).post(
+            payload=entry['payload'],
+            headers=headers,
+        )
+
+    def _deliver(self, client, path):
+        with open(path) as fp:
+            entry = json.load(fp)
+        client = without_retries(client)
+        attempt = 0
+        while True:
+            try:
+                response = self._send(client, entry)
+                break
+            except ClientError as e:
+                if e.status_code == 409 and entry['action'] in TERMINAL_ACTIONS:
+                    logger.info(
+                        f'Report {self.report_id} action {entry["action"]} already applied.',
+                    )
+                    response = None
+                    break
+                if not is_retryable(e):
+                    os.remove(path)
+                    raise
+                if attempt >= self.retries:
+                    raise
+                delay = min(self.backoff * 2 ** attempt, MAX_OUTBOX_BACKOFF)
+                attempt += 1
+                logger.warning(
+                    f'Report {self.report_id} action {entry["action"]} failed: {e}, '
+                    f'retrying in {delay}s ({attempt}/{self.retries}).',
+                )
+                time.sleep(delay)
+        if entry['action'] in TERMINAL_ACTIONS:
+            self._write(self.terminal_file, {'action': entry['action'], 'id': entry['id']})
+        os.remove(path)
+        return response
+
+    def post(self, client, action, payload, headers=None):
+        return self._deliver(client, self.add(action, payload, headers))
+
+    def drain(self, client):
+        client = without_retries(client)
+        delivered = 0
+        for path in self.pending():
+            self._deliver(client, path)
+            delivered += 1
+        return delivered
+
+    def is_terminal_delivered(self):
+        return os.path.exists(self.terminal_file)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def open_outbox(report_id):
+    outbox_dir = get_outbox_dir()
+    if not outbox_dir:
+        return None
+    return Outbox(outbox_dir, report_id)
+
+
+def post_report_action(client, report_id, action, payload, headers=None):
+    outbox = open_outbox(report_id)
+    if outbox:
+        return outbox.post(client, action, payload, headers)
+    kwargs = {'headers': headers} if headers else {}
+    return client.ns('reporting').reports[report_id].action(action).post(payload, **kwargs)
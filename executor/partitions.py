@@ -0,0 +1,252 @@
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from executor.spill import DEFAULT_SPILL_BATCH_SIZE
+from executor.utils import get_report_client, get_report_entrypoint, get_report_hook
+
+
+logger = logging.getLogger('executor')
+
+_queue = None
+
+PROGRESS_INTERVAL = 5
+_DONE = object()
+
+
+def get_max_workers():
+    return int(os.getenv('REPORTS_MAX_WORKERS', os.cpu_count() or 1))
+
+
+def get_partitions(report_definition, parameters):
+    if report_definition.report_spec == '3' or get_max_workers() < 2:
+        return None
+    partition = get_report_hook(report_definition.entrypoint, 'partition')
+    if not partition:
+        return None
+    partitions = list(partition(parameters))
+    return partitions if len(partitions) > 1 else None
+
+
+def _init_worker(queue):
+    global _queue
+    _queue = queue
+
+
+class _ChunkWriter:
+    def __init__(self, index, spill_dir, batch_size=DEFAULT_SPILL_BATCH_SIZE):
+        self.index = index
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.rows = []
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    async def extend_async(self, rows):
+        if not inspect.isasyncgen(rows):
+            return self.extend(rows)
+        async for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        fd, path = tempfile.mkstemp(prefix='partition_', suffix='.chunk', dir=self.spill_dir)
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(self.rows, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows = []
+        _queue.put(('rows', self.index, path))
+
+
+def _read_chunk(path):
+    with open(path, 'rb') as fp:
+        rows = pickle.load(fp)
+    os.remove(path)
+    return rows
+
+
+async def _collect_async(entrypoint, args, writer):
+    if inspect.iscoroutinefunction(entrypoint):
+        data = await entrypoint(*args)
+    else:
+        data = entrypoint(*args)
+    await writer.extend_async(data)
+
+
+def execute_partition(
+    index, entrypoint_fqn, reports_dir, report_env, parameters, extra_args, spill_dir,
+):
+    if reports_dir not in sys.path:
+        sys.path.append(reports_dir)
+    entrypoint = get_report_entrypoint(entrypoint_fqn)
+    is_async = (
+        inspect.isasyncgenfunction(entrypoint)
+        or inspect.iscoroutinefunction(entrypoint)
+    )
+
+    def progress(current_value, max_value):
+        _queue.put(('progress', index, (current_value, max_value)))
+
+    def extra_context(data):
+        _queue.put(('context', index, data))
+
+    args = [get_report_client(report_env, is_async), parameters, progress]
+    if extra_args:
+        args.extend([extra_args[0], extra_context])
+
+    # Rows are handed over in chunks while the partition runs, the done message follows the
+    # last chunk on the same queue.
+    writer = _ChunkWriter(index, spill_dir)
+    try:
+        if is_async:
+            asyncio.run(_collect_async(entrypoint, args, writer))
+        else:
+            writer.extend(entrypoint(*args))
+        writer.flush()
+    finally:
+        _queue.put(('done', index, None))
+
+
+class _ProgressAggregator:
+    def __init__(self, partitions_count, progress_callback, interval=PROGRESS_INTERVAL):
+        self.values = [(0, 0)] * partitions_count
+        self.progress_callback = progress_callback
+        self.interval = interval
+        self.reported = None
+        self.reported_at = None
+
+    def update(self, index, value):
+        self.values[index] = value
+        if self.reported_at is None or time.monotonic() - self.reported_at >= self.interval:
+            self.report()
+
+    def report(self):
+        total = (sum(value[0] for value in self.values), sum(value[1] for value in self.values))
+        if total != self.reported:
+            self.progress_callback(*total, force=True)
+            self.reported = total
+        self.reported_at = time.monotonic()
+
+
+class PartitionedRun:
+    def __init__(self, entrypoint_fqn, partitions, reports_dir, report_env, spill_dir):
+        self.queue = multiprocessing.Queue()
+        self.pool = ProcessPoolExecutor(
+            max_workers=min(get_max_workers(), len(partitions)),
+            initializer=_init_worker,
+            initargs=(self.queue,),
+        )
+        self.entrypoint_fqn = entrypoint_fqn
+        self.partitions = partitions
+        self.reports_dir = reports_dir
+        self.report_env = report_env
+        self.spill_dir = spill_dir
+        self.futures = []
+        self.outputs = [queue.Queue() for _ in partitions]
+        self.dispatch_thread = None
+        self.progress = None
+        self.extra_context = None
+
+    def _dispatch(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            kind, index, data = message
+            if kind == 'progress':
+                self.progress.update(index, data)
+            else:
+                self.outputs[index].put((kind, data))
+
+    def start(self, progress_callback, extra_args):
+        self.progress = _ProgressAggregator(len(self.partitions), progress_callback)
+        self.dispatch_thread = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatch_thread.start()
+        for index, parameters in enumerate(self.partitions):
+            future = self.pool.submit(
+                execute_partition,
+                index,
+                self.entrypoint_fqn,
+                self.reports_dir,
+                self.report_env,
+                parameters,
+                extra_args,
+                self.spill_dir,
+            )
+            # A worker that dies without reporting still ends its partition.
+            future.add_done_callback(
+                partial(self._on_done, self.outputs[index]),
+            )
+            self.futures.append(future)
+
+    def _on_done(self, output, future):
+        if future.cancelled() or future.exception():
+            output.put(('done', None))
+
+    def close(self):
+        for future in self.futures:
+            future.cancel()
+        self.pool.shutdown()
+        self.queue.put(None)
+        self.dispatch_thread.join()
+        self.progress.report()
+        for output in self.outputs:
+            while not output.empty():
+                kind, data = output.get()
+                if kind == 'rows' and os.path.exists(data):
+                    os.remove(data)
+
+    def _set_extra_context(self, index, data, set_extra_context):
+        if index == 0:
+            self.extra_context = data
+            if set_extra_context:
+                set_extra_context(data)
+        elif data != self.extra_context:
+            logger.warning(
+                f'Extra context of partition {index} ignored, only the first partition sets the '
+                'report context.',
+            )
+
+    # Partitions are read in order to keep the rows of the report in order. The chunks of the
+    # partitions that finish before the one being read wait in the spill directory, at worst the
+    # whole output of the later partitions is on disk at once, never in memory.
+    def rows(self, set_extra_context=None):
+        try:
+            for index, (future, output) in enumerate(zip(self.futures, self.outputs)):
+                while True:
+                    kind, data = output.get()
+                    if kind == 'done':
+                        future.result()
+                        break
+                    if kind == 'rows':
+                        yield from _read_chunk(data)
+                    else:
+                        self._set_extra_context(index, data, set_extra_context)
+        finally:
+            self.close()
+
+
+def partitioned_entrypoint(entrypoint_fqn, partitions, reports_dir, report_env, spill_dir):
+    def _entrypoint(client, parameters, progress_callback, *extra_args):
+        run = PartitionedRun(entrypoint_fqn, partitions, reports_dir, report_env, spill_dir)
+        run.start(progress_callback, extra_args[:1])
+        return run.rows(extra_args[1] if extra_args else None)
+
+    return _entrypoint
@@ -0,0 +1,294 @@
+import operator
+
+from executor.batches import (
+    DEFAULT_BATCH_SIZE,
+    from_batches,
+    to_batches,
+    to_batches_async,
+)
+from executor.exceptions import RunnerException
+from executor.sort import ExternalSorter
+
+
+def _compare(op):
+    return lambda value, expected: value is not None and op(value, expected)
+
+
+FILTER_OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': _compare(operator.lt),
+    'le': _compare(operator.le),
+    'gt': _compare(operator.gt),
+    'ge': _compare(operator.ge),
+    'in': lambda value, expected: value in expected,
+    'not_in': lambda value, expected: value not in expected,
+    'is_null': lambda value, expected: value is None,
+    'not_null': lambda value, expected: value is not None,
+}
+COMPARISON_OPERATORS = ('lt', 'le', 'gt', 'ge')
+MEMBERSHIP_OPERATORS = ('in', 'not_in')
+
+
+class _Count:
+    def __init__(self):
+        self.value = 0
+
+    def add(self, value):
+        if value is not None:
+            self.value += 1
+
+    def result(self):
+        return self.value
+
+
+class _Sum:
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if value is not None:
+            self.value = value if self.value is None else self.value + value
+
+    def result(self):
+        return self.value
+
+
+class _Min(_Sum):
+    def add(self, value):
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+
+class _Max(_Sum):
+    def add(self, value):
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+
+class _Avg(_Sum):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def add(self, value):
+        if value is not None:
+            super().add(value)
+            self.count += 1
+
+    def result(self):
+        return self.value / self.count if self.count else None
+
+
+AGGREGATES = {
+    'count': _Count,
+    'sum': _Sum,
+    'min': _Min,
+    'max': _Max,
+    'avg': _Avg,
+}
+
+
+class _Descending:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def resolve_column(column, columns):
+    if isinstance(column, int):
+        return column
+    if column in columns:
+        return columns.index(column)
+    raise RunnerException(f'Unknown post-processing column {column}.')
+
+
+def _column_name(index, columns):
+    return columns[index] if index < len(columns) else None
+
+
+def sort_key(keys):
+    def key(row):
+        values = []
+        for index, descending in keys:
+            value = row[index]
+            value = (value is None, value)
+            values.append(_Descending(value) if descending else value)
+        return tuple(values)
+
+    return key
+
+
+class _Step:
+    def __init__(self, definition, columns):
+        self.columns = columns
+
+    def feed(self, rows):
+        return rows
+
+    def finish(self):
+        return ()
+
+
+class FilterStep(_Step):
+    def __init__(self, definition, columns):
+        super().__init__(definition, columns)
+        operator = definition.get('operator', 'eq')
+        if operator not in FILTER_OPERATORS:
+            raise RunnerException(f'Unknown filter operator {operator}.')
+        value = definition.get('value')
+        if operator in COMPARISON_OPERATORS and value is None:
+            raise RunnerException(f'Post-processing step filter {operator} requires a value.')
+        if operator in MEMBERSHIP_OPERATORS and not isinstance(value, list):
+            raise RunnerException(
+                f'Post-processing step filter {operator} requires a list of values.',
+            )
+        self.index = resolve_column(definition['column'], columns)
+        self.operator = FILTER_OPERATORS[operator]
+        self.value = value
+
+    def feed(self, rows):
+        index, op, value = self.index, self.operator, self.value
+        return [row for row in rows if op(row[index], value)]
+
+
+class SelectStep(_Step):
+    def __init__(self, definition, columns):
+        indexes = [resolve_column(column, columns) for column in definition['columns']]
+        super().__init__(definition, [_column_name(index, columns) for index in indexes])
+        self.indexes = indexes
+
+    def feed(self, rows):
+        indexes = self.indexes
+        return [[row[index] for index in indexes] for row in rows]
+
+
+class SortStep(_Step):
+    def __init__(self, definition, columns):
+        super().__init__(definition, columns)
+        keys = []
+        for key in definition['keys']:
+            if not isinstance(key, dict):
+                key = {'column': key}
+            keys.append((resolve_column(key['column'], columns), key.get('descending', False)))
+        self.sorter = ExternalSorter(key=sort_key(keys))
+
+    def feed(self, rows):
+        self.sorter.extend(rows)
+        return []
+
+    def finish(self):
+        return self.sorter.sorted()
+
+
+class GroupByStep(_Step):
+    def __init__(self, definition, columns):
+        self.indexes = [resolve_column(column, columns) for column in definition['columns']]
+        self.aggregates = []
+        names = [_column_name(index, columns) for index in self.indexes]
+        for aggregate in definition.get('aggregates', []):
+            function = aggregate['function']
+            if function not in AGGREGATES:
+                raise RunnerException(f'Unknown aggregate function {function}.')
+            column = aggregate.get('column')
+            if column is None and function != 'count':
+                raise RunnerException(f'Aggregate function {function} requires a column.')
+            index = None if column is None else resolve_column(column, columns)
+            self.aggregates.append((AGGREGATES[function], index))
+            names.append(aggregate.get('name', f'{function}({"*" if column is None else column})'))
+        super().__init__(definition, names)
+        self.groups = {}
+
+    def feed(self, rows):
+        indexes, aggregates, groups = self.indexes, self.aggregates, self.groups
+        for row in rows:
+            key = tuple(row[index] for index in indexes)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = [function() for function, _ in aggregates]
+            for state, (_, index) in zip(states, aggregates):
+                state.add(True if index is None else row[index])
+        return []
+
+    def finish(self):
+        groups, self.groups = self.groups, {}
+        for key, states in groups.items():
+            yield list(key) + [state.result() for state in states]
+
+
+STEPS = {
+    'filter': FilterStep,
+    'select': SelectStep,
+    'sort': SortStep,
+    'group_by': GroupByStep,
+}
+
+
+class PostProcessor:
+    def __init__(self, steps, columns=(), batches=False, batch_size=DEFAULT_BATCH_SIZE):
+        self.batches = batches
+        self.batch_size = batch_size
+        self.steps = []
+        columns = list(columns)
+        for definition in steps:
+            if definition.get('type') not in STEPS:
+                raise RunnerException(f'Unknown post-processing step {definition.get("type")}.')
+            try:
+                step = STEPS[definition['type']](definition, columns)
+            except KeyError as e:
+                raise RunnerException(
+                    f'Post-processing step {definition["type"]} requires the {e} attribute.',
+                )
+            columns = step.columns
+            self.steps.append(step)
+
+    def _feed(self, steps, rows):
+        for step in steps:
+            if not rows:
+                break
+            rows = step.feed(rows)
+        return rows
+
+    def _finish(self):
+        for idx, step in enumerate(self.steps):
+            for batch in to_batches(step.finish(), self.batch_size):
+                yield from self._feed(self.steps[idx + 1:], batch)
+
+    def process(self, data):
+        if self.batches:
+            data = from_batches(data)
+        for batch in to_batches(data, self.batch_size):
+            yield from self._feed(self.steps, batch)
+        yield from self._finish()
+
+    async def process_async(self, data):
+        async for batch in to_batches_async(data, self.batch_size):
+            if self.batches:
+                batch = list(from_batches(batch))
+            for row in self._feed(self.steps, batch):
+                yield row
+        for row in self._finish():
+            yield row
+
+
+def get_post_processing_steps(renderer_definitions):
+    steps = [(definition.args or {}).get('post_processing') for definition in renderer_definitions]
+    if any(renderer_steps != steps[0] for renderer_steps in steps):
+        raise RunnerException('All renderers must declare the same post-processing steps.')
+    return steps[0]
+
+
+def get_post_processor(renderer_definitions, batches=False):
+    steps = get_post_processing_steps(renderer_definitions)
+    if not steps:
+        return None
+    columns = (renderer_definitions[0].args or {}).get('columns', [])
+    processor = PostProcessor(steps, columns, batches)
+    return processor.process, processor.process_async
@@ -0,0 +1,285 @@
+import inspect
+import json
+import logging
+import os
+import re
+
+from executor.exceptions import RunnerException
+
+
+logger = logging.getLogger('executor')
+
+MAX_DEPTH = 3
+ID_SEGMENT = re.compile(r'^[A-Z]{2,}(-[0-9]+)+$')
+
+
+def get_projection_dir():
+    return os.getenv('REPORTS_PROJECTION_DIR')
+
+
+def get_collection_key(url):
+    path = url.split('?', 1)[0]
+    return '/'.join('*' if ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+def _walk(data, prefix=''):
+    for key, value in data.items():
+        path = f'{prefix}{key}'
+        yield path
+        if isinstance(value, dict) and path.count('.') < MAX_DEPTH - 1:
+            yield from _walk(value, f'{path}.')
+
+
+def _covers(paths, path):
+    return any(other == path or other.startswith(f'{path}.') for other in paths)
+
+
+class CollectionTracker:
+    def __init__(self, exclude=(), on_miss=None):
+        self.exclude = frozenset(exclude)
+        self.on_miss = on_miss
+        self.seen = set()
+        self.accessed = set()
+        self.full = set()
+        self.missed = False
+
+    def observe(self, resource):
+        self.seen.update(_walk(resource))
+
+    def miss(self):
+        # Stop projecting this collection for the rest of the execution.
+        self.exclude = frozenset()
+        if not self.missed and self.on_miss:
+            self.on_miss()
+        self.missed = True
+
+    def get_exclusions(self):
+        if '' in self.full:
+            return []
+        exclusions = []
+        for path in sorted(self.seen, key=lambda path: (path.count('.'), path)):
+            if path == 'id' or _covers(self.accessed, path):
+                continue
+            names = path.split('.')
+            ancestors = {'.'.join(names[:idx]) for idx in range(1, len(names))}
+            if ancestors & self.full or ancestors.intersection(exclusions):
+                continue
+            exclusions.append(path)
+        return exclusions
+
+
+# Only the accessors below are tracked. Reads that bypass them, like json.dumps, str or repr,
+# neither learn the fields they use nor refill the fields excluded by the profile, rows handed
+# over to the renderer are marked as used for that reason.
+class TrackedDict(dict):
+    def __init__(self, data, tracker, fetch=None, path='', root=None):
+        super().__init__(data)
+        self._tracker = tracker
+        self._path = path
+        self._root = root or self
+        if root is None:
+            self._fetch = fetch
+            self._exclude = tracker.exclude
+
+    def _check(self, key):
+        path = f'{self._path}{key}'
+        self._tracker.accessed.add(path)
+        if path in self._root._exclude and not dict.__contains__(self, key):
+            self._root._refill_from_source(path)
+
+    def _wrap(self, key, value):
+        if isinstance(value, dict) and not isinstance(value, TrackedDict):
+            value = TrackedDict(value, self._tracker, path=f'{self._path}{key}.', root=self._root)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _refill_from_source(self, path):
+        self._tracker.miss()
+        resource_id = dict.get(self, 'id')
+        if not self._fetch or resource_id is None:
+            raise RunnerException(
+                f'Field {path} was excluded by the learned projection and cannot be fetched.',
+            )
+        logger.warning(f'Field {path} was excluded by the learned projection, refetching.')
+        self._refill(self._fetch(resource_id))
+        self._exclude = frozenset()
+
+    def _refill(self, data):
+        for key, value in data.items():
+            current = dict.get(self, key)
+            if isinstance(current, TrackedDict) and isinstance(value, dict):
+                current._refill(value)
+            else:
+                dict.__setitem__(self, key, value)
+
+    def use_all(self):
+        path = self._path.rstrip('.')
+        self._tracker.full.add(path)
+        if path:
+            self._tracker.accessed.add(path)
+        if any(excluded.startswith(self._path) for excluded in self._root._exclude):
+            self._root._refill_from_source(path or '*')
+
+    def __getitem__(self, key):
+        self._check(key)
+        return self._wrap(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        self._check(key)
+        if not dict.__contains__(self, key):
+            return default
+        return self._wrap(key, dict.__getitem__(self, key))
+
+    def __contains__(self, key):
+        self._check(key)
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self.use_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.use_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.use_all()
+        return dict.values(self)
+
+    def items(self):
+        self.use_all()
+        return dict.items(self)
+
+    def copy(self):
+        self.use_all()
+        return dict(dict.items(self))
+
+
+def mark_used(value):
+    if isinstance(value, TrackedDict):
+        value.use_all()
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            mark_used(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            mark_used(item)
+
+
+class Projection:
+    def __init__(self, path):
+        self.path = path
+        self.profile = {}
+        if os.path.exists(path):
+            with open(path) as fp:
+                self.profile = json.load(fp)
+        self.learning = not self.profile
+        self.disabled = False
+        self.trackers = {}
+
+    def get_tracker(self, key):
+        if key not in self.trackers:
+            self.trackers[key] = CollectionTracker(self.profile.get(key, ()), self.invalidate)
+        return self.trackers[key]
+
+    def project(self, url):
+        if self.disabled or 'select(' in url:
+            return url, None
+        tracker = self.get_tracker(get_collection_key(url))
+        if not tracker.exclude:
+            return url, tracker
+        select = f'select({",".join(f"-{path}" for path in sorted(tracker.exclude))})'
+        return f'{url}{"&" if "?" in url else "?"}{select}', tracker
+
+    def track(self, results, tracker, fetch):
+        if tracker is None or not isinstance(results, list):
+            return results
+        tracked = []
+        for resource in results:
+            if isinstance(resource, dict):
+                tracker.observe(resource)
+                resource = TrackedDict(resource, tracker, fetch)
+            tracked.append(resource)
+        return tracked
+
+    # Resources handed over to the renderer are used as a whole, json/orjson serialize
+    # dict subclasses without going through the tracked accessors.
+    def mark_rows(self, data):
+        for row in data:
+            mark_used(row)
+            yield row
+
+    async def mark_rows_async(self, data):
+        if not inspect.isasyncgen(data):
+            for row in self.mark_rows(data):
+                yield row
+            return
+        async for row in data:
+            mark_used(row)
+            yield row
+
+    # A miss means the profile is stale, nothing else is projected or learned in this run.
+    def invalidate(self):
+        self.disabled = True
+        if os.path.exists(self.path):
+            logger.info(f'Discarding learned projection {self.path}.')
+            os.remove(self.path)
+
+    def save(self):
+        if not self.learning or self.disabled:
+            return
+        profile = {
+            key: tracker.get_exclusions() for key, tracker in self.trackers.items() if tracker.seen
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as fp:
+            json.dump(profile, fp, indent=2, sort_keys=True)
+        logger.info(f'Learned projection saved to {self.path}.')
+
+    def install(self, client, fallback):
+        get = client.get
+
+        def fetcher(url, kwargs):
+            path = url.split('?', 1)[0]
+            page = None
+
+            # The first miss refetches the whole page once, the resources of the page refill
+            # from it instead of fetching one by one.
+            def fetch(resource_id):
+                nonlocal page
+                if page is None:
+                    results = fallback.get(url, **kwargs)
+                    page = {
+                        resource.get('id'): resource
+                        for resource in results if isinstance(resource, dict)
+                    } if isinstance(results, list) else {}
+                if resource_id in page:
+                    return page.pop(resource_id)
+                return fallback.get(f'{path}/{resource_id}')
+
+            return fetch
+
+        if inspect.iscoroutinefunction(get):
+            async def get_async(url, **kwargs):
+                projected, tracker = self.project(url)
+                return self.track(
+                    await get(projected, **kwargs), tracker, fetcher(url, kwargs),
+                )
+
+            client.get = get_async
+        else:
+            def get_sync(url, **kwargs):
+                projected, tracker = self.project(url)
+                return self.track(get(projected, **kwargs), tracker, fetcher(url, kwargs))
+
+            client.get = get_sync
+        return client
+
+
+def open_projection(template_id):
+    projection_dir = get_projection_dir()
+    if not projection_dir:
+        return None
+    return Projection(
+        os.path.join(projection_dir, f'{template_id}-{os.getenv("COMMIT_ID", "default")}.json'),
+    )
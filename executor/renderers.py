@@ -0,0 +1,580 @@
+import asyncio
+import inspect
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import zipfile
+from copy import copy
+from datetime import datetime
+from functools import partial
+
+import pytz
+from connect.reports.renderers import get_renderer_class as get_core_renderer_class
+from connect.reports.renderers.base import BaseRenderer
+from connect.reports.renderers.csv import CSVRenderer
+from connect.reports.renderers.j2 import Jinja2Renderer
+from connect.reports.renderers.pdf import PDFRenderer
+from connect.reports.renderers.utils import aiter
+from connect.reports.renderers.xlsx import XLSXRenderer
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.styles.colors import WHITE, Color
+
+from executor.batches import accepts_batches, get_batch_size, to_batches
+from executor.exceptions import RunnerException
+from executor.templates import get_template_cache_dir, get_template_environment
+
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+XLSX_MAX_ROWS = 1048576
+TEE_QUEUE_SIZE = 1000
+CSV_WRITE_BUFFER_SIZE = 1024 * 1024
+COLUMNAR_ROW_GROUP_SIZE = 65536
+
+_END = object()
+
+
+def _row_limit_error(row_idx):
+    return ValueError(
+        f'Row numbers must be between 1 and {XLSX_MAX_ROWS}. Row number supplied was {row_idx}',
+    )
+
+
+def _copy_cell(ws, cell):
+    new_cell = WriteOnlyCell(ws, value=cell.value)
+    if cell.has_style:
+        new_cell.font = copy(cell.font)
+        new_cell.fill = copy(cell.fill)
+        new_cell.border = copy(cell.border)
+        new_cell.alignment = copy(cell.alignment)
+        new_cell.number_format = cell.number_format
+    return new_cell
+
+
+def _copy_sheet_layout(source, target):
+    for key, dimension in source.column_dimensions.items():
+        target.column_dimensions[key].width = dimension.width
+
+
+class StreamingXLSXRenderer(XLSXRenderer):
+    def _load_template(self):
+        return load_workbook(os.path.join(self.root_dir, self.template))
+
+    def _create_data_sheet(self, wb, template_ws, index):
+        title = 'Data' if index == 1 else f'Data ({index})'
+        ws = wb.create_sheet(title)
+        _copy_sheet_layout(template_ws, ws)
+        start_row = self.args.get('start_row', 2)
+        for row in template_ws.iter_rows(max_row=start_row - 1):
+            ws.append([_copy_cell(ws, cell) for cell in row])
+        return ws
+
+    def _check_row_count(self, data):
+        start_row = self.args.get('start_row', 2)
+        if self.args.get('overflow', 'fail') == 'fail' and hasattr(data, '__len__'):
+            last_row = start_row + len(data) - 1
+            if last_row > XLSX_MAX_ROWS:
+                raise _row_limit_error(last_row)
+
+    def _writer(self, wb, template):
+        start_col_idx = self.args.get('start_col', 1)
+        start_row = self.args.get('start_row', 2)
+        rollover = self.args.get('overflow', 'fail') == 'rollover'
+        padding = [None] * (start_col_idx - 1)
+
+        data_template_ws = template['Data']
+        for template_ws in template.worksheets:
+            if template_ws is data_template_ws:
+                ws = self._create_data_sheet(wb, template_ws, 1)
+                continue
+            copied_ws = wb.create_sheet(template_ws.title)
+            _copy_sheet_layout(template_ws, copied_ws)
+            for row in template_ws.iter_rows():
+                copied_ws.append([_copy_cell(copied_ws, cell) for cell in row])
+
+        sheet_idx = 1
+        row_idx = start_row
+        while True:
+            row = yield
+            if row_idx > XLSX_MAX_ROWS:
+                if not rollover:
+                    raise _row_limit_error(row_idx)
+                sheet_idx += 1
+                ws = self._create_data_sheet(wb, data_template_ws, sheet_idx)
+                row_idx = start_row
+            ws.append(padding + list(row))
+            row_idx += 1
+
+    def _create_writer(self, wb, template):
+        writer = self._writer(wb, template)
+        next(writer)
+        return writer
+
+    def _discard(self, wb):
+        for ws in wb.worksheets:
+            if not ws.closed:
+                ws.close()
+
+    def generate_report(self, data, output_file):
+        self._check_row_count(data)
+        template = self._load_template()
+        wb = Workbook(write_only=True)
+        writer = self._create_writer(wb, template)
+        try:
+            for row in data:
+                writer.send(row)
+        except Exception:
+            self._discard(wb)
+            raise
+        writer.close()
+        self._add_streaming_info_sheet(wb.create_sheet('Info'), self.start_time)
+
+        output_file = f'{output_file}.xlsx'
+        wb.save(output_file)
+        return output_file
+
+    async def generate_report_async(self, data, output_file):
+        self._check_row_count(data)
+        template = await self._to_thread(self._load_template)
+        wb = Workbook(write_only=True)
+        writer = self._create_writer(wb, template)
+        if not hasattr(data, '__anext__'):
+            data = aiter(data)
+        try:
+            async for row in data:
+                writer.send(row)
+        except Exception:
+            self._discard(wb)
+            raise
+        writer.close()
+        self._add_streaming_info_sheet(wb.create_sheet('Info'), self.start_time)
+
+        output_file = f'{output_file}.xlsx'
+        await self._to_thread(wb.save, output_file)
+        return output_file
+
+    def _add_streaming_info_sheet(self, ws, start_time):
+        ws.column_dimensions['A'].width = 50
+        ws.column_dimensions['B'].width = 180
+        ws.merged_cells.add('A1:B1')
+
+        title = WriteOnlyCell(ws, value='Report Execution Information')
+        title.fill = PatternFill('solid', start_color=Color('1565C0'))
+        title.font = Font(sz=24, color=WHITE)
+        title.alignment = Alignment(horizontal='center', vertical='center')
+        ws.append([title])
+
+        rows = [
+            ('Report Start time', start_time.strftime('%Y-%m-%d %H:%M:%S')),
+            (
+                'Report Finish time',
+                datetime.now(tz=pytz.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            ),
+            ('Account ID', self.account.id),
+            ('Account Name', self.account.name),
+            ('Report ID', self.report.id),
+            ('Report Name', self.report.name),
+            ('Runtime environment', self.environment),
+            (
+                'Report execution parameters',
+                json.dumps(self.report.values, indent=4, sort_keys=True),
+            ),
+        ]
+        for label, value in rows:
+            label_cell = WriteOnlyCell(ws, value=label)
+            label_cell.alignment = Alignment(horizontal='left', vertical='top')
+            value_cell = WriteOnlyCell(ws, value=value)
+            value_cell.alignment = Alignment(
+                horizontal='left',
+                vertical='top',
+                wrap_text=label == 'Report execution parameters',
+            )
+            ws.append([label_cell, value_cell])
+
+
+class _RenderThread(threading.Thread):
+    def __init__(self, renderer_id, renderer, output_file, start_time):
+        super().__init__(daemon=True)
+        self.renderer_id = renderer_id
+        self.renderer = renderer
+        self.output_file = output_file
+        self.start_time = start_time
+        self.queue = queue.Queue(maxsize=TEE_QUEUE_SIZE)
+        self.result = None
+        self.error = None
+
+    def rows(self):
+        while True:
+            row = self.queue.get()
+            if row is _END:
+                return
+            yield row
+
+    def run(self):
+        data = self.rows()
+        if accepts_batches(self.renderer):
+            data = to_batches(data, get_batch_size())
+        try:
+            self.result = self.renderer.render(
+                data,
+                self.output_file,
+                start_time=self.start_time,
+            )
+        except Exception as e:
+            self.error = e
+            for _ in self.rows():
+                pass
+
+
+class MultiRenderer:
+    def __init__(self, renderers):
+        self.renderers = renderers
+
+    def set_extra_context(self, data):
+        for _, renderer in self.renderers:
+            renderer.set_extra_context(data)
+
+    def _start(self, output_dir, start_time):
+        threads = [
+            _RenderThread(renderer_id, renderer, os.path.join(output_dir, renderer_id), start_time)
+            for renderer_id, renderer in self.renderers
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _put(self, threads, row):
+        for thread in threads:
+            if thread.error:
+                raise thread.error
+            thread.queue.put(row)
+
+    def _finish(self, threads):
+        for thread in threads:
+            thread.queue.put(_END)
+        for thread in threads:
+            thread.join()
+        for thread in threads:
+            if thread.error:
+                raise thread.error
+
+    async def _put_async(self, threads, row):
+        for thread in threads:
+            if thread.error:
+                raise thread.error
+            try:
+                thread.queue.put_nowait(row)
+            except queue.Full:
+                # A slow renderer must not block the loop running the entrypoint.
+                await asyncio.get_running_loop().run_in_executor(None, thread.queue.put, row)
+
+    # Archives produced by the renderers are unpacked in a folder named after the renderer.
+    def _pack(self, threads, output_file):
+        tokens = output_file.split('.')
+        if tokens[-1] != 'zip':
+            output_file = f'{tokens[0]}.zip'
+        with zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_DEFLATED) as repzip:
+            for thread in threads:
+                if not thread.result.endswith('.zip'):
+                    repzip.write(thread.result, os.path.basename(thread.result))
+                    continue
+                with zipfile.ZipFile(thread.result) as renderer_zip:
+                    for info in renderer_zip.infolist():
+                        target = f'{thread.renderer_id}/{info.filename}'
+                        with renderer_zip.open(info) as src, repzip.open(target, 'w') as dst:
+                            shutil.copyfileobj(src, dst)
+        return output_file
+
+    def render(self, data, output_file, start_time=None):
+        with tempfile.TemporaryDirectory() as output_dir:
+            threads = self._start(output_dir, start_time)
+            try:
+                for row in data:
+                    self._put(threads, row)
+            finally:
+                self._finish(threads)
+            return self._pack(threads, output_file)
+
+    async def render_async(self, data, output_file, start_time=None):
+        loop = asyncio.get_running_loop()
+        if not inspect.isasyncgen(data):
+            return await loop.run_in_executor(
+                None,
+                partial(self.render, data, output_file, start_time=start_time),
+            )
+        with tempfile.TemporaryDirectory() as output_dir:
+            threads = self._start(output_dir, start_time)
+            try:
+                async for row in data:
+                    await self._put_async(threads, row)
+            finally:
+                await loop.run_in_executor(None, self._finish, threads)
+            return await loop.run_in_executor(None, self._pack, threads, output_file)
+
+
+def encode_csv_rows(rows):
+    lines = []
+    for row in rows:
+        fields = ['' if value is None else str(value).replace('"', '""') for value in row]
+        lines.append('"' + '";"'.join(fields) + '"\r\n' if fields else '\r\n')
+    return ''.join(lines)
+
+
+class BatchCSVRenderer(CSVRenderer):
+    accepts_batches = True
+
+    def _open(self, output_file):
+        tokens = output_file.split('.')
+        if tokens[-1] != 'csv':
+            output_file = f'{tokens[0]}.csv'
+        return output_file, open(output_file, 'w', buffering=CSV_WRITE_BUFFER_SIZE)
+
+    def generate_report(self, data, output_file):
+        output_file, fp = self._open(output_file)
+        with fp:
+            for batch in data:
+                fp.write(encode_csv_rows(batch))
+        return output_file
+
+    async def generate_report_async(self, data, output_file):
+        output_file, fp = self._open(output_file)
+        with fp:
+            if not inspect.isasyncgen(data):
+                data = aiter(data)
+            async for batch in data:
+                await self._to_thread(fp.write, encode_csv_rows(batch))
+        return output_file
+
+
+class _ColumnarWriter:
+    def __init__(self, renderer, output_file):
+        self.renderer = renderer
+        self.output_file = output_file
+        self.row_group_size = renderer.args.get('row_group_size', COLUMNAR_ROW_GROUP_SIZE)
+        self.rows = []
+        self.schema = None
+        self.writer = None
+
+    def write(self, batch):
+        self.rows.extend(batch)
+        while len(self.rows) >= self.row_group_size:
+            self._flush(self.rows[:self.row_group_size])
+            self.rows = self.rows[self.row_group_size:]
+
+    def close(self):
+        if self.rows:
+            self._flush(self.rows)
+            self.rows = []
+        if self.writer is None:
+            self.schema = self.renderer.get_schema()
+            self.writer = self.renderer.open_writer(self.output_file, self.schema)
+        self.writer.close()
+
+    def _flush(self, rows):
+        record_batch = self.renderer.to_record_batch(rows, self.schema)
+        if self.writer is None:
+            self.schema = record_batch.schema
+            self.writer = self.renderer.open_writer(self.output_file, self.schema)
+        self.renderer.write_batch(self.writer, record_batch)
+
+
+class ColumnarRenderer(BaseRenderer):
+    accepts_batches = True
+    extension = None
+
+    def get_columns(self, width=0):
+        columns = list(self.args.get('columns', []))
+        return columns + [f'column_{idx}' for idx in range(len(columns) + 1, width + 1)]
+
+    def get_type(self, name):
+        types = self.args.get('types', {})
+        return pyarrow.type_for_alias(types[name]) if name in types else None
+
+    def get_compression(self):
+        compression = self.args.get('compression', 'zstd')
+        return None if compression == 'none' else compression
+
+    def get_schema(self):
+        return pyarrow.schema(
+            [(name, self.get_type(name) or pyarrow.string()) for name in self.get_columns()],
+        )
+
+    # Columns without values in the first row group, nor a declared type, are written as strings.
+    def infer_array(self, name, values):
+        array = pyarrow.array(values, type=self.get_type(name))
+        return array.cast(pyarrow.string()) if pyarrow.types.is_null(array.type) else array
+
+    # The writer schema is fixed by the first row group, later ones are cast to it.
+    def conform_array(self, field, values):
+        try:
+            return pyarrow.array(values).cast(field.type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError):
+            raise RunnerException(
+                f'Column {field.name} was written as {field.type} but a later row group '
+                'contains values of another type, declare it in the renderer types argument.',
+            )
+
+    def to_record_batch(self, rows, schema=None):
+        columns = list(zip(*rows))
+        if schema is None:
+            names = self.get_columns(len(columns))
+            return pyarrow.RecordBatch.from_arrays(
+                [self.infer_array(name, values) for name, values in zip(names, columns)],
+                names=names,
+            )
+        return pyarrow.RecordBatch.from_arrays(
+            [self.conform_array(field, values) for field, values in zip(schema, columns)],
+            schema=schema,
+        )
+
+    def open_writer(self, output_file, schema):
+        raise NotImplementedError
+
+    def write_batch(self, writer, record_batch):
+        writer.write_batch(record_batch)
+
+    def _create_writer(self, output_file):
+        if pyarrow is None:
+            raise RunnerException(
+                f'The {self.extension} renderer requires the pyarrow package, '
+                'install connect-reports-runner with the columnar extra.',
+            )
+        return _ColumnarWriter(self, f'{output_file}.{self.extension}')
+
+    def generate_report(self, data, output_file):
+        writer = self._create_writer(output_file)
+        for batch in data:
+            writer.write(batch)
+        writer.close()
+        return writer.output_file
+
+    async def generate_report_async(self, data, output_file):
+        writer = self._create_writer(output_file)
+        if not inspect.isasyncgen(data):
+            data = aiter(data)
+        async for batch in data:
+            await self._to_thread(writer.write, batch)
+        await self._to_thread(writer.close)
+        return writer.output_file
+
+
+class ParquetRenderer(ColumnarRenderer):
+    extension = 'parquet'
+
+    def open_writer(self, output_file, schema):
+        return pyarrow.parquet.ParquetWriter(
+            output_file,
+            schema,
+            compression=self.get_compression() or 'none',
+        )
+
+    def write_batch(self, writer, record_batch):
+        writer.write_table(pyarrow.Table.from_batches([record_batch]))
+
+
+class ArrowRenderer(ColumnarRenderer):
+    extension = 'arrow'
+
+    def open_writer(self, output_file, schema):
+        return pyarrow.ipc.new_file(
+            output_file,
+            schema,
+            options=pyarrow.ipc.IpcWriteOptions(compression=self.get_compression()),
+        )
+
+
+COLUMNAR_RENDERERS = {
+    'parquet': ParquetRenderer,
+    'arrow': ArrowRenderer,
+}
+
+
+class CachedJinja2Renderer(Jinja2Renderer):
+    def _get_template(self, enable_async=False):
+        path, name = self.template.rsplit('/', 1)
+        env = get_template_environment(os.path.join(self.root_dir, path), enable_async)
+        _, ext, _ = name.rsplit('.', 2)
+        return env.get_template(name), ext
+
+    def generate_report(self, data, output_file):
+        template, ext = self._get_template()
+        report_file = f'{output_file}.{ext}'
+        with open(report_file, 'w') as writer:
+            template.stream(self.get_context(data)).dump(writer)
+        return report_file
+
+    async def generate_report_async(self, data, output_file):
+        template, ext = self._get_template(enable_async=True)
+        report_file = f'{output_file}.{ext}'
+        with open(report_file, 'w') as writer:
+            async for line in template.generate_async(self.get_context(data)):
+                await self._to_thread(writer.write, line)
+        return report_file
+
+
+# PDFRenderer renders its HTML through super(), which resolves to the cached renderer here.
+class CachedPDFRenderer(PDFRenderer, CachedJinja2Renderer):
+    pass
+
+
+TEMPLATE_RENDERERS = {
+    'jinja2': CachedJinja2Renderer,
+    'pdf': CachedPDFRenderer,
+}
+
+
+# The entrypoint runs once and receives a single renderer_type, renderers can only be combined
+# when they consume the same rows. Tabular renderers share list rows, any other type (json rows
+# are usually dicts, templates get their own context) only combines with itself.
+TABULAR_RENDERERS = ('xlsx', 'csv', 'parquet', 'arrow')
+
+
+def get_row_shape(renderer_type):
+    return 'tabular' if renderer_type in TABULAR_RENDERERS else renderer_type
+
+
+def check_row_shapes(renderer_definitions):
+    first = renderer_definitions[0]
+    for definition in renderer_definitions[1:]:
+        if get_row_shape(definition.type) != get_row_shape(first.type):
+            raise RunnerException(
+                f'Renderers {first.id} ({first.type}) and {definition.id} ({definition.type}) '
+                'expect differently shaped rows and cannot be combined in one execution.',
+            )
+
+
+STREAMING_RENDERERS = (StreamingXLSXRenderer, BatchCSVRenderer, ColumnarRenderer)
+
+
+def accumulates_rows(renderer):
+    if isinstance(renderer, MultiRenderer):
+        return any(accumulates_rows(child) for _, child in renderer.renderers)
+    return not isinstance(renderer, STREAMING_RENDERERS)
+
+
+def get_renderer_class(renderer_type, args):
+    if renderer_type == 'xlsx' and args.get('streaming'):
+        return StreamingXLSXRenderer
+    if renderer_type == 'csv':
+        return BatchCSVRenderer
+    if renderer_type in COLUMNAR_RENDERERS:
+        return COLUMNAR_RENDERERS[renderer_type]
+    if renderer_type in TEMPLATE_RENDERERS and get_template_cache_dir():
+        return TEMPLATE_RENDERERS[renderer_type]
+    return get_core_renderer_class(renderer_type)
+
+
+def get_renderer(renderer_type, environment, root_dir, account, report, template=None, args=None):
+    cls = get_renderer_class(renderer_type, args or {})
+    return cls(environment, root_dir, account, report, template, args)
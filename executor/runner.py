@@ -1,27 +1,61 @@
 import logging
 import subprocess
+import sys
 
 from connect.client import ClientError, ConnectClient
 
+from executor.cassette import create_client
+from executor.dependencies import get_executor_python
+from executor.estimation import RESCHEDULE_EXIT_CODE
 from executor.exception_handler import fail_report
-from executor.utils import get_report_env, get_user_agent
+from executor.log import configure_logging, is_json_logging, set_log_context
+from executor.metrics import (
+    EXECUTIONS,
+    FAILURES,
+    PHASE_DURATION,
+    setup_metrics,
+)
+from executor.outbox import open_outbox
+from executor.utils import get_default_reports_dir, get_report_env, get_user_agent
 
 
 logger = logging.getLogger('runner')
 
+LOG_OUTPUT_TAIL = 10000
 
-def run_executor():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s %(name)s %(levelname)s PID_%(process)d %(message)s',
+
+def get_control_client(report_env):
+    return create_client(
+        ConnectClient,
+        endpoint=report_env['api_endpoint'],
+        use_specs=False,
+        api_key=report_env['client_token'],
+        max_retries=3,
+        default_headers=get_user_agent(),
     )
 
+
+def drain_outbox(outbox, client, report_id):
+    try:
+        delivered = outbox.drain(client)
+    except ClientError as ce:
+        logger.warning(f'Cannot deliver pending actions of report {report_id}: {ce}')
+        return
+    if delivered:
+        logger.info(f'Delivered {delivered} pending actions of report {report_id}.')
+
+
+def run_executor():
+    configure_logging()
+    setup_metrics('runner')
+
     report_env = get_report_env()
     report_id = report_env['report_id']
+    set_log_context(report_id=report_id)
 
     proc = subprocess.Popen(
         [
-            'python',
+            get_executor_python(get_default_reports_dir()),
             '-m',
             'executor.executor',
         ],
@@ -29,21 +63,51 @@ def run_executor():
         stderr=subprocess.PIPE,
     )
     logger.info(f'Executor started: PID {proc.pid}, report: {report_id}')
-    stdout, stderr = proc.communicate()
+    with PHASE_DURATION.time(phase='total'):
+        stdout, stderr = proc.communicate()
+
+    outbox = open_outbox(report_id)
+    exit_code = handle_executor_exit(proc, stdout, stderr, report_env, outbox)
+    if outbox and not outbox.pending():
+        outbox.remove()
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def handle_executor_exit(proc, stdout, stderr, report_env, outbox):
+    report_id = report_env['report_id']
+    client = get_control_client(report_env)
+    if outbox:
+        drain_outbox(outbox, client, report_id)
 
     if proc.returncode == 0:
+        EXECUTIONS.inc(result='success')
         logger.info('Executor process has exited with 0.')
         return
 
-    logger.error(f'Executor process has exited with {proc.returncode}: {stdout=} {stderr=}.')
+    if proc.returncode == RESCHEDULE_EXIT_CODE:
+        EXECUTIONS.inc(result='rescheduled')
+        logger.info(f'Report {report_id} must be rescheduled on a larger resource class.')
+        return RESCHEDULE_EXIT_CODE
+
+    EXECUTIONS.inc(result='failure')
+    FAILURES.inc(category='executor_exit')
+
+    if is_json_logging():
+        logger.error(
+            f'Executor process has exited with {proc.returncode}.',
+            extra={
+                'stdout': stdout[-LOG_OUTPUT_TAIL:].decode(errors='replace'),
+                'stderr': stderr[-LOG_OUTPUT_TAIL:].decode(errors='replace'),
+            },
+        )
+    else:
+        logger.error(f'Executor process has exited with {proc.returncode}: {stdout=} {stderr=}.')
+
+    if outbox and outbox.is_terminal_delivered():
+        logger.info(f'Report {report_id} has already been switched to a final status.')
+        return
 
-    client = ConnectClient(
-        endpoint=report_env['api_endpoint'],
-        use_specs=False,
-        api_key=report_env['client_token'],
-        max_retries=3,
-        default_headers=get_user_agent(),
-    )
     try:
         fail_report(
             client,
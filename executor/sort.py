@@ -0,0 +1,105 @@
+import heapq
+import inspect
+import os
+import pickle
+import tempfile
+
+from executor.spill import get_spill_dir
+
+
+DEFAULT_SORT_BUFFER_SIZE = 100000
+RUN_CHUNK_SIZE = 1000
+
+
+def get_sort_buffer_size():
+    return int(os.getenv('REPORTS_SORT_BUFFER_SIZE', DEFAULT_SORT_BUFFER_SIZE))
+
+
+def _read_run(path):
+    with open(path, 'rb') as fp:
+        while True:
+            try:
+                chunk = pickle.load(fp)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class ExternalSorter:
+    def __init__(self, key=None, reverse=False, buffer_size=None, directory=None):
+        self.key = key
+        self.reverse = reverse
+        self.buffer_size = buffer_size or get_sort_buffer_size()
+        self.directory = directory or get_spill_dir()
+        self.rows = []
+        self.runs = []
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_size:
+            self._spill()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def _spill(self):
+        self.rows.sort(key=self.key, reverse=self.reverse)
+        fd, path = tempfile.mkstemp(prefix='sort_', suffix='.run', dir=self.directory)
+        self.runs.append(path)
+        with os.fdopen(fd, 'wb') as fp:
+            for idx in range(0, len(self.rows), RUN_CHUNK_SIZE):
+                pickle.dump(
+                    self.rows[idx:idx + RUN_CHUNK_SIZE],
+                    fp,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+        self.rows = []
+
+    def sorted(self):
+        self.rows.sort(key=self.key, reverse=self.reverse)
+        rows, self.rows = self.rows, []
+        runs, self.runs = self.runs, []
+        if not runs:
+            yield from rows
+            return
+        readers = [_read_run(path) for path in runs]
+        try:
+            yield from heapq.merge(*readers, rows, key=self.key, reverse=self.reverse)
+        finally:
+            for reader in readers:
+                reader.close()
+            for path in runs:
+                os.remove(path)
+
+    def close(self):
+        for path in self.runs:
+            os.remove(path)
+        self.rows = []
+        self.runs = []
+
+
+def external_sort(rows, key=None, reverse=False, buffer_size=None, directory=None):
+    sorter = ExternalSorter(key, reverse, buffer_size, directory)
+    try:
+        sorter.extend(rows)
+    except BaseException:
+        sorter.close()
+        raise
+    return sorter.sorted()
+
+
+async def external_sort_async(rows, key=None, reverse=False, buffer_size=None, directory=None):
+    if not inspect.isasyncgen(rows):
+        for row in external_sort(rows, key, reverse, buffer_size, directory):
+            yield row
+        return
+    sorter = ExternalSorter(key, reverse, buffer_size, directory)
+    try:
+        async for row in rows:
+            sorter.add(row)
+    except BaseException:
+        sorter.close()
+        raise
+    for row in sorter.sorted():
+        yield row
@@ -0,0 +1,117 @@
+import inspect
+import os
+import pickle
+import sqlite3
+import tempfile
+
+
+DEFAULT_SPILL_BATCH_SIZE = 1000
+
+
+def get_spill_dir():
+    return os.getenv('REPORTS_SPILL_DIR', tempfile.gettempdir())
+
+
+def is_spill_enabled(renderer_definition):
+    args = renderer_definition.args or {}
+    return bool(args.get('spill_to_disk') or os.getenv('REPORTS_SPILL_TO_DISK'))
+
+
+class RowStore:
+    def __init__(self, directory=None, batch_size=DEFAULT_SPILL_BATCH_SIZE, path=None):
+        self.batch_size = batch_size
+        self._buffer = []
+        if path:
+            self.path = path
+            self._connect()
+            self.count = self._connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+            return
+        fd, self.path = tempfile.mkstemp(prefix='rows_', suffix='.sqlite', dir=directory)
+        os.close(fd)
+        self.count = 0
+        self._connect()
+        self._connection.execute('CREATE TABLE rows (row BLOB NOT NULL)')
+
+    def _connect(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=OFF')
+        self._connection.execute('PRAGMA synchronous=OFF')
+
+    def __len__(self):
+        return self.count + len(self._buffer)
+
+    def append(self, row):
+        self._buffer.append((pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL),))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    async def extend_async(self, rows):
+        if not inspect.isasyncgen(rows):
+            return self.extend(rows)
+        async for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self._connection.executemany('INSERT INTO rows (row) VALUES (?)', self._buffer)
+        self._connection.commit()
+        self.count += len(self._buffer)
+        self._buffer = []
+
+    def rows(self, close=False):
+        self.flush()
+        cursor = self._connection.execute('SELECT row FROM rows ORDER BY rowid')
+        try:
+            while True:
+                batch = cursor.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                for (row,) in batch:
+                    yield pickle.loads(row)
+        finally:
+            cursor.close()
+            if close:
+                self.close()
+
+    async def rows_async(self, close=False):
+        for row in self.rows(close=close):
+            yield row
+
+    def detach(self):
+        self.flush()
+        self._connection.close()
+        return self.path
+
+    def close(self):
+        self._connection.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _store_rows(data, directory):
+    store = RowStore(directory)
+    try:
+        store.extend(data)
+    except Exception:
+        store.close()
+        raise
+    return store
+
+
+# Only rows returned as a whole are moved to disk, the list is released before rendering starts.
+# Streamed rows never pile up in memory, spilling them would only add a write and a read.
+def spill_rows(data, directory=None):
+    if not isinstance(data, (list, tuple)):
+        return data
+    return _store_rows(data, directory).rows(close=True)
+
+
+async def spill_rows_async(data, directory=None):
+    if not isinstance(data, (list, tuple)):
+        return data
+    return _store_rows(data, directory).rows_async(close=True)
@@ -0,0 +1,68 @@
+import logging
+import os
+import sys
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    TemplateError,
+    select_autoescape,
+)
+
+from executor.log import configure_logging
+from executor.utils import get_default_reports_dir
+
+
+logger = logging.getLogger('executor')
+
+
+def get_template_cache_dir():
+    cache_dir = os.getenv('REPORTS_TEMPLATE_CACHE_DIR')
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, os.getenv('COMMIT_ID', 'default'))
+
+
+def get_bytecode_cache(enable_async=False):
+    cache_dir = get_template_cache_dir()
+    if not cache_dir:
+        return None
+    # Async environments compile templates differently, they can't share bytecode.
+    directory = os.path.join(cache_dir, 'async' if enable_async else 'sync')
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def get_template_environment(template_dir, enable_async=False):
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=select_autoescape(['html', 'xml']),
+        enable_async=enable_async,
+        bytecode_cache=get_bytecode_cache(enable_async),
+    )
+
+
+def warm_template_cache(reports_dir):
+    if not get_template_cache_dir():
+        return 0
+    compiled = 0
+    for root, dirs, files in os.walk(reports_dir):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            if not name.endswith('.j2'):
+                continue
+            try:
+                for enable_async in (False, True):
+                    get_template_environment(root, enable_async).get_template(name)
+            except TemplateError:
+                logger.warning(f'Cannot compile template {os.path.join(root, name)}.')
+                continue
+            compiled += 1
+    return compiled
+
+
+if __name__ == '__main__':  # pragma: no cover
+    configure_logging()
+    reports_dir = sys.argv[1] if len(sys.argv) > 1 else get_default_reports_dir()
+    logger.info(f'Compiled {warm_template_cache(reports_dir)} templates.')
@@ -1,13 +1,32 @@
+import hashlib
 import json
+import logging
 import os
+import pickle
 import platform
 from importlib import import_module
 
+from connect.client import AsyncConnectClient, ConnectClient
 from connect.reports.parser import parse
 from connect.reports.validator import validate, validate_with_schema
 from pkg_resources import DistributionNotFound, get_distribution
 
+from executor.cassette import create_client
+from executor.decoding import loads
 from executor.exceptions import RunnerException
+from executor.metrics import UPLOADED_BYTES, MetricsRequestLogger
+from executor.outbox import post_report_action
+
+
+logger = logging.getLogger('executor')
+
+
+# Report specifications handled by the runner on top of the ones known by reports core.
+# They are validated as spec 2 and restored once the repository definition is parsed.
+RUNNER_REPORT_SPECS = ('3', '4')
+# Renderer types implemented by the runner, unknown to the reports core registry. They are
+# validated as csv renderers, which only need an id and a type, and restored after validation.
+RUNNER_RENDERERS = ('parquet', 'arrow')
 
 
 def get_report(client, report_id):
@@ -27,6 +46,12 @@ def get_report_entrypoint(func_fqn):
     return getattr(module, func_name)
 
 
+def get_report_hook(func_fqn, hook_name):
+    module_name, _ = func_fqn.rsplit('.', 1)
+    module = import_module(module_name)
+    return getattr(module, hook_name, None)
+
+
 def get_report_env():
     # Environment variables needed
     report_id = os.getenv('REPORT_ID', None)
@@ -60,12 +85,50 @@ def get_default_reports_dir():
     )
 
 
+def _downgrade_runner_specs(data):
+    specs = []
+    if not isinstance(data, dict) or not isinstance(data.get('reports'), list):
+        return specs
+    for report in data['reports']:
+        spec = report.get('report_spec') if isinstance(report, dict) else None
+        specs.append(spec)
+        if spec in RUNNER_REPORT_SPECS:
+            report['report_spec'] = '2'
+    return specs
+
+
+def _downgrade_runner_renderers(data):
+    types = []
+    if not isinstance(data, dict) or not isinstance(data.get('reports'), list):
+        return types
+    for report in data['reports']:
+        renderers = report.get('renderers') if isinstance(report, dict) else None
+        renderers = renderers if isinstance(renderers, list) else []
+        types.append([
+            renderer.get('type') if isinstance(renderer, dict) else None
+            for renderer in renderers
+        ])
+        for renderer, renderer_type in zip(renderers, types[-1]):
+            if renderer_type in RUNNER_RENDERERS:
+                renderer['type'] = 'csv'
+    return types
+
+
+def _restore_runner_renderers(repository_definition, types):
+    for report, renderer_types in zip(repository_definition.reports, types):
+        for renderer, renderer_type in zip(report.renderers or [], renderer_types):
+            if renderer_type in RUNNER_RENDERERS:
+                renderer.type = renderer_type
+
+
 def load_descriptor_file(root_path: str):
     descriptor_file = os.path.join(root_path, 'reports.json')
     if not os.path.exists(descriptor_file):
         raise RunnerException('`reports.json` does not exist.')
     try:
         data = json.load(open(descriptor_file, 'r'))
+        specs = _downgrade_runner_specs(data)
+        renderer_types = _downgrade_runner_renderers(data)
         errors = validate_with_schema(data)
         if errors:
             raise RunnerException(f'Invalid `reports.json`: {errors}')
@@ -73,14 +136,56 @@ def load_descriptor_file(root_path: str):
         errors = validate(repository_definition)
         if errors:
             raise RunnerException(f'Invalid `reports.json`: {",".join(errors)}')
+        for report, spec in zip(repository_definition.reports, specs):
+            if spec in RUNNER_REPORT_SPECS:
+                report.report_spec = spec
+        _restore_runner_renderers(repository_definition, renderer_types)
         return repository_definition
     except json.JSONDecodeError:
         raise RunnerException('`reports.json` is not a valid json file.')
 
 
+def get_definition_cache_file(root_path):
+    cache_dir = os.getenv('REPORTS_DEFINITION_CACHE_DIR')
+    if not cache_dir:
+        return None
+    try:
+        with open(os.path.join(root_path, 'reports.json'), 'rb') as fp:
+            descriptor = fp.read()
+    except OSError:
+        return None
+    # The runner version invalidates definitions pickled by another version of the classes.
+    key = b'\0'.join((get_version().encode('utf-8'), root_path.encode('utf-8'), descriptor))
+    descriptor_hash = hashlib.sha256(key).hexdigest()
+    return os.path.join(cache_dir, f'{descriptor_hash}.pickle')
+
+
+def store_repository_definition(root_path, repository_definition):
+    cache_file = get_definition_cache_file(root_path)
+    if not cache_file:
+        return None
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as fp:
+        pickle.dump(repository_definition, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    return cache_file
+
+
+def load_repository_definition(root_path):
+    cache_file = get_definition_cache_file(root_path)
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as fp:
+                return pickle.load(fp)
+        except Exception:
+            logger.warning(f'Cannot load the cached definition {cache_file}.', exc_info=True)
+    return load_descriptor_file(root_path)
+
+
 def get_report_definition(entrypoint):
     root_path = get_default_reports_dir()
-    repo_definition = load_descriptor_file(root_path)
+    repo_definition = load_repository_definition(root_path)
     report = [reprt for reprt in repo_definition.reports if reprt.entrypoint == entrypoint][0]
     return report
 
@@ -106,6 +211,22 @@ def get_user_agent():
     }
 
 
+def get_report_client(report_env, is_async=False):
+    client_class = AsyncConnectClient if is_async else ConnectClient
+    return create_client(
+        client_class,
+        endpoint=report_env["api_endpoint"],
+        use_specs=False,
+        api_key=report_env["client_token"],
+        max_retries=5,
+        default_limit=500,
+        default_headers=get_user_agent(),
+        timeout=(180, 1500),
+        resourceset_append=False,
+        logger=MetricsRequestLogger(),
+    )
+
+
 def upload_file(client, report_name, report_id, owner_id):
     report_filename = os.path.basename(report_name)
     _, report_extension = report_filename.rsplit('.', 1)
@@ -118,7 +239,12 @@ def upload_file(client, report_name, report_id, owner_id):
         },
     )
 
-    return client.ns('reporting').reports[report_id].action('upload').post(
-        payload={'file': {'id': json.loads(media_file)['id']}},
-        headers=get_user_agent(),
+    response = post_report_action(
+        client,
+        report_id,
+        'upload',
+        {'file': {'id': loads(media_file)['id']}},
+        get_user_agent(),
     )
+    UPLOADED_BYTES.inc(os.path.getsize(report_name))
+    return response
@@ -0,0 +1,57 @@
+import compileall
+import logging
+import sys
+
+from executor.exceptions import RunnerException
+from executor.log import configure_logging
+from executor.templates import warm_template_cache
+from executor.utils import (
+    get_default_reports_dir,
+    get_report_entrypoint,
+    load_descriptor_file,
+    store_repository_definition,
+)
+
+
+logger = logging.getLogger('executor')
+
+
+def compile_repository(reports_dir):
+    return compileall.compile_dir(reports_dir, quiet=1, workers=0)
+
+
+def resolve_entrypoints(repository_definition, reports_dir):
+    if reports_dir not in sys.path:
+        sys.path.append(reports_dir)
+    errors = {}
+    for report in repository_definition.reports:
+        try:
+            get_report_entrypoint(report.entrypoint)
+        except Exception as e:
+            logger.error(f'Cannot import report entrypoint {report.entrypoint}: {e}')
+            errors[report.entrypoint] = e
+    return errors
+
+
+def warm_up(reports_dir):
+    if not compile_repository(reports_dir):
+        logger.warning(f'Some files of {reports_dir} cannot be compiled.')
+    repository_definition = load_descriptor_file(reports_dir)
+    errors = resolve_entrypoints(repository_definition, reports_dir)
+    store_repository_definition(reports_dir, repository_definition)
+    templates = warm_template_cache(reports_dir)
+    logger.info(
+        f'Report repository warmed up: {len(repository_definition.reports)} reports, '
+        f'{len(errors)} entrypoint errors, {templates} templates compiled.',
+    )
+    return errors
+
+
+if __name__ == '__main__':  # pragma: no cover
+    configure_logging()
+    try:
+        errors = warm_up(sys.argv[1] if len(sys.argv) > 1 else get_default_reports_dir())
+    except RunnerException as e:
+        logger.error(f'Cannot warm up report repository: {e}')
+        sys.exit(1)
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue
+# All rights reserved.
+#
+from executor.checkpoint import Checkpoint, get_resume_cursor
+
+
+ROWS = [['MP-1', 1], ['MP-1', 2], ['MP-2', 3]]
+
+
+def generate(client, parameters, progress_callback, renderer_type, extra_context_callback):
+    start = get_resume_cursor() or 0
+    yield Checkpoint(start)
+    for idx in range(start, len(ROWS)):
+        yield ROWS[idx]
+        yield Checkpoint(idx + 1)
+    progress_callback(10, 10)
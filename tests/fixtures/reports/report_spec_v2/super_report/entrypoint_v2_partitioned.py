@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue
+# All rights reserved.
+#
+
+def partition(parameters):
+    return [{'size': size} for size in parameters['sizes']]
+
+
+def generate(client, parameters, progress_callback, renderer_type, extra_context_callback):
+    size = parameters['size']
+    if size < 0:
+        raise ValueError('Invalid partition')
+    extra_context_callback({'size': size})
+    for idx in range(size):
+        yield [size, idx]
+    progress_callback(size, size)
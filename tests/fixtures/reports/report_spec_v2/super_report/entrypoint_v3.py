@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue
+# All rights reserved.
+#
+
+def generate(
+    client, parameters, progress_callback, renderer_type, extra_context_callback, state,
+):
+    if state.high_water_mark is None:
+        yield ['PR-001', 'pending']
+    yield ['PR-002', 'approved']
+    state.update('2023-01-02T00:00:00+00:00')
+    progress_callback(10, 10)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue
+# All rights reserved.
+#
+
+def generate(client, parameters, progress_callback, renderer_type, extra_context_callback):
+    yield [('PR-001', 'pending'), ('PR-002', 'approved')]
+    yield {'id': ['PR-003', 'PR-004'], 'status': ['failed', 'pending']}
+    progress_callback(10, 10)
@@ -0,0 +1,75 @@
+import asyncio
+
+from connect.reports.renderers import JSONRenderer
+
+from executor.batches import (
+    from_batches,
+    from_batches_async,
+    get_batch_processor,
+    get_batch_size,
+    normalize_batches,
+    normalize_batches_async,
+    to_batches,
+    to_batches_async,
+)
+from executor.renderers import BatchCSVRenderer
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+def test_get_batch_size(monkeypatch):
+    assert get_batch_size() == 1000
+    monkeypatch.setenv('REPORTS_BATCH_SIZE', '10')
+    assert get_batch_size() == 10
+
+
+def test_normalize_batches_columnar():
+    batches = [[(1, 'a')], {'id': [2, 3], 'name': ['b', 'c']}]
+
+    assert list(normalize_batches(batches)) == [[(1, 'a')], [(2, 'b'), (3, 'c')]]
+
+
+def test_normalize_batches_async():
+    batches = [{'id': [1], 'name': ['a']}]
+
+    assert asyncio.run(_collect(normalize_batches_async(batches))) == [[(1, 'a')]]
+    assert asyncio.run(_collect(normalize_batches_async(_agen(batches)))) == [[(1, 'a')]]
+
+
+def test_from_batches():
+    batches = [[(1, 'a')], {'id': [2], 'name': ['b']}]
+
+    assert list(from_batches(batches)) == [(1, 'a'), (2, 'b')]
+    assert asyncio.run(_collect(from_batches_async(batches))) == [(1, 'a'), (2, 'b')]
+    assert asyncio.run(_collect(from_batches_async(_agen(batches)))) == [(1, 'a'), (2, 'b')]
+
+
+def test_to_batches():
+    assert list(to_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(to_batches([], 2)) == []
+
+
+def test_to_batches_async():
+    assert asyncio.run(_collect(to_batches_async(range(5), 2))) == [[0, 1], [2, 3], [4]]
+    assert asyncio.run(_collect(to_batches_async(_agen(range(5)), 2))) == [[0, 1], [2, 3], [4]]
+
+
+def test_get_batch_processor(monkeypatch):
+    batch_renderer = BatchCSVRenderer('runtime', None, None, None)
+    row_renderer = JSONRenderer('runtime', None, None, None)
+
+    assert get_batch_processor(True, batch_renderer) == (normalize_batches, normalize_batches_async)
+    assert get_batch_processor(True, row_renderer) == (from_batches, from_batches_async)
+    assert get_batch_processor(False, row_renderer) is None
+
+    monkeypatch.setenv('REPORTS_BATCH_SIZE', '2')
+    process, process_async = get_batch_processor(False, batch_renderer)
+    assert list(process(range(3))) == [[0, 1], [2]]
+    assert asyncio.run(_collect(process_async(range(3)))) == [[0, 1], [2]]
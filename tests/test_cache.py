@@ -0,0 +1,149 @@
+import os
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from executor.cache import (
+    evict_results,
+    get_cache_key,
+    lookup_result,
+    store_result,
+)
+
+
+@pytest.fixture
+def connect_report():
+    return {
+        'template': {
+            'id': 'RDC-000-000-0000',
+            'repository': {
+                'git': {
+                    'commit': '84b120eb4de6941e9537fbc670d08fbab04b5a11',
+                },
+            },
+        },
+        'renderer': 'xlsx_renderer',
+        'owner': {'id': 'VA-000-000'},
+    }
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('REPORTS_RESULT_CACHE_DIR', str(path))
+    return path
+
+
+@pytest.fixture
+def report_file(tmp_path):
+    path = tmp_path / 'report.zip'
+    path.write_bytes(b'report')
+    return str(path)
+
+
+def test_get_cache_key(connect_report):
+    definition = MagicMock(entrypoint='super_report.entrypoint_v2.generate')
+    key = get_cache_key(connect_report, definition, {'a': 1, 'b': 2})
+
+    assert key == get_cache_key(connect_report, definition, {'b': 2, 'a': 1})
+    assert key != get_cache_key(connect_report, definition, {'a': 2, 'b': 2})
+
+    connect_report['renderer'] = 'json_renderer'
+    assert key != get_cache_key(connect_report, definition, {'a': 1, 'b': 2})
+
+
+def test_get_cache_key_set_parameters(connect_report):
+    definition = MagicMock(entrypoint='super_report.entrypoint_v2.generate')
+    connect_report['parameters'] = [
+        {'id': 'status', 'type': 'checkbox'},
+        {'id': 'product', 'type': 'product'},
+        {'id': 'columns', 'type': 'object'},
+    ]
+    parameters = {
+        'status': ['approved', 'pending'],
+        'product': {'all': False, 'choices': ['PRD-1', 'PRD-2']},
+        'date': {'after': '2023-01-01'},
+        'columns': ['id', 'name'],
+    }
+    key = get_cache_key(connect_report, definition, parameters)
+
+    assert key == get_cache_key(
+        connect_report,
+        definition,
+        dict(
+            parameters,
+            status=['pending', 'approved'],
+            product={'choices': ['PRD-2', 'PRD-1'], 'all': False},
+        ),
+    )
+    reordered = dict(parameters, columns=['name', 'id'])
+    assert key != get_cache_key(connect_report, definition, reordered)
+
+
+def test_get_cache_key_no_commit(connect_report):
+    connect_report['template'].pop('repository')
+    definition = MagicMock(entrypoint='super_report.entrypoint_v2.generate')
+
+    assert get_cache_key(connect_report, definition, {}) is None
+
+
+def test_cache_not_configured(monkeypatch, report_file):
+    monkeypatch.delenv('REPORTS_RESULT_CACHE_DIR', raising=False)
+
+    assert store_result('key', report_file) is None
+    assert lookup_result('key') is None
+
+
+def test_store_and_lookup_result(cache_dir, report_file):
+    assert lookup_result('key') is None
+
+    cached_file = store_result('key', report_file)
+
+    assert cached_file == str(cache_dir / 'key' / 'report.zip')
+    assert lookup_result('key') == cached_file
+    assert lookup_result('other') is None
+    assert lookup_result(None) is None
+
+
+def test_lookup_result_expired(monkeypatch, cache_dir, report_file):
+    cached_file = store_result('key', report_file)
+    os.utime(cached_file, (time.time() - 3600, time.time() - 3600))
+
+    assert lookup_result('key') is None
+    assert not os.path.exists(cached_file)
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_evict_results_max_size(monkeypatch, cache_dir, report_file):
+    monkeypatch.setenv('REPORTS_RESULT_CACHE_MAX_SIZE', '10')
+    older = store_result('older', report_file)
+    os.utime(older, (time.time() - 60, time.time() - 60))
+
+    newer = store_result('newer', report_file)
+
+    assert not os.path.exists(older)
+    assert os.path.exists(newer)
+
+
+def test_evict_results_expired(monkeypatch, cache_dir, report_file):
+    cached_file = store_result('key', report_file)
+    monkeypatch.setenv('REPORTS_RESULT_CACHE_TTL', '-1')
+
+    evict_results(str(cache_dir))
+
+    assert not os.path.exists(cached_file)
+
+
+def test_lookup_result_reads_only_its_entry(mocker, cache_dir, report_file):
+    cached_file = store_result('key', report_file)
+    (cache_dir / 'other').mkdir()
+    (cache_dir / 'other' / 'report.zip.123.tmp').write_bytes(b'partial')
+    listdir = mocker.spy(os, 'listdir')
+
+    assert lookup_result('key') == cached_file
+    assert lookup_result('other') is None
+    assert [call.args[0] for call in listdir.call_args_list] == [
+        str(cache_dir / 'key'),
+        str(cache_dir / 'other'),
+    ]
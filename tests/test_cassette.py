@@ -0,0 +1,185 @@
+import asyncio
+import gzip
+import json
+import multiprocessing
+
+import httpx
+import pytest
+from connect.client import AsyncConnectClient, ClientError, ConnectClient
+
+from executor.cassette import (
+    Cassette,
+    CassetteAsyncConnectClient,
+    CassetteConnectClient,
+    create_client,
+    get_cassette,
+    open_cassette,
+)
+from executor.decoding import DecodingConnectClient
+from executor.exceptions import RunnerException
+
+
+ENDPOINT = 'https://localhost/public/v1'
+CLIENT_KWARGS = {'api_key': 'ApiKey SU-000:123', 'endpoint': ENDPOINT, 'use_specs': False}
+
+
+@pytest.fixture(autouse=True)
+def clear_cassettes():
+    open_cassette.cache_clear()
+    yield
+    open_cassette.cache_clear()
+
+
+def _client(cassette, client_class=CassetteConnectClient):
+    return client_class(
+        'ApiKey SU-000:123',
+        endpoint=ENDPOINT,
+        use_specs=False,
+        max_retries=0,
+        cassette=cassette,
+    )
+
+
+def _write(path, *interactions):
+    with gzip.open(path, 'wt') as fp:
+        for interaction in interactions:
+            fp.write(json.dumps(interaction) + '\n')
+
+
+def _interaction(url, body, status=200, elapsed=0.25):
+    return {
+        'method': 'GET',
+        'url': url,
+        'status': status,
+        'headers': {'Content-Type': 'application/json'},
+        'body': body,
+        'elapsed': elapsed,
+    }
+
+
+def test_record_and_replay(mocked_responses, tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products?limit=1&offset=0',
+        json=[{'id': 'PRD-000'}],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+    mocked_responses.add('GET', f'{ENDPOINT}/products/PRD-001', status=404, json={})
+
+    recording = _client(Cassette(path, 'record'))
+    assert list(recording.products.all().limit(1)) == [{'id': 'PRD-000'}]
+    with pytest.raises(ClientError):
+        recording.products['PRD-001'].get()
+
+    with gzip.open(path, 'rt') as fp:
+        interactions = [json.loads(line) for line in fp]
+    assert [(entry['method'], entry['status']) for entry in interactions] == [
+        ('GET', 200),
+        ('GET', 404),
+    ]
+    assert 'ApiKey' not in json.dumps(interactions)
+
+    mocked_responses.reset()
+    replaying = _client(Cassette(path, 'replay'))
+    assert list(replaying.products.all().limit(1)) == [{'id': 'PRD-000'}]
+    with pytest.raises(ClientError) as cv:
+        replaying.products['PRD-001'].get()
+    assert cv.value.status_code == 404
+
+
+def _record_many(path, worker):
+    cassette = Cassette(path, 'record')
+    for idx in range(50):
+        cassette.record('GET', f'{ENDPOINT}/{worker}/{idx}', 200, {}, b'x' * 1000, 0.1)
+
+
+def test_record_from_several_processes(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_record_many, args=(path, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with gzip.open(path, 'rt') as fp:
+        urls = {json.loads(line)['url'] for line in fp}
+
+    assert len(urls) == 200
+
+
+def test_replay_order_and_repeat(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    url = f'{ENDPOINT}/products/PRD-000'
+    _write(path, _interaction(url, 'eyJpZCI6IDF9'), _interaction(url, 'eyJpZCI6IDJ9'))
+
+    client = _client(Cassette(path))
+
+    assert [client.products['PRD-000'].get()['id'] for _ in range(3)] == [1, 2, 2]
+
+
+def test_replay_missing(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    _write(path)
+
+    with pytest.raises(RunnerException) as cv:
+        _client(Cassette(path)).products['PRD-000'].get()
+
+    assert str(cv.value) == f'No recorded response for GET {ENDPOINT}/products/PRD-000.'
+
+
+@pytest.mark.parametrize(('latency', 'delay'), (('0.5', 0.5), ('recorded', 0.25), (None, 0)))
+def test_replay_latency(mocker, tmp_path, latency, delay):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    _write(path, _interaction(f'{ENDPOINT}/products/PRD-000', 'e30='))
+    sleep = mocker.patch('executor.cassette.time.sleep')
+
+    _client(Cassette(path, latency=latency)).products['PRD-000'].get()
+
+    sleep.assert_called_once_with(delay)
+
+
+def test_async_record_and_replay(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+
+    def handler(request):
+        return httpx.Response(
+            200,
+            json={'id': 'PRD-000', 'path': request.url.path},
+            headers={'Content-Encoding': 'identity'},
+        )
+
+    async def get(cassette):
+        client = _client(cassette, CassetteAsyncConnectClient)
+        if cassette.recording:
+            client.session._transport.transport = httpx.MockTransport(handler)
+        return await client.products['PRD-000'].get()
+
+    expected = {'id': 'PRD-000', 'path': '/public/v1/products/PRD-000'}
+    assert asyncio.run(get(Cassette(path, 'record'))) == expected
+    assert asyncio.run(get(Cassette(path, 'replay'))) == expected
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(RunnerException) as cv:
+        Cassette(str(tmp_path / 'cassette.jsonl.gz'), 'rewind')
+
+    assert str(cv.value) == 'Unknown cassette mode rewind.'
+
+
+def test_create_client(monkeypatch, tmp_path):
+    assert get_cassette() is None
+    assert type(create_client(ConnectClient, **CLIENT_KWARGS)) is DecodingConnectClient
+
+    monkeypatch.setenv('REPORTS_CASSETTE', str(tmp_path / 'cassette.jsonl.gz'))
+    monkeypatch.setenv('REPORTS_CASSETTE_MODE', 'record')
+    cassette = get_cassette()
+    assert cassette.recording
+    assert get_cassette() is cassette
+
+    client = create_client(ConnectClient, **CLIENT_KWARGS)
+    async_client = create_client(AsyncConnectClient, **CLIENT_KWARGS)
+    assert isinstance(client, CassetteConnectClient)
+    assert isinstance(async_client, CassetteAsyncConnectClient)
+    assert client.cassette is async_client.cassette is cassette
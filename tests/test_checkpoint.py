@@ -0,0 +1,145 @@
+import asyncio
+
+from executor.checkpoint import (
+    Checkpoint,
+    ReportCheckpoint,
+    discard_checkpoint,
+    get_resume_cursor,
+    open_checkpoint,
+    skip_checkpoints,
+    skip_checkpoints_async,
+)
+
+
+def _generate(start=0):
+    yield Checkpoint({'offset': start})
+    for idx in range(start, 5):
+        yield [idx]
+        if idx % 2 == 1:
+            yield Checkpoint({'offset': idx + 1})
+
+
+def test_open_checkpoint_not_configured(monkeypatch):
+    monkeypatch.delenv('REPORTS_CHECKPOINT_DIR', raising=False)
+
+    assert open_checkpoint('REC-000') is None
+
+
+def test_open_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_CHECKPOINT_DIR', str(tmp_path))
+
+    checkpoint = open_checkpoint('REC-000')
+
+    assert checkpoint.directory == str(tmp_path / 'REC-000')
+    assert checkpoint.cursor is None
+    assert checkpoint.resumed_rows == 0
+
+
+def test_checkpoint_track(tmp_path):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'))
+
+    rows = list(checkpoint.track(_generate()))
+
+    assert rows == [[0], [1], [2], [3], [4]]
+    assert checkpoint.cursor == {'offset': 4}
+
+
+def test_checkpoint_resume(tmp_path):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'), batch_size=1)
+    rows = checkpoint.track(_generate())
+    assert [next(rows) for _ in range(4)] == [[0], [1], [2], [3]]
+    # row [4] is produced after the last checkpoint and must not be kept.
+    assert next(rows) == [4]
+    checkpoint._connection.close()
+
+    resumed = ReportCheckpoint(str(tmp_path / 'REC-000'))
+
+    assert resumed.cursor == {'offset': 4}
+    assert resumed.resumed_rows == 4
+    rows = list(resumed.track(_generate(resumed.cursor['offset'])))
+    assert rows == [[0], [1], [2], [3], [4]]
+
+
+def test_checkpoint_resume_batches(tmp_path):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'), batches=True)
+    list(checkpoint.track([Checkpoint(0), [[0], [1]], [[2]], Checkpoint(2), [[3]]]))
+    checkpoint._connection.close()
+
+    resumed = ReportCheckpoint(str(tmp_path / 'REC-000'), batches=True)
+
+    assert resumed.cursor == 2
+    assert resumed.resumed_rows == 3
+
+
+def test_checkpoint_track_without_leading_marker(tmp_path, caplog):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'), batch_size=1)
+
+    rows = list(checkpoint.track([[0], Checkpoint(1), [1], Checkpoint(2)]))
+
+    assert rows == [[0], [1]]
+    assert checkpoint.journaling is False
+    assert checkpoint.cursor is None
+    assert checkpoint._connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0] == 0
+    assert caplog.text.count('cannot be resumed') == 1
+
+
+def test_checkpoint_track_async(tmp_path):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'))
+    checkpoint.save({'offset': 0})
+
+    async def generate():
+        for item in _generate():
+            yield item
+
+    async def collect(data):
+        return [row async for row in checkpoint.track_async(data)]
+
+    assert asyncio.run(collect(generate())) == [[0], [1], [2], [3], [4]]
+    assert asyncio.run(collect([[5]])) == [[0], [1], [2], [3], [5]]
+
+
+def test_checkpoint_remove(tmp_path):
+    checkpoint = ReportCheckpoint(str(tmp_path / 'REC-000'))
+    checkpoint.save({'offset': 1})
+
+    checkpoint.remove()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_get_resume_cursor(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_CHECKPOINT_DIR', str(tmp_path))
+    checkpoint = open_checkpoint('REC-000')
+    checkpoint.save({'offset': 2})
+
+    assert get_resume_cursor() == {'offset': 2}
+
+    checkpoint.remove()
+    assert get_resume_cursor() is None
+
+
+def test_discard_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_CHECKPOINT_DIR', str(tmp_path))
+    discard_checkpoint()
+    open_checkpoint('REC-000').save({'offset': 2})
+
+    discard_checkpoint()
+
+    assert get_resume_cursor() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_skip_checkpoints():
+    assert list(skip_checkpoints(_generate())) == [[0], [1], [2], [3], [4]]
+
+
+def test_skip_checkpoints_async():
+    async def generate():
+        for item in _generate():
+            yield item
+
+    async def collect(data):
+        return [row async for row in skip_checkpoints_async(data)]
+
+    assert asyncio.run(collect(generate())) == [[0], [1], [2], [3], [4]]
+    assert asyncio.run(collect(_generate())) == [[0], [1], [2], [3], [4]]
@@ -0,0 +1,41 @@
+from connect.client import AsyncConnectClient, ConnectClient
+
+from executor.context import ExecutionContext
+from executor.utils import get_report_env
+
+
+def test_execution_context(mocked_env, monkeypatch):
+    monkeypatch.setenv('REPORTS_MOUNTPOINT', '/mnt/reports')
+    control_client = ConnectClient('ApiKey 123', use_specs=False)
+
+    context = ExecutionContext(get_report_env(), control_client)
+
+    assert context.report_id == 'REC-000-000-0000-000000'
+    assert context.reports_dir == '/mnt/reports'
+    assert context.report is None
+    assert context.report_definition is None
+
+
+def test_execution_context_report_clients(mocked_env):
+    context = ExecutionContext(get_report_env(), None)
+
+    client = context.get_report_client()
+    async_client = context.get_report_client(is_async=True)
+
+    assert isinstance(client, ConnectClient)
+    assert isinstance(async_client, AsyncConnectClient)
+    assert context.get_report_client() is client
+    assert context.get_report_client(is_async=True) is async_client
+
+
+def test_execution_context_projection(mocked_env, mocker):
+    context = ExecutionContext(get_report_env(), None)
+    context.projection = mocker.MagicMock()
+
+    async_client = context.get_report_client(is_async=True)
+    client = context.get_report_client()
+
+    assert context.projection.install.mock_calls == [
+        mocker.call(client, client),
+        mocker.call(async_client, client),
+    ]
@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import httpx
+import orjson
+import pytest
+from connect.client import ClientError
+
+from executor.decoding import (
+    DecodingAsyncConnectClient,
+    DecodingConnectClient,
+    get_json_decoder,
+    loads,
+)
+from executor.exceptions import RunnerException
+
+
+ENDPOINT = 'https://localhost/public/v1'
+PRODUCTS = [{'id': 'PRD-000-000-001', 'name': 'Product', 'price': 10.5, 'tags': None}]
+
+
+@pytest.fixture(autouse=True)
+def clear_decoders():
+    get_json_decoder.cache_clear()
+    yield
+    get_json_decoder.cache_clear()
+
+
+def _client(client_class=DecodingConnectClient):
+    return client_class('ApiKey SU-000:123', endpoint=ENDPOINT, use_specs=False, max_retries=0)
+
+
+@pytest.mark.parametrize(
+    ('name', 'decoder'),
+    (
+        ('auto', orjson.loads),
+        ('orjson', orjson.loads),
+        ('json', json.loads),
+    ),
+)
+def test_get_json_decoder(name, decoder):
+    assert get_json_decoder(name)[0] is decoder
+
+
+def test_get_json_decoder_fallback(mocker):
+    missing = mocker.MagicMock(side_effect=ImportError())
+    mocker.patch.dict('executor.decoding.DECODERS', {'orjson': missing, 'msgspec': missing})
+
+    assert get_json_decoder('auto')[0] is json.loads
+
+    with pytest.raises(RunnerException) as cv:
+        get_json_decoder('msgspec')
+
+    assert str(cv.value) == 'The JSON decoder msgspec is not installed.'
+
+
+def test_get_json_decoder_unknown():
+    with pytest.raises(RunnerException) as cv:
+        get_json_decoder('yaml')
+
+    assert str(cv.value) == 'Unknown JSON decoder yaml.'
+
+
+@pytest.mark.parametrize('name', ('auto', 'json'))
+def test_loads(monkeypatch, name):
+    monkeypatch.setenv('REPORTS_JSON_DECODER', name)
+
+    assert loads(b'{"id": "MFL-001"}') == {'id': 'MFL-001'}
+    assert loads('{"id": "MFL-001"}') == {'id': 'MFL-001'}
+    with pytest.raises(json.JSONDecodeError):
+        loads('{"id":')
+
+
+def test_sync_client(mocked_responses, mocker):
+    decode = mocker.patch('orjson.loads', wraps=orjson.loads)
+    get_json_decoder.cache_clear()
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=PRODUCTS,
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+
+    assert list(_client().products.all()) == PRODUCTS
+    assert decode.call_count == 1
+
+
+def test_sync_client_stdlib(mocked_responses, monkeypatch, mocker):
+    monkeypatch.setenv('REPORTS_JSON_DECODER', 'json')
+    decode = mocker.patch('orjson.loads', wraps=orjson.loads)
+    mocked_responses.add('GET', f'{ENDPOINT}/products/PRD-000-000-001', json=PRODUCTS[0])
+
+    assert _client().products['PRD-000-000-001'].get() == PRODUCTS[0]
+    decode.assert_not_called()
+
+
+def test_sync_client_invalid_payload(mocked_responses):
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products/PRD-000-000-001',
+        body=b'{"id":',
+        content_type='application/json',
+    )
+
+    # The client library reports undecodable payloads the same way with any decoder.
+    with pytest.raises(ClientError) as cv:
+        _client().products['PRD-000-000-001'].get()
+
+    assert isinstance(cv.value.__cause__, json.JSONDecodeError)
+
+
+def test_sync_client_error(mocked_responses):
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products/PRD-000-000-001',
+        status=400,
+        json={'error_code': 'PRD_001', 'errors': ['Invalid product.']},
+    )
+
+    with pytest.raises(ClientError) as cv:
+        _client().products['PRD-000-000-001'].get()
+
+    assert cv.value.error_code == 'PRD_001'
+
+
+def test_async_client():
+    def handler(request):
+        return httpx.Response(200, json=PRODUCTS, headers={'Content-Range': 'items 0-0/1'})
+
+    async def fetch():
+        client = _client(DecodingAsyncConnectClient)
+        client._session.set(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return [product async for product in client.products.all()], client.response
+
+    products, response = asyncio.run(fetch())
+
+    assert products == PRODUCTS
+    assert response.json.__name__ == 'decode_json'
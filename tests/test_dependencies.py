@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from executor.dependencies import (
+    COMPLETE_MARKER,
+    ensure_environment,
+    get_executor_python,
+    get_pip_install_args,
+    get_requirements_hash,
+    get_runner_constraints,
+)
+from executor.exceptions import RunnerException
+
+
+@pytest.fixture
+def reports_dir(tmp_path):
+    reports_dir = tmp_path / 'reports'
+    reports_dir.mkdir()
+    (reports_dir / 'requirements.txt').write_text('tabulate==0.9.0\n')
+    return str(reports_dir)
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_VENV_CACHE_DIR', str(tmp_path / 'venvs'))
+    monkeypatch.setenv('REPORTS_WHEELHOUSE', '/wheels')
+    monkeypatch.delenv('REPORTS_PIP_INDEX_URL', raising=False)
+    return str(tmp_path / 'venvs')
+
+
+def test_ensure_environment_disabled(monkeypatch, reports_dir, tmp_path):
+    monkeypatch.delenv('REPORTS_VENV_CACHE_DIR', raising=False)
+    assert ensure_environment(reports_dir) is None
+
+    monkeypatch.setenv('REPORTS_VENV_CACHE_DIR', str(tmp_path / 'venvs'))
+    assert ensure_environment(str(tmp_path)) is None
+
+
+def test_ensure_environment_without_package_source(monkeypatch, reports_dir, cache_dir, caplog):
+    monkeypatch.delenv('REPORTS_WHEELHOUSE')
+
+    assert ensure_environment(reports_dir) is None
+    assert 'neither REPORTS_WHEELHOUSE nor REPORTS_PIP_INDEX_URL' in caplog.text
+
+
+def test_ensure_environment_builds_once(mocker, reports_dir, cache_dir):
+    run = mocker.patch('executor.dependencies.subprocess.run')
+    mocker.patch('executor.dependencies.get_runner_constraints', return_value='pytz==2023.3\n')
+    venv_dir = os.path.join(
+        cache_dir,
+        get_requirements_hash(os.path.join(reports_dir, 'requirements.txt'), 'pytz==2023.3\n'),
+    )
+    run.side_effect = lambda *args, **kwargs: os.makedirs(venv_dir, exist_ok=True)
+
+    python = ensure_environment(reports_dir)
+
+    assert python == os.path.join(venv_dir, 'bin', 'python')
+    assert run.call_args_list[0].args[0] == [
+        sys.executable, '-m', 'venv', '--system-site-packages', venv_dir,
+    ]
+    assert run.call_args_list[1].args[0][0] == python
+    constraints_file = os.path.join(venv_dir, 'constraints.txt')
+    assert run.call_args_list[1].args[0][-4:-2] == ['-c', constraints_file]
+    with open(constraints_file) as fp:
+        assert fp.read() == 'pytz==2023.3\n'
+    assert os.path.exists(os.path.join(venv_dir, COMPLETE_MARKER))
+
+    run.reset_mock()
+    assert ensure_environment(reports_dir) == python
+    run.assert_not_called()
+
+
+def test_ensure_environment_build_failure(mocker, reports_dir, cache_dir):
+    mocker.patch(
+        'executor.dependencies.subprocess.run',
+        side_effect=[None, subprocess.CalledProcessError(1, 'pip', stderr=b'no index')],
+    )
+
+    assert get_executor_python(reports_dir) == 'python'
+    assert [name for name in os.listdir(cache_dir) if not name.endswith('.lock')] == []
+
+
+def test_get_pip_install_args(monkeypatch):
+    monkeypatch.setenv('REPORTS_WHEELHOUSE', '/wheels')
+    monkeypatch.delenv('REPORTS_PIP_INDEX_URL', raising=False)
+
+    args = get_pip_install_args('/reports/requirements.txt', '/venv/constraints.txt')
+
+    assert args[-7:] == [
+        '--no-index', '--find-links', '/wheels',
+        '-c', '/venv/constraints.txt',
+        '-r', '/reports/requirements.txt',
+    ]
+
+    monkeypatch.delenv('REPORTS_WHEELHOUSE')
+    monkeypatch.setenv('REPORTS_PIP_INDEX_URL', 'http://index.local/simple')
+
+    args = get_pip_install_args('/reports/requirements.txt', '/venv/constraints.txt')
+
+    assert args[-6:-4] == ['--index-url', 'http://index.local/simple']
+    assert '--no-index' not in args
+
+
+def test_get_pip_install_args_exclusive_sources(monkeypatch):
+    monkeypatch.setenv('REPORTS_WHEELHOUSE', '/wheels')
+    monkeypatch.setenv('REPORTS_PIP_INDEX_URL', 'http://index.local/simple')
+
+    with pytest.raises(RunnerException):
+        get_pip_install_args('/reports/requirements.txt', '/venv/constraints.txt')
+
+
+def test_get_executor_python_exclusive_sources(monkeypatch, reports_dir, cache_dir):
+    monkeypatch.setenv('REPORTS_PIP_INDEX_URL', 'http://index.local/simple')
+
+    assert get_executor_python(reports_dir) == 'python'
+
+
+def test_get_runner_constraints():
+    names = [line.split('==')[0] for line in get_runner_constraints().splitlines()]
+
+    assert names == sorted(set(names))
+    assert 'pytest' in names
+
+
+def test_requirements_hash_changes(tmp_path):
+    requirements_file = tmp_path / 'requirements.txt'
+    requirements_file.write_text('tabulate==0.9.0\n')
+    first = get_requirements_hash(str(requirements_file))
+    requirements_file.write_text('tabulate==0.8.0\n')
+
+    assert get_requirements_hash(str(requirements_file)) != first
+    assert get_requirements_hash(str(requirements_file), 'pytz==2023.3\n') != first
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from connect.client import AsyncConnectClient, ConnectClient
+
+from executor.estimation import (
+    PROCEED,
+    REJECT,
+    RESCHEDULE,
+    Estimate,
+    admit,
+    count_collections,
+    describe_estimate,
+    estimate_report,
+)
+from executor.exceptions import RunnerException
+
+
+ENDPOINT = 'https://localhost/public/v1'
+
+
+def _client(client_class=ConnectClient):
+    return client_class('ApiKey SU-000:123', endpoint=ENDPOINT, use_specs=False, max_retries=0)
+
+
+def _add_count(mocked_responses, path, count):
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/{path}',
+        json=[],
+        headers={'Content-Range': f'items 0-0/{count}'},
+    )
+
+
+def test_count_collections(mocked_responses):
+    _add_count(mocked_responses, 'subscriptions/assets', 1000)
+    _add_count(mocked_responses, 'requests', 50)
+
+    estimate = count_collections(
+        {
+            'collections': [
+                {
+                    'collection': 'subscriptions/assets',
+                    'filter': 'ge(events.created.at,{date[after]})',
+                },
+                {'collection': 'requests', 'row_bytes': 2048},
+            ],
+            'row_bytes': 100,
+        },
+        _client(),
+        {'date': {'after': '2023-01-01T00:00:00'}},
+    )
+
+    assert estimate == Estimate(1050, 1000 * 100 + 50 * 2048)
+    assert mocked_responses.calls[0].request.url == (
+        f'{ENDPOINT}/subscriptions/assets'
+        '?ge(events.created.at,2023-01-01T00:00:00)&limit=0&offset=0'
+    )
+
+
+def test_count_collections_missing_parameter():
+    with pytest.raises(RunnerException) as cv:
+        count_collections(
+            {'collections': [{'collection': 'requests', 'filter': 'eq(status,{status})'}]},
+            _client(),
+            {},
+        )
+
+    assert str(cv.value) == "Estimate query requires the 'status' attribute or parameter."
+
+
+@pytest.mark.parametrize(
+    ('value', 'expected'),
+    (
+        (None, None),
+        (10, Estimate(10, None)),
+        ({'bytes': 2048}, Estimate(None, 2048)),
+        ((10, 2048), Estimate(10, 2048)),
+        (Estimate(10, 2048), Estimate(10, 2048)),
+    ),
+)
+def test_estimate_report(mocker, value, expected):
+    estimator = mocker.MagicMock(return_value=value)
+    get_hook = mocker.patch('executor.estimation.get_report_hook', return_value=estimator)
+    client = _client()
+    definition = mocker.MagicMock(entrypoint='super_report.entrypoint.generate')
+
+    assert estimate_report(definition, lambda is_async: client, {'status': 'approved'}) == expected
+    get_hook.assert_called_once_with('super_report.entrypoint.generate', 'estimate')
+    estimator.assert_called_once_with(client, {'status': 'approved'})
+
+
+def test_estimate_report_declarative(mocker, mocked_responses):
+    _add_count(mocked_responses, 'requests', 50)
+    mocker.patch(
+        'executor.estimation.get_report_hook',
+        return_value={'collections': [{'collection': 'requests'}]},
+    )
+
+    estimate = estimate_report(mocker.MagicMock(), lambda is_async: _client(), {})
+
+    assert estimate == Estimate(50, 50 * 512)
+
+
+def test_estimate_report_async(mocker):
+    async def estimate(client, parameters):
+        await asyncio.sleep(0)
+        assert isinstance(client, AsyncConnectClient)
+        return {'rows': parameters['rows']}
+
+    def get_client(is_async):
+        # The async client is created within the loop running the estimator.
+        asyncio.get_running_loop()
+        return _client(AsyncConnectClient if is_async else ConnectClient)
+
+    mocker.patch('executor.estimation.get_report_hook', return_value=estimate)
+
+    assert estimate_report(mocker.MagicMock(), get_client, {'rows': 10}) == Estimate(10, None)
+
+
+def test_estimate_report_without_estimator(mocker):
+    mocker.patch('executor.estimation.get_report_hook', return_value=None)
+    get_client = mocker.MagicMock()
+
+    assert estimate_report(mocker.MagicMock(), get_client, {}) is None
+    get_client.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ('estimate', 'decision'),
+    (
+        (None, PROCEED),
+        (Estimate(100, None), PROCEED),
+        (Estimate(None, 10), PROCEED),
+        (Estimate(1001, None), RESCHEDULE),
+        (Estimate(10, 2048), RESCHEDULE),
+        (Estimate(10001, 10), REJECT),
+        (Estimate(10, 4097), REJECT),
+    ),
+)
+def test_admit(monkeypatch, estimate, decision):
+    monkeypatch.setenv('REPORTS_RESCHEDULE_ROWS', '1000')
+    monkeypatch.setenv('REPORTS_RESCHEDULE_BYTES', '1024')
+    monkeypatch.setenv('REPORTS_MAX_ROWS', '10000')
+    monkeypatch.setenv('REPORTS_MAX_BYTES', '4096')
+
+    assert admit(estimate) == decision
+
+
+def test_admit_without_limits():
+    assert admit(Estimate(10 ** 9, 10 ** 12)) == PROCEED
+
+
+@pytest.mark.parametrize(
+    ('estimate', 'description'),
+    (
+        (Estimate(1234567, 5 * 1024 * 1024), '1,234,567 rows and 5.0 MB'),
+        (Estimate(10, None), '10 rows'),
+        (Estimate(None, None), 'an unknown size'),
+    ),
+)
+def test_describe_estimate(estimate, description):
+    assert describe_estimate(estimate) == description
@@ -4,11 +4,13 @@ import pytest
 from connect.client import ClientError, ConnectClient
 from requests import Request, RequestException
 
+from executor.context import ExecutionContext
 from executor.exception_handler import (
     handle_exception,
     handle_post_execution_exception,
     handle_preparation_exception,
 )
+from executor.utils import get_report_env
 
 
 def test_post_execution_error(
@@ -20,6 +22,7 @@ def test_post_execution_error(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
+    context = ExecutionContext(get_report_env(), client)
     mocked_responses.add(
         method='POST',
         url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/fail',
@@ -32,7 +35,7 @@ def test_post_execution_error(
     )
 
     with pytest.raises(ClientError) as e:
-        handle_post_execution_exception(exception, client)
+        handle_post_execution_exception(exception, context)
 
     assert 'weird error uploading' in str(e.value)
 
@@ -46,6 +49,7 @@ def test_handle_preparation_exception_getting_report(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
+    context = ExecutionContext(get_report_env(), client)
     mocked_responses.add(
         method='POST',
         url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/fail',
@@ -58,7 +62,7 @@ def test_handle_preparation_exception_getting_report(
     )
 
     with pytest.raises(ClientError) as e:
-        handle_preparation_exception(exception, client)
+        handle_preparation_exception(exception, context)
 
     assert 'weird error uploading' in str(e.value)
 
@@ -76,18 +80,14 @@ def test_handle_report_execution_different_errors(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ex_type("Some Value Error")
 
     upload = mocker.patch(
         'executor.exception_handler.fail_report',
     )
     with pytest.raises(ex_type) as e:
-        handle_exception(exception, client)
+        handle_exception(exception, context)
 
     assert isinstance(e.value, ex_type)
     upload.assert_called_with(
@@ -109,11 +109,7 @@ def test_handle_report_execution_row_limit_errors(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ValueError(
         'Row numbers must be between 1 and 1048576. Row number supplied was 1048577',
     )
@@ -122,7 +118,7 @@ def test_handle_report_execution_row_limit_errors(
         'executor.exception_handler.fail_report',
     )
     with pytest.raises(ValueError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
 
     upload.assert_called_with(
         client,
@@ -145,11 +141,7 @@ def test_handle_report_execution_409_outside_connect_block(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=409,
         error_code=409,
@@ -173,7 +165,7 @@ def test_handle_report_execution_409_outside_connect_block(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
 
     # Change False to True in case that firewall reenabled as per LITE-16960
     upload.assert_called_with(
@@ -196,11 +188,7 @@ def test_handle_report_execution_409_connect_no_block(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=409,
         error_code=409,
@@ -224,7 +212,7 @@ def test_handle_report_execution_409_connect_no_block(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
 
     upload.assert_called_with(
         client,
@@ -248,11 +236,7 @@ def test_handle_report_execution_500_connect_no_block(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=500,
         error_code=500,
@@ -276,7 +260,7 @@ def test_handle_report_execution_500_connect_no_block(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
     error = "500 - Internal Server Error: unexpected error: Internal error"
     if report_type == 'system':
         error = error + ". Please contact support."
@@ -302,11 +286,7 @@ def test_handle_report_execution_500(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=500,
         error_code=500,
@@ -330,7 +310,7 @@ def test_handle_report_execution_500(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
     error = "500 - Internal Server Error: unexpected error: Internal error"
     if report_type == 'system':
         error = error + ". Please contact support."
@@ -356,11 +336,7 @@ def test_handle_report_execution_401(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=401,
         error_code=401,
@@ -384,7 +360,7 @@ def test_handle_report_execution_401(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
     error = "401 - Unauthorized: report tried to access objects not accessible by your account"
     if report_type == 'system':
         error = error + ". Please contact support."
@@ -412,11 +388,7 @@ def test_handle_report_execution_400(
         api_key=os.getenv('CLIENT_TOKEN'),
         endpoint=os.getenv('API_ENDPOINT'),
     )
-    mocked_responses.add(
-        method='GET',
-        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
-        json=mocked_report_response_v1,
-    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
     exception = ClientError(
         status_code=400,
         error_code=400,
@@ -440,7 +412,7 @@ def test_handle_report_execution_400(
     )
 
     with pytest.raises(ClientError):
-        handle_exception(exception, client)
+        handle_exception(exception, context)
     error = "400 - Bad Request: 400 - error 1,error 2"
     if report_type == 'system':
         error = error + ". Please contact support."
@@ -451,3 +423,36 @@ def test_handle_report_execution_400(
         error,
         False,
     )
+
+
+@pytest.mark.parametrize(
+    ('exception', 'discarded'),
+    (
+        (ValueError('Some Value Error'), True),
+        (ClientError(status_code=400, error_code=400, message='Bad'), True),
+        (ClientError(status_code=502, error_code=502, message='Bad gateway'), False),
+    ),
+)
+def test_handle_report_execution_discards_checkpoint(
+    mocker,
+    mocked_env,
+    mocked_report_response_v1,
+    exception,
+    discarded,
+):
+    client = ConnectClient(
+        use_specs=False,
+        api_key=os.getenv('CLIENT_TOKEN'),
+        endpoint=os.getenv('API_ENDPOINT'),
+    )
+    context = ExecutionContext(get_report_env(), client, mocked_report_response_v1)
+    exception.__cause__ = RequestException(
+        request=Request(method='GET', url='https://localhost/public/v1'),
+    )
+    mocker.patch('executor.exception_handler.fail_report')
+    discard_checkpoint = mocker.patch('executor.exception_handler.discard_checkpoint')
+
+    with pytest.raises(type(exception)):
+        handle_exception(exception, context)
+
+    assert discard_checkpoint.called is discarded
@@ -1,5 +1,8 @@
+import json
 import os
+import shutil
 import sys
+import zipfile
 from unittest.mock import MagicMock
 
 import pytest
@@ -8,6 +11,10 @@ from connect.reports.constants import DEFAULT_RENDERER_ID
 from connect.reports.datamodels import RendererDefinition, ReportDefinition
 
 import executor.executor
+from executor.checkpoint import Checkpoint
+from executor.estimation import RESCHEDULE_EXIT_CODE, Estimate
+from executor.exceptions import RunnerException
+from executor.incremental import load_state
 
 
 def test_execute_report_v1(
@@ -216,6 +223,445 @@ def test_execute_report_v2_async(
     executor.executor.start()
 
 
+def _render_to(mocker, output_file):
+    run_render = executor.executor._run_render
+    return mocker.patch(
+        'executor.executor._run_render',
+        side_effect=lambda is_async, entrypoint, args, renderer, _, processors: (
+            run_render(is_async, entrypoint, args, renderer, output_file, processors)
+        ),
+    )
+
+
+def test_execute_report_v3_incremental(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    report_v2_json,
+    monkeypatch,
+    tmp_path,
+):
+    root_path = os.path.join(sys.path[0], 'tests/fixtures/reports/report_spec_v2')
+    monkeypatch.setenv('REPORTS_MOUNTPOINT', root_path)
+    monkeypatch.setenv('REPORTS_STATE_DIR', str(tmp_path / 'state'))
+    json_renderer = RendererDefinition(
+        root_path=root_path,
+        id='json_renderer',
+        type='json',
+        description='Json renderer.',
+        default=True,
+        args={'incremental_key': 0},
+    )
+    report_json = report_v2_json(
+        name='pending fulfillment requests',
+        readme_file='Readme.md',
+        entrypoint='super_report.entrypoint_v3.generate',
+        renderers=[json_renderer],
+    )
+    report_json['report_spec'] = '3'
+    report_definition = ReportDefinition(
+        root_path=root_path,
+        **report_json,
+    )
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    with open('./tests/fixtures/report_response_v2.json') as fp:
+        connect_report = json.load(fp)
+    connect_report['renderer'] = 'json_renderer'
+    connect_report['entrypoint'] = report_definition.entrypoint
+    for _ in range(2):
+        mocked_responses.add(
+            method='GET',
+            url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+            json=connect_report,
+        )
+        mocked_responses.add(
+            method='POST',
+            url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+            status=204,
+            json={},
+        )
+    mocker.patch('executor.executor.lookup_result', return_value=None)
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    upload_file = mocker.patch('executor.executor.upload_file')
+    _render_to(mocker, str(tmp_path / 'report'))
+
+    executor.executor.start()
+    executor.executor.start()
+
+    state = load_state(
+        'RDC-000-000-0000',
+        'VA-000-000',
+        executor.executor.normalize_parameters(connect_report['parameters']),
+        0,
+    )
+    assert state.high_water_mark == '2023-01-02T00:00:00+00:00'
+    assert list(state.rows()) == [['PR-001', 'pending'], ['PR-002', 'approved']]
+    assert _read_json_result(upload_file) == b'[["PR-001","pending"],["PR-002","approved"]]'
+
+
+def test_execute_report_v3_incremental_requires_key(mocker, started_report, mocked_responses):
+    report_definition = executor.executor.get_report_definition.return_value
+    report_definition.report_spec = '3'
+    report_definition.entrypoint = 'super_report.entrypoint_v3.generate'
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    fail_report = mocker.patch('executor.exception_handler.fail_report')
+
+    with pytest.raises(RunnerException):
+        executor.executor.start()
+
+    assert 'incremental_key renderer argument' in fail_report.call_args[0][2]
+
+
+def test_execute_report_multiple_renderers(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    xlsx_renderer = RendererDefinition(
+        root_path=root_path,
+        id='xlsx_renderer',
+        type='xlsx',
+        description='Excel renderer.',
+        default=True,
+        template='super_report/template.xlsx',
+        args={
+            'start_row': 1,
+            'start_col': 1,
+        },
+    )
+    csv_renderer = RendererDefinition(
+        root_path=root_path,
+        id='csv_renderer',
+        type='csv',
+        description='CSV renderer.',
+        default=False,
+    )
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v2.generate',
+        renderers=[xlsx_renderer, csv_renderer],
+    )
+    report_definition = ReportDefinition(root_path=root_path, **report_json)
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    mocked_report_response_v2_fake_fs['renderer'] = 'xlsx_renderer,csv_renderer'
+
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+
+    executor.executor.start()
+
+    assert upload_file.call_args[0][1] == '/report.zip'
+    with zipfile.ZipFile('/report.zip') as repzip:
+        assert sorted(repzip.namelist()) == [
+            'csv_renderer/report.csv',
+            'csv_renderer/summary.json',
+            'xlsx_renderer.xlsx',
+        ]
+
+
+def test_execute_report_multiple_renderers_row_shapes(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    xlsx_renderer = RendererDefinition(
+        root_path=root_path,
+        id='xlsx_renderer',
+        type='xlsx',
+        description='Excel renderer.',
+        default=True,
+        template='super_report/template.xlsx',
+        args={
+            'start_row': 1,
+            'start_col': 1,
+        },
+    )
+    json_renderer = RendererDefinition(
+        root_path=root_path,
+        id='json_renderer',
+        type='json',
+        description='Json renderer.',
+        default=False,
+    )
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v2.generate',
+        renderers=[xlsx_renderer, json_renderer],
+    )
+    report_definition = ReportDefinition(root_path=root_path, **report_json)
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+    handle_exception = mocker.patch('executor.executor.handle_exception')
+
+    mocked_report_response_v2_fake_fs['renderer'] = 'xlsx_renderer,json_renderer'
+
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+    executor.executor.start()
+
+    assert str(handle_exception.call_args[0][0]) == (
+        'Renderers xlsx_renderer (xlsx) and json_renderer (json) expect differently shaped '
+        'rows and cannot be combined in one execution.'
+    )
+    upload_file.assert_not_called()
+
+
+def test_execute_report_columnar_renderer(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    monkeypatch,
+    tmp_path,
+):
+    pq = pytest.importorskip('pyarrow.parquet')
+    root_path = tmp_path / 'reports'
+    shutil.copytree('./tests/fixtures/reports/report_spec_v2', root_path)
+    descriptor = json.loads((root_path / 'reports.json').read_text())
+    descriptor['reports'][0]['renderers'].append(
+        {
+            'id': 'parquet_renderer',
+            'type': 'parquet',
+            'description': 'Parquet renderer.',
+            'args': {'columns': ['id']},
+        },
+    )
+    (root_path / 'reports.json').write_text(json.dumps(descriptor))
+    monkeypatch.setenv('REPORTS_MOUNTPOINT', str(root_path))
+    with open('./tests/fixtures/report_response_v2.json') as fp:
+        connect_report = json.load(fp)
+    connect_report['renderer'] = 'parquet_renderer'
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=connect_report,
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+    mocker.patch('executor.executor.lookup_result', return_value=None)
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    upload_file = mocker.patch('executor.executor.upload_file')
+    _render_to(mocker, str(tmp_path / 'report'))
+
+    executor.executor.start()
+
+    with zipfile.ZipFile(upload_file.call_args[0][1]) as repzip:
+        with repzip.open('report.parquet') as fp:
+            assert pq.read_table(fp).to_pylist() == [{'id': 1}, {'id': 2}]
+
+
+@pytest.mark.parametrize(
+    ('renderer_type', 'expected'),
+    (
+        (
+            'csv',
+            b'"PR-001";"pending"\r\n"PR-002";"approved"\r\n'
+            b'"PR-003";"failed"\r\n"PR-004";"pending"\r\n',
+        ),
+        (
+            'json',
+            b'[["PR-001","pending"],["PR-002","approved"],'
+            b'["PR-003","failed"],["PR-004","pending"]]',
+        ),
+    ),
+)
+def test_execute_report_v4_batches(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+    renderer_type,
+    expected,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    renderer = RendererDefinition(
+        root_path=root_path,
+        id=f'{renderer_type}_renderer',
+        type=renderer_type,
+        description='Batch renderer.',
+        default=True,
+    )
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v4.generate',
+        renderers=[renderer],
+    )
+    report_json['report_spec'] = '4'
+    report_definition = ReportDefinition(root_path=root_path, **report_json)
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    mocked_report_response_v2_fake_fs['renderer'] = f'{renderer_type}_renderer'
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+
+    executor.executor.start()
+
+    with zipfile.ZipFile(upload_file.call_args[0][1]) as repzip:
+        assert repzip.read(f'report.{renderer_type}') == expected
+
+
+def test_execute_report_post_processing(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    renderer = RendererDefinition(
+        root_path=root_path,
+        id='csv_renderer',
+        type='csv',
+        description='CSV renderer.',
+        default=True,
+        args={
+            'columns': ['id', 'status'],
+            'post_processing': [
+                {'type': 'filter', 'column': 'status', 'operator': 'ne', 'value': 'failed'},
+                {'type': 'sort', 'keys': [{'column': 'id', 'descending': True}]},
+            ],
+        },
+    )
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v4.generate',
+        renderers=[renderer],
+    )
+    report_json['report_spec'] = '4'
+    report_definition = ReportDefinition(root_path=root_path, **report_json)
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    mocked_report_response_v2_fake_fs['renderer'] = 'csv_renderer'
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+
+    executor.executor.start()
+
+    with zipfile.ZipFile(upload_file.call_args[0][1]) as repzip:
+        assert repzip.read('report.csv') == (
+            b'"PR-004";"pending"\r\n"PR-002";"approved"\r\n"PR-001";"pending"\r\n'
+        )
+
+
+def test_normalize_renderers():
+    assert executor.executor.normalize_renderers('xlsx') == ['xlsx']
+    assert executor.executor.normalize_renderers('xlsx, json') == ['xlsx', 'json']
+    assert executor.executor.normalize_renderers(['xlsx', 'json']) == ['xlsx', 'json']
+
+
+def test_execute_report_cached_result(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+    fs,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v2.generate',
+        renderers=[
+            RendererDefinition(
+                root_path=root_path,
+                id='json_renderer',
+                type='json',
+                description='Json renderer.',
+                default=True,
+            ),
+        ],
+    )
+    report_definition = ReportDefinition(root_path=root_path, **report_json)
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=report_definition,
+    )
+    fs.create_file('/cache/report.zip', contents='cached')
+    mocker.patch('executor.executor.lookup_result', return_value='/cache/report.zip')
+    execute_report = mocker.patch('executor.executor.execute_report')
+
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/media/folders/reports_report_file/VA-000-000/files',
+        status=201,
+        body=b'{"id": "MFL-001"}',
+    )
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/upload',
+        status=204,
+        json={},
+    )
+
+    executor.executor.start()
+
+    execute_report.assert_not_called()
+
+
 def test_execute_report_error_on_report_code_controlled(
     mocker,
     mocked_env,
@@ -504,3 +950,199 @@ def test_execute_report_error_on_report_code(
         executor.executor.start()
 
     assert isinstance(e.value, ValueError)
+
+
+@pytest.fixture
+def started_report(
+    mocker,
+    mocked_env,
+    mocked_responses,
+    mocked_dir_v2,
+    report_v2_json,
+    mocked_report_response_v2_fake_fs,
+    fs,
+):
+    root_path = os.getenv('REPORTS_MOUNTPOINT')
+    report_json = report_v2_json(
+        entrypoint='super_report.entrypoint_v2.generate',
+        renderers=[
+            RendererDefinition(
+                root_path=root_path,
+                id='json_renderer',
+                type='json',
+                description='Json renderer.',
+                default=True,
+            ),
+        ],
+    )
+    mocker.patch(
+        'executor.executor.get_report_definition',
+        return_value=ReportDefinition(root_path=root_path, **report_json),
+    )
+    mocked_report_response_v2_fake_fs['renderer'] = 'json_renderer'
+    mocker.patch('executor.executor.lookup_result', return_value=None)
+    mocked_responses.add(
+        method='GET',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000',
+        json=mocked_report_response_v2_fake_fs,
+    )
+
+
+@pytest.fixture
+def mocked_start(mocker, started_report):
+    return mocker.patch('executor.executor.execute_report', return_value=None)
+
+
+def test_start_estimate_proceed(mocker, mocked_start, monkeypatch, caplog):
+    monkeypatch.setenv('REPORTS_MAX_ROWS', '1000')
+    estimate_report = mocker.patch(
+        'executor.executor.estimate_report',
+        return_value=Estimate(100, None),
+    )
+
+    with caplog.at_level('INFO'):
+        executor.executor.start()
+
+    assert estimate_report.call_args[0][0].entrypoint == 'super_report.entrypoint_v2.generate'
+    assert 'Report is estimated to produce 100 rows.' in caplog.messages
+    mocked_start.assert_called_once()
+
+
+def test_start_estimate_error(mocker, mocked_start, caplog):
+    mocker.patch('executor.executor.estimate_report', side_effect=ValueError('Invalid'))
+
+    executor.executor.start()
+
+    assert 'Cannot estimate the report size, executing it anyway.' in caplog.messages
+    mocked_start.assert_called_once()
+
+
+def test_start_estimate_reschedule(mocker, mocked_start, monkeypatch):
+    monkeypatch.setenv('REPORTS_RESCHEDULE_ROWS', '1000')
+    mocker.patch('executor.executor.estimate_report', return_value=Estimate(1001, None))
+    fail_report = mocker.patch('executor.exception_handler.fail_report')
+
+    with pytest.raises(SystemExit) as cv:
+        executor.executor.start()
+
+    assert cv.value.code == RESCHEDULE_EXIT_CODE
+    fail_report.assert_not_called()
+    mocked_start.assert_not_called()
+
+
+def test_start_estimate_reject(mocker, mocked_start, monkeypatch):
+    monkeypatch.setenv('REPORTS_RESCHEDULE_ROWS', '1000')
+    monkeypatch.setenv('REPORTS_MAX_BYTES', str(1024 * 1024))
+    mocker.patch(
+        'executor.executor.estimate_report',
+        return_value=Estimate(10, 2 * 1024 * 1024),
+    )
+    fail_report = mocker.patch('executor.exception_handler.fail_report')
+
+    with pytest.raises(RunnerException) as cv:
+        executor.executor.start()
+
+    reason = (
+        'Report is estimated to produce 10 rows and 2.0 MB, which exceeds the maximum allowed '
+        'size. Please narrow it down using the report parameters (for example a shorter date '
+        'range) and try again.'
+    )
+    assert str(cv.value) == reason
+    fail_report.assert_called_once_with(
+        mocker.ANY, 'REC-000-000-0000-000000', reason, False, reason,
+    )
+    mocked_start.assert_not_called()
+
+
+def test_execute_report_partitioned(mocker, started_report):
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    mocker.patch('executor.executor.get_partitions', return_value=[{'size': 1}, {'size': 2}])
+    entrypoint = mocker.MagicMock(return_value=[[1, 0], [2, 0], [2, 1]])
+    mocker.patch('executor.executor.partitioned_entrypoint', return_value=entrypoint)
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    executor.executor.start()
+
+    assert entrypoint.call_args[0][0] is None
+    upload_file.assert_called_once()
+
+
+def test_execute_report_spill(mocker, started_report, mocked_responses, monkeypatch):
+    monkeypatch.setenv('REPORTS_SPILL_DIR', '/spill')
+    executor.executor.get_report_definition.return_value.renderers[0].args = {
+        'spill_to_disk': True,
+    }
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+    spill_rows = mocker.patch(
+        'executor.executor.spill_rows',
+        side_effect=lambda data, directory: iter(data),
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    executor.executor.start()
+
+    spill_rows.assert_called_once_with([[1], [2]], directory='/spill')
+    assert _read_json_result(upload_file) == b'[[1],[2]]'
+
+
+def _read_json_result(upload_file):
+    with zipfile.ZipFile(upload_file.call_args[0][1]) as repzip:
+        return repzip.read(repzip.namelist()[0])
+
+
+def test_execute_report_v2_checkpoint_markers(mocker, started_report, mocked_responses):
+    executor.executor.get_report_definition.return_value.entrypoint = (
+        'super_report.entrypoint_v2_checkpoint.generate'
+    )
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    executor.executor.start()
+
+    assert _read_json_result(upload_file) == b'[["MP-1",1],["MP-1",2],["MP-2",3]]'
+
+
+def test_execute_report_v2_checkpoint_resume(mocker, started_report, mocked_responses):
+    executor.executor.get_report_definition.return_value.entrypoint = (
+        'super_report.entrypoint_v2_checkpoint.generate'
+    )
+    mocker.patch('executor.executor.estimate_report', return_value=None)
+    mocked_responses.add(
+        method='POST',
+        url='https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/progress',
+        status=204,
+        json={},
+    )
+    checkpoint = mocker.MagicMock(cursor=1, resumed_rows=1)
+
+    def track(data):
+        yield ['MP-1', 1]
+        for item in data:
+            if isinstance(item, Checkpoint):
+                checkpoint.saved.append(item.cursor)
+            else:
+                yield item
+
+    checkpoint.saved = []
+    checkpoint.track = track
+    mocker.patch('executor.executor.open_checkpoint', return_value=checkpoint)
+    mocker.patch('executor.checkpoint._active', checkpoint)
+    upload_file = mocker.patch('executor.executor.upload_file')
+
+    executor.executor.start()
+
+    assert _read_json_result(upload_file) == b'[["MP-1",1],["MP-1",2],["MP-2",3]]'
+    assert checkpoint.saved == [1, 2, 3]
+    checkpoint.remove.assert_called_once()
@@ -0,0 +1,201 @@
+import asyncio
+import sqlite3
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+
+from executor.exceptions import RunnerException
+from executor.incremental import (
+    IncrementalState,
+    get_key_column,
+    get_state_file,
+    load_state,
+)
+
+
+@pytest.fixture
+def state_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_STATE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _run(rows, key_column=0, parameters=None):
+    state = load_state('RDC-001', 'VA-001', parameters or {}, key_column)
+    merged = list(state.merge(rows))
+    state.save()
+    return merged
+
+
+def test_incremental_state_update():
+    state = IncrementalState(high_water_mark='2023-01-01')
+    state.update('2023-01-03')
+    state.update('2023-01-02')
+    state.update(None)
+
+    assert state.high_water_mark == '2023-01-01'
+    assert state.next_high_water_mark == '2023-01-03'
+
+
+def test_get_key_column():
+    assert get_key_column([MagicMock(args=None), MagicMock(args={'incremental_key': 1})]) == 1
+
+    with pytest.raises(RunnerException) as cv:
+        get_key_column([MagicMock(args={})])
+
+    assert 'incremental_key renderer argument' in str(cv.value)
+
+
+def test_incremental_state_merge(state_dir):
+    _run([['PR-001', 'pending'], ['PR-002', 'pending']])
+
+    rows = _run(iter([('PR-002', 'approved'), ('PR-003', 'pending')]))
+
+    assert rows == [
+        ['PR-001', 'pending'],
+        ['PR-002', 'approved'],
+        ['PR-003', 'pending'],
+    ]
+
+
+def test_incremental_state_merge_key_column(state_dir):
+    _run([['pending', 'PR-001']], key_column=1)
+
+    assert _run([['approved', 'PR-001']], key_column=1) == [['approved', 'PR-001']]
+
+
+def test_incremental_state_merge_without_previous_state(state_dir):
+    rows = [('MP-1', 1), ('MP-1', 2), ('MP-2', 3)]
+
+    assert _run(rows) == rows
+    assert list(load_state('RDC-001', 'VA-001', {}, 0).rows()) == [
+        ['MP-1', 1], ['MP-1', 2], ['MP-2', 3],
+    ]
+
+
+def test_incremental_state_merge_not_configured(monkeypatch):
+    monkeypatch.delenv('REPORTS_STATE_DIR', raising=False)
+    state = load_state('RDC-001', 'VA-001', {}, 0)
+    data = [['PR-001', 'approved']]
+
+    assert list(state.merge(data)) == data
+    state.save()
+    assert list(state.rows()) == []
+
+
+def test_incremental_state_merge_keeps_rows_of_one_run(state_dir):
+    _run([['MP-1', 0], ['MP-1', 1], ['MP-2', 2]])
+
+    assert _run([['MP-1', 3], ['MP-1', 4]]) == [['MP-1', 3], ['MP-1', 4], ['MP-2', 2]]
+
+
+def test_incremental_state_merge_normalizes_keys(state_dir):
+    _run([['2023-01-01', 'a'], ['2023-01-02', 'b']])
+
+    rows = _run([[date(2023, 1, 2), 'b2']])
+
+    assert rows == [['2023-01-01', 'a'], [date(2023, 1, 2), 'b2']]
+
+
+def test_incremental_state_merge_async(state_dir):
+    async def generate():
+        yield ['PR-001', 'approved']
+
+    async def merge(data):
+        state = load_state('RDC-001', 'VA-001', {}, 0)
+        rows = [row async for row in state.merge_async(data)]
+        state.save()
+        return rows
+
+    assert asyncio.run(merge([['PR-001', 'pending'], ['PR-002', 'pending']])) == [
+        ['PR-001', 'pending'], ['PR-002', 'pending'],
+    ]
+    assert asyncio.run(merge(generate())) == [['PR-001', 'approved'], ['PR-002', 'pending']]
+
+
+def test_incremental_state_close_discards_work_file(state_dir):
+    _run([['PR-001', 'pending']])
+    state = load_state('RDC-001', 'VA-001', {}, 0)
+    next(state.merge([['PR-001', 'approved']]))
+
+    state.close()
+
+    assert list(state.rows()) == [['PR-001', 'pending']]
+    assert not list(state_dir.glob('**/*.tmp'))
+
+
+def test_get_state_file_parameters_order():
+    first = get_state_file('/state', 'RDC-001', 'VA-001', {'a': 1, 'b': 2})
+    second = get_state_file('/state', 'RDC-001', 'VA-001', {'b': 2, 'a': 1})
+
+    assert first == second
+    assert first.startswith('/state/RDC-001/VA-001/')
+    assert first.endswith('.sqlite')
+
+
+def test_load_state_not_configured(monkeypatch):
+    monkeypatch.delenv('REPORTS_STATE_DIR', raising=False)
+
+    state = load_state('RDC-001', 'VA-001', {}, 0)
+
+    assert state.high_water_mark is None
+    assert state.previous is False
+
+
+def test_load_state_no_previous_run(state_dir):
+    state = load_state('RDC-001', 'VA-001', {'status': 'approved'}, 0)
+
+    assert state.high_water_mark is None
+    assert state.previous is False
+
+
+def test_save_and_load_state(state_dir):
+    parameters = {'status': 'approved'}
+    state = load_state('RDC-001', 'VA-001', parameters, 1)
+    list(state.merge([['pending', 'PR-001']]))
+    state.update('2023-01-02T00:00:00+00:00')
+    state.save()
+
+    loaded = load_state('RDC-001', 'VA-001', parameters, 1)
+
+    assert loaded.high_water_mark == '2023-01-02T00:00:00+00:00'
+    assert loaded.previous is True
+    assert list(loaded.rows()) == [['pending', 'PR-001']]
+    assert load_state('RDC-001', 'VA-002', parameters, 1).previous is False
+
+
+def test_save_and_load_state_types(state_dir):
+    updated = datetime(2023, 1, 1, 10, 30, tzinfo=timezone.utc)
+    _run([[date(2023, 1, 1), Decimal('10.50'), updated], [date(2023, 1, 2), Decimal('1'), None]])
+
+    rows = _run([[date(2023, 1, 2), Decimal('2'), {'$type': 'other', 'value': 1}]])
+
+    assert rows == [
+        [date(2023, 1, 1), Decimal('10.50'), updated],
+        [date(2023, 1, 2), Decimal('2'), {'$type': 'other', 'value': 1}],
+    ]
+
+
+def test_load_state_other_key_column(state_dir, caplog):
+    _run([['PR-001', 'pending']])
+
+    state = load_state('RDC-001', 'VA-001', {}, 1)
+
+    assert state.previous is False
+    assert 'running without previous state' in caplog.text
+
+
+def test_load_state_invalid_file(state_dir, caplog):
+    state_file = get_state_file(str(state_dir), 'RDC-001', 'VA-001', {})
+    _run([['PR-001', 'pending']])
+    with open(state_file, 'wb') as fp:
+        fp.write(b'\x80\x04not a database')
+
+    state = load_state('RDC-001', 'VA-001', {}, 0)
+
+    assert state.previous is False
+    assert 'running without previous state' in caplog.text
+    assert _run([['PR-002', 'pending']]) == [['PR-002', 'pending']]
+    with sqlite3.connect(state_file) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0] == 1
@@ -0,0 +1,145 @@
+import json
+import logging
+import sys
+
+from executor.log import (
+    ContextFilter,
+    JSONFormatter,
+    RateLimitFilter,
+    configure_logging,
+    set_log_context,
+)
+
+
+def make_record(name='executor', msg='hello', **extra):
+    record = logging.LogRecord(name, logging.INFO, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_context(mocker):
+    mocker.patch.dict('executor.log._log_context', clear=True)
+    set_log_context(report_id='REP-1', template='TP-1', renderer='xlsx')
+    record = make_record(stdout='out')
+    ContextFilter().filter(record)
+
+    data = json.loads(JSONFormatter().format(record))
+
+    assert data['message'] == 'hello'
+    assert data['level'] == 'INFO'
+    assert data['logger'] == 'executor'
+    assert data['report_id'] == 'REP-1'
+    assert data['template'] == 'TP-1'
+    assert data['renderer'] == 'xlsx'
+    assert data['stdout'] == 'out'
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord(
+            'executor', logging.ERROR, __file__, 1, 'failed', None, sys.exc_info(),
+        )
+
+    data = json.loads(JSONFormatter().format(record))
+
+    assert 'ValueError: boom' in data['exc_info']
+    assert 'report_id' not in data
+
+
+def test_rate_limit_filter(mocker):
+    monotonic = mocker.patch('executor.log.time.monotonic', return_value=10.0)
+    rate_filter = RateLimitFilter(2)
+
+    assert [rate_filter.filter(make_record()) for _ in range(4)] == [True, True, False, False]
+    assert rate_filter.filter(make_record(name='other')) is True
+
+    monotonic.return_value = 11.0
+    record = make_record()
+    assert rate_filter.filter(record) is True
+    assert record.dropped_records == 2
+
+
+def test_rate_limit_filter_passes_warnings(mocker):
+    mocker.patch('executor.log.time.monotonic', return_value=10.0)
+    rate_filter = RateLimitFilter(1)
+    warning = make_record()
+    warning.levelno = logging.WARNING
+
+    assert [rate_filter.filter(make_record()) for _ in range(2)] == [True, False]
+    assert rate_filter.filter(warning) is True
+
+
+def test_rate_limit_filter_flush(mocker):
+    mocker.patch('executor.log.time.monotonic', return_value=10.0)
+    rate_filter = RateLimitFilter(1)
+    handler = mocker.MagicMock()
+    for _ in range(4):
+        rate_filter.filter(make_record())
+
+    rate_filter.flush(handler)
+    rate_filter.flush(handler)
+
+    record = handler.handle.call_args[0][0]
+    handler.handle.assert_called_once()
+    assert record.name == 'executor'
+    assert record.levelno == logging.WARNING
+    assert record.dropped_records == 3
+
+
+def test_configure_logging_text(mocker, monkeypatch):
+    monkeypatch.delenv('REPORTS_LOG_FORMAT', raising=False)
+    basic_config = mocker.patch('executor.log.logging.basicConfig')
+
+    assert configure_logging() is None
+    basic_config.assert_called_once()
+
+
+def test_configure_logging_json(mocker, monkeypatch, capsys):
+    monkeypatch.setenv('REPORTS_LOG_FORMAT', 'json')
+    atexit_register = mocker.patch('executor.log.atexit.register')
+    mocker.patch('executor.log.time.monotonic', return_value=10.0)
+    mocker.patch.dict('executor.log._log_context', clear=True)
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+
+    listener = configure_logging()
+    try:
+        set_log_context(report_id='REP-1')
+        for _ in range(300):
+            logging.getLogger('executor.noisy').info('noisy')
+        logging.getLogger('executor').info('structured')
+        flush, handler = atexit_register.call_args[0]
+        flush(handler)
+    finally:
+        listener.stop()
+        root.handlers = handlers
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.strip().splitlines()]
+    assert lines[-2]['message'] == 'structured'
+    assert lines[-2]['report_id'] == 'REP-1'
+    assert lines[-1]['dropped_records'] == 100
+    assert lines[-1]['logger'] == 'executor.noisy'
+
+
+def test_configure_logging_json_exception(mocker, monkeypatch, capsys):
+    monkeypatch.setenv('REPORTS_LOG_FORMAT', 'json')
+    mocker.patch('executor.log.atexit.register')
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+
+    listener = configure_logging()
+    try:
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logging.getLogger('executor').exception('failed %s', 'badly')
+    finally:
+        listener.stop()
+        root.handlers = handlers
+
+    data = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert data['message'] == 'failed badly'
+    assert data['exc_info'].startswith('Traceback')
+    assert 'ValueError: boom' in data['exc_info']
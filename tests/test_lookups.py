@@ -0,0 +1,214 @@
+import asyncio
+import json
+from urllib.parse import unquote
+
+import httpx
+import pytest
+from connect.client import AsyncConnectClient, ClientError, ConnectClient
+
+from executor.lookups import (
+    AsyncBatchLookup,
+    BatchLookup,
+    batch_lookup,
+    get_lookup_batch_size,
+)
+
+
+ENDPOINT = 'https://localhost/public/v1'
+PRODUCTS = {
+    f'PRD-{idx}': {'id': f'PRD-{idx}', 'vendor': {'id': f'VA-{idx % 2}'}} for idx in range(5)
+}
+
+
+def _client(client_class=ConnectClient):
+    return client_class('ApiKey SU-000:123', endpoint=ENDPOINT, use_specs=False, max_retries=0)
+
+
+def _requested_ids(url):
+    query = unquote(url)
+    return query[query.index('in(id,(') + 7:query.index('))')].split(',')
+
+
+def _products_callback(request):
+    products = [PRODUCTS[id_] for id_ in _requested_ids(request.url) if id_ in PRODUCTS]
+    headers = {'Content-Range': f'items 0-{max(len(products) - 1, 0)}/{len(products)}'}
+    return 200, headers, json.dumps(products)
+
+
+@pytest.fixture
+def products_api(mocked_responses):
+    mocked_responses.add_callback(
+        'GET',
+        f'{ENDPOINT}/products',
+        callback=_products_callback,
+        content_type='application/json',
+    )
+    return mocked_responses
+
+
+def test_get_lookup_batch_size(monkeypatch):
+    assert get_lookup_batch_size() == 100
+    monkeypatch.setenv('REPORTS_LOOKUP_BATCH_SIZE', '10')
+    assert get_lookup_batch_size() == 10
+
+
+def test_batch_lookup_factory():
+    assert isinstance(batch_lookup(_client().products), BatchLookup)
+    assert isinstance(batch_lookup(_client(AsyncConnectClient).products), AsyncBatchLookup)
+
+
+def test_get_many(products_api):
+    lookup = BatchLookup(_client().products, batch_size=2)
+
+    result = lookup.get_many(['PRD-0', 'PRD-1', 'PRD-0', 'PRD-9', None, 'PRD-2'])
+
+    assert result == {
+        'PRD-0': PRODUCTS['PRD-0'],
+        'PRD-1': PRODUCTS['PRD-1'],
+        'PRD-9': None,
+        None: None,
+        'PRD-2': PRODUCTS['PRD-2'],
+    }
+    assert [_requested_ids(call.request.url) for call in products_api.calls] == [
+        ['PRD-0', 'PRD-1'],
+        ['PRD-9', 'PRD-2'],
+    ]
+
+
+def test_get_memoizes(products_api):
+    lookup = BatchLookup(_client().products)
+
+    assert lookup.get('PRD-3') == PRODUCTS['PRD-3']
+    assert lookup.get('PRD-3') == PRODUCTS['PRD-3']
+    assert lookup.get(None) is None
+    assert len(products_api.calls) == 1
+
+
+def test_resolve(products_api):
+    rows = [('PR-1', 'PRD-1'), ('PR-2', 'PRD-2'), ('PR-3', 'PRD-1'), ('PR-4', 'PRD-4')]
+    lookup = BatchLookup(_client().products, batch_size=3)
+
+    resolved = list(lookup.resolve(iter(rows), key=lambda row: row[1]))
+
+    assert resolved == [(row, PRODUCTS[row[1]]) for row in rows]
+    assert len(products_api.calls) == 2
+
+
+def test_lookup_by_nested_field(mocked_responses):
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[PRODUCTS['PRD-1']],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+    lookup = BatchLookup(_client().products, field='vendor.id', select=['-media'])
+
+    assert lookup.get_many(['VA-1', 'VA-2']) == {'VA-1': PRODUCTS['PRD-1'], 'VA-2': None}
+    url = unquote(mocked_responses.calls[0].request.url)
+    assert 'in(vendor.id,(VA-1,VA-2))' in url
+    assert 'select(-media)' in url
+
+
+def _async_client(handler):
+    client = _client(AsyncConnectClient)
+    client._session.set(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return client
+
+
+def test_async_get_coalesces_requests():
+    requests = []
+
+    def handler(request):
+        ids = _requested_ids(str(request.url))
+        requests.append(ids)
+        products = [PRODUCTS[id_] for id_ in ids if id_ in PRODUCTS]
+        return httpx.Response(
+            200,
+            json=products,
+            headers={'Content-Range': f'items 0-{len(products) - 1}/{len(products)}'},
+        )
+
+    async def lookup_products():
+        lookup = AsyncBatchLookup(_async_client(handler).products, batch_size=3)
+        first = await asyncio.gather(
+            *[lookup.get(id_) for id_ in ('PRD-0', 'PRD-1', 'PRD-0', 'PRD-2', 'PRD-3', None)],
+        )
+        second = await lookup.get_many(['PRD-1', 'PRD-4'])
+        resolved = [item async for item in lookup.resolve([('PR-1', 'PRD-4')], lambda row: row[1])]
+        return first, second, resolved
+
+    first, second, resolved = asyncio.run(lookup_products())
+
+    assert first == [
+        PRODUCTS['PRD-0'],
+        PRODUCTS['PRD-1'],
+        PRODUCTS['PRD-0'],
+        PRODUCTS['PRD-2'],
+        PRODUCTS['PRD-3'],
+        None,
+    ]
+    assert second == {'PRD-1': PRODUCTS['PRD-1'], 'PRD-4': PRODUCTS['PRD-4']}
+    assert resolved == [(('PR-1', 'PRD-4'), PRODUCTS['PRD-4'])]
+    assert requests == [['PRD-0', 'PRD-1', 'PRD-2'], ['PRD-3'], ['PRD-4']]
+
+
+def test_async_get_awaits_in_flight_requests():
+    requests = []
+
+    def handler(request):
+        ids = _requested_ids(str(request.url))
+        requests.append(ids)
+        products = [PRODUCTS[id_] for id_ in ids]
+        return httpx.Response(
+            200,
+            json=products,
+            headers={'Content-Range': f'items 0-{len(products) - 1}/{len(products)}'},
+        )
+
+    async def lookup_products():
+        lookup = AsyncBatchLookup(_async_client(handler).products, batch_size=2)
+        resources = await asyncio.gather(
+            *[lookup.get(id_) for id_ in ('PRD-0', 'PRD-1', 'PRD-0', 'PRD-1')],
+        )
+        return resources, lookup.in_flight
+
+    resources, in_flight = asyncio.run(lookup_products())
+
+    assert resources == [PRODUCTS['PRD-0'], PRODUCTS['PRD-1']] * 2
+    assert requests == [['PRD-0', 'PRD-1']]
+    assert in_flight == {}
+
+
+def test_async_get_error():
+    def handler(request):
+        return httpx.Response(500, json={})
+
+    async def lookup_products():
+        lookup = AsyncBatchLookup(_async_client(handler).products)
+        return await asyncio.gather(
+            lookup.get('PRD-0'),
+            lookup.get('PRD-1'),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(lookup_products())
+
+    assert all(isinstance(error, ClientError) for error in errors)
+
+
+def test_async_get_cancelled():
+    async def handler(request):
+        await asyncio.sleep(10)
+
+    async def lookup_products():
+        lookup = AsyncBatchLookup(_async_client(handler).products)
+        getters = asyncio.gather(lookup.get('PRD-0'), lookup.get('PRD-1'), return_exceptions=True)
+        await asyncio.sleep(0.01)
+        for task in lookup._tasks:
+            task.cancel()
+        return await asyncio.wait_for(getters, 1), lookup.in_flight
+
+    errors, in_flight = asyncio.run(lookup_products())
+
+    assert all(isinstance(error, asyncio.CancelledError) for error in errors)
+    assert in_flight == {}
@@ -0,0 +1,165 @@
+import resource
+import urllib.request
+
+import pytest
+from connect.client import ClientError
+
+from executor.decoding import DecodingConnectClient
+from executor.metrics import (
+    API_CALLS,
+    API_RETRIES,
+    PEAK_RSS,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRequestLogger,
+    Registry,
+    generate_metrics,
+    setup_metrics,
+    start_metrics_server,
+    write_metrics,
+)
+
+
+def test_counter_to_text():
+    counter = Counter('test_failures', 'Failures.')
+    assert counter.to_text() == ''
+
+    counter.inc(category='preparation')
+    counter.inc(2, category='execution')
+
+    assert counter.to_text() == (
+        '# HELP test_failures Failures.\n'
+        '# TYPE test_failures counter\n'
+        'test_failures_total{category="execution"} 2\n'
+        'test_failures_total{category="preparation"} 1\n'
+    )
+
+
+def test_gauge_escapes_labels():
+    gauge = Gauge('test_gauge', 'Gauge.')
+    gauge.set(3, name='a "quoted"\\value')
+
+    assert 'test_gauge{name="a \\"quoted\\"\\\\value"} 3\n' in gauge.to_text()
+
+
+def test_histogram_to_text(mocker):
+    histogram = Histogram('test_duration_seconds', 'Duration.', buckets=(1, 10))
+    monotonic = mocker.patch('executor.metrics.time.monotonic', side_effect=[0, 5])
+    with histogram.time(phase='execute'):
+        pass
+    histogram.observe(0.5, phase='execute')
+
+    text = histogram.to_text()
+
+    assert monotonic.call_count == 2
+    assert 'test_duration_seconds_bucket{phase="execute",le="1"} 1\n' in text
+    assert 'test_duration_seconds_bucket{phase="execute",le="10"} 2\n' in text
+    assert 'test_duration_seconds_bucket{phase="execute",le="+Inf"} 2\n' in text
+    assert 'test_duration_seconds_sum{phase="execute"} 5.5\n' in text
+    assert 'test_duration_seconds_count{phase="execute"} 2\n' in text
+
+
+def test_request_logger_counts_calls_and_retries(mocker, mocked_responses):
+    mocker.patch('connect.client.mixins.time.sleep')
+    mocked_responses.add('GET', 'https://localhost/public/v1/reports/REP-1', status=502)
+    mocked_responses.add('GET', 'https://localhost/public/v1/reports/REP-1', json={'id': 'REP-1'})
+    retries = sum(value for _, _, value in API_RETRIES.samples())
+    calls = {labels: value for _, labels, value in API_CALLS.samples()}
+    client = DecodingConnectClient(
+        'ApiKey 123',
+        endpoint='https://localhost/public/v1',
+        use_specs=False,
+        logger=MetricsRequestLogger(),
+    )
+
+    client.collection('reports')['REP-1'].get()
+
+    assert sum(value for _, _, value in API_RETRIES.samples()) == retries + 1
+    new_calls = {labels: value for _, labels, value in API_CALLS.samples()}
+    server_errors = (('method', 'GET'), ('status', '5xx'))
+    successes = (('method', 'GET'), ('status', '2xx'))
+    assert new_calls[server_errors] == calls.get(server_errors, 0) + 1
+    assert new_calls[successes] == calls.get(successes, 0) + 1
+
+
+def test_request_logger_repeated_call_is_not_a_retry(mocked_responses):
+    mocked_responses.add('GET', 'https://localhost/public/v1/reports/REP-1', status=502)
+    mocked_responses.add('GET', 'https://localhost/public/v1/reports/REP-1', json={'id': 'REP-1'})
+    retries = sum(value for _, _, value in API_RETRIES.samples())
+    client = DecodingConnectClient(
+        'ApiKey 123',
+        endpoint='https://localhost/public/v1',
+        use_specs=False,
+        max_retries=0,
+        logger=MetricsRequestLogger(),
+    )
+
+    with pytest.raises(ClientError):
+        client.collection('reports')['REP-1'].get()
+    client.collection('reports')['REP-1'].get()
+
+    assert sum(value for _, _, value in API_RETRIES.samples()) == retries
+
+
+def test_peak_rss_of_runner_children(mocker):
+    getrusage = mocker.patch(
+        'executor.metrics.resource.getrusage',
+        return_value=mocker.MagicMock(ru_maxrss=10),
+    )
+    mocker.patch('executor.metrics._process_name', 'runner')
+    registry = Registry()
+    registry.register(PEAK_RSS)
+    mocker.patch('executor.metrics.REGISTRY', registry)
+
+    assert 'reports_peak_rss_bytes{process="runner"} 10240\n' in generate_metrics()
+    getrusage.assert_called_once_with(resource.RUSAGE_CHILDREN)
+
+    mocker.patch('executor.metrics._process_name', 'executor')
+    generate_metrics()
+    getrusage.assert_called_with(resource.RUSAGE_SELF)
+
+
+def test_write_metrics(mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORT_ID', 'REC-000-000-0000-000000')
+    registry = Registry()
+    registry.register(Counter('test_executions', 'Executions.')).inc(result='success')
+    registry.register(PEAK_RSS)
+    mocker.patch('executor.metrics.REGISTRY', registry)
+    mocker.patch('executor.metrics._process_name', 'runner')
+
+    metrics_file = write_metrics(str(tmp_path / 'metrics'))
+
+    assert metrics_file.endswith('reports_runner_REC-000-000-0000-000000.prom')
+    with open(metrics_file) as fp:
+        text = fp.read()
+    assert (
+        'test_executions_total{report_id="REC-000-000-0000-000000",result="success"} 1\n'
+    ) in text
+    assert 'reports_peak_rss_bytes{report_id="REC-000-000-0000-000000",process="runner"} ' in text
+
+
+def test_metrics_server():
+    server = start_metrics_server(0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as r:
+            assert r.status == 200
+            assert r.headers['Content-Type'].startswith('text/plain')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_setup_metrics(mocker, monkeypatch, tmp_path):
+    register = mocker.patch('executor.metrics.atexit.register')
+    start_server = mocker.patch('executor.metrics.start_metrics_server')
+    mocker.patch('executor.metrics._process_name', None)
+    monkeypatch.setenv('REPORTS_METRICS_DIR', str(tmp_path))
+    monkeypatch.setenv('REPORTS_METRICS_PORT', '9100')
+
+    setup_metrics('runner')
+    register.assert_called_once_with(write_metrics, str(tmp_path))
+    start_server.assert_not_called()
+
+    setup_metrics('executor', serve=True)
+    start_server.assert_called_once_with(9100)
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+from connect.client import ClientError, ConnectClient
+
+from executor.cassette import Cassette, CassetteConnectClient
+from executor.decoding import DecodingConnectClient
+from executor.outbox import (
+    Outbox,
+    open_outbox,
+    post_report_action,
+    without_retries,
+)
+
+
+FAIL_URL = 'https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/fail'
+
+
+@pytest.fixture
+def client():
+    return ConnectClient(
+        'ApiKey 123',
+        endpoint='https://localhost/public/v1',
+        use_specs=False,
+        max_retries=0,
+    )
+
+
+@pytest.fixture
+def sleep(mocker):
+    return mocker.patch('executor.outbox.time.sleep')
+
+
+def test_outbox_post(mocked_responses, client, tmp_path):
+    mocked_responses.add('POST', FAIL_URL, json={'id': 'REC-000-000-0000-000000'})
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000')
+
+    response = outbox.post(client, 'fail', {'notes': 'error'})
+
+    assert response == {'id': 'REC-000-000-0000-000000'}
+    assert outbox.pending() == []
+    assert outbox.is_terminal_delivered()
+    assert len(mocked_responses.calls[0].request.headers['Idempotency-Key']) == 32
+
+
+def test_outbox_post_retries_with_backoff(mocked_responses, client, tmp_path, sleep):
+    mocked_responses.add('POST', FAIL_URL, status=502)
+    mocked_responses.add('POST', FAIL_URL, status=503)
+    mocked_responses.add('POST', FAIL_URL, json={})
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000', retries=3)
+
+    outbox.post(client, 'fail', {'notes': 'error'})
+
+    assert [call.args[0] for call in sleep.call_args_list] == [1, 2]
+    keys = {call.request.headers['Idempotency-Key'] for call in mocked_responses.calls}
+    assert len(keys) == 1
+    assert outbox.is_terminal_delivered()
+
+
+def test_outbox_post_retries_exhausted(mocked_responses, client, tmp_path, sleep):
+    mocked_responses.add('POST', FAIL_URL, status=500)
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000', retries=1)
+
+    with pytest.raises(ClientError):
+        outbox.post(client, 'fail', {'notes': 'error'})
+
+    assert len(outbox.pending()) == 1
+    assert not outbox.is_terminal_delivered()
+
+    mocked_responses.replace('POST', FAIL_URL, json={})
+    assert outbox.drain(client) == 1
+    assert outbox.pending() == []
+    assert outbox.is_terminal_delivered()
+
+
+def test_outbox_post_not_retryable(mocked_responses, client, tmp_path, sleep):
+    mocked_responses.add(
+        'POST', FAIL_URL, status=400, json={'error_code': 'REP_001', 'errors': ['bad']},
+    )
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000')
+
+    with pytest.raises(ClientError):
+        outbox.post(client, 'fail', {'notes': 'error'})
+
+    sleep.assert_not_called()
+    assert outbox.pending() == []
+    assert not outbox.is_terminal_delivered()
+
+
+def test_outbox_post_client_does_not_retry(mocked_responses, tmp_path, sleep):
+    mocked_responses.add('POST', FAIL_URL, status=502)
+    client = DecodingConnectClient(
+        'ApiKey 123',
+        endpoint='https://localhost/public/v1',
+        use_specs=False,
+        max_retries=3,
+    )
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000', retries=1)
+
+    with pytest.raises(ClientError):
+        outbox.post(client, 'fail', {'notes': 'error'})
+
+    assert len(mocked_responses.calls) == 2
+    assert client.max_retries == 3
+
+
+def test_without_retries(client):
+    assert without_retries(client) is client
+
+    cassette = Cassette('/tmp/cassette.json.gz', 'replay')
+    retrying = CassetteConnectClient(
+        'ApiKey 123',
+        endpoint='https://localhost/public/v1',
+        default_headers={'User-Agent': 'runner'},
+        max_retries=3,
+        cassette=cassette,
+    )
+    copy = without_retries(retrying)
+
+    assert type(copy) is CassetteConnectClient
+    assert copy.max_retries == 0
+    assert copy.cassette is cassette
+    assert copy.default_headers == {'User-Agent': 'runner'}
+    assert copy.api_key == 'ApiKey 123'
+
+
+def test_outbox_post_already_applied(mocked_responses, client, tmp_path):
+    mocked_responses.add('POST', FAIL_URL, status=409)
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000')
+
+    assert outbox.post(client, 'fail', {'notes': 'error'}) is None
+    assert outbox.is_terminal_delivered()
+
+
+def test_outbox_remove(tmp_path):
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000')
+    outbox.add('fail', {'notes': 'error'})
+
+    outbox.remove()
+
+    assert not os.path.exists(outbox.directory)
+
+
+def test_open_outbox(monkeypatch, tmp_path):
+    monkeypatch.delenv('REPORTS_OUTBOX_DIR', raising=False)
+    assert open_outbox('REC-000-000-0000-000000') is None
+
+    monkeypatch.setenv('REPORTS_OUTBOX_DIR', str(tmp_path))
+    outbox = open_outbox('REC-000-000-0000-000000')
+    assert outbox.directory == str(tmp_path / 'REC-000-000-0000-000000')
+
+
+def test_post_report_action_without_outbox(mocked_responses, monkeypatch, client):
+    monkeypatch.delenv('REPORTS_OUTBOX_DIR', raising=False)
+    mocked_responses.add('POST', FAIL_URL, json={})
+
+    post_report_action(client, 'REC-000-000-0000-000000', 'fail', {'notes': 'error'})
+
+    assert 'Idempotency-Key' not in mocked_responses.calls[0].request.headers
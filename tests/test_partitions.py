@@ -0,0 +1,170 @@
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from executor.partitions import _ProgressAggregator, get_partitions, partitioned_entrypoint
+
+
+REPORTS_DIR = os.path.abspath('./tests/fixtures/reports/report_spec_v2')
+ENTRYPOINT = 'super_report.entrypoint_v2_partitioned.generate'
+REPORT_ENV = {
+    'report_id': 'REC-000-000-0000-000000',
+    'client_token': 'ApiKey 123',
+    'api_endpoint': 'https://localhost/public/v1',
+}
+
+
+@pytest.fixture
+def reports_path(monkeypatch):
+    monkeypatch.syspath_prepend(REPORTS_DIR)
+
+
+@pytest.mark.parametrize(
+    ('spec', 'workers', 'sizes', 'expected'),
+    (
+        ('2', '4', [1, 2], [{'size': 1}, {'size': 2}]),
+        ('2', '4', [1], None),
+        ('2', '1', [1, 2], None),
+        ('3', '4', [1, 2], None),
+    ),
+)
+def test_get_partitions(monkeypatch, reports_path, spec, workers, sizes, expected):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', workers)
+    definition = MagicMock(report_spec=spec, entrypoint=ENTRYPOINT)
+
+    assert get_partitions(definition, {'sizes': sizes}) == expected
+
+
+def test_get_partitions_no_hook(monkeypatch, reports_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '4')
+    definition = MagicMock(report_spec='2', entrypoint='super_report.entrypoint_v2.generate')
+
+    assert get_partitions(definition, {}) is None
+
+
+def test_partitioned_entrypoint(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': 3}, {'size': 1}, {'size': 2}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+    progress = MagicMock()
+    extra_context = MagicMock()
+
+    rows = list(entrypoint(None, {}, progress, 'json', extra_context))
+
+    assert rows == [[3, 0], [3, 1], [3, 2], [1, 0], [2, 0], [2, 1]]
+    extra_context.assert_called_once_with({'size': 3})
+    progress.assert_called_with(6, 6, force=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partitioned_entrypoint_first_partition_error(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': -1}, {'size': 1}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+
+    with pytest.raises(ValueError) as e:
+        list(entrypoint(None, {}, MagicMock(), 'json', MagicMock()))
+
+    assert str(e.value) == 'Invalid partition'
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partitioned_entrypoint_partition_error(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': 1}, {'size': -1}, {'size': 1}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+
+    rows = entrypoint(None, {}, MagicMock(), 'json', MagicMock())
+
+    assert next(rows) == [1, 0]
+    with pytest.raises(ValueError):
+        next(rows)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partitioned_entrypoint_streams_chunks(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': 2500}, {'size': 1}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+
+    rows = entrypoint(None, {}, MagicMock(), 'json', MagicMock())
+
+    assert next(rows) == [2500, 0]
+    assert list(rows)[-2:] == [[2500, 2499], [1, 0]]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partitioned_entrypoint_closed_early(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': 1500}, {'size': 1500}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+
+    rows = entrypoint(None, {}, MagicMock(), 'json', MagicMock())
+    assert next(rows) == [1500, 0]
+    rows.close()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_progress_aggregator(mocker):
+    now = mocker.patch('executor.partitions.time.monotonic', return_value=100)
+    progress = MagicMock()
+    aggregator = _ProgressAggregator(2, progress, interval=5)
+
+    aggregator.update(0, (1, 10))
+    aggregator.update(1, (3, 20))
+    now.return_value = 104
+    aggregator.update(0, (7, 10))
+    now.return_value = 105
+    aggregator.update(1, (9, 20))
+    aggregator.report()
+    aggregator.report()
+
+    assert progress.mock_calls == [
+        mocker.call(1, 10, force=True),
+        mocker.call(16, 30, force=True),
+    ]
+
+
+def test_partitioned_entrypoint_ignored_context(monkeypatch, tmp_path, caplog):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '2')
+    entrypoint = partitioned_entrypoint(
+        ENTRYPOINT,
+        [{'size': 1}, {'size': 1}, {'size': 2}],
+        REPORTS_DIR,
+        REPORT_ENV,
+        str(tmp_path),
+    )
+    extra_context = MagicMock()
+
+    list(entrypoint(None, {}, MagicMock(), 'json', extra_context))
+
+    extra_context.assert_called_once_with({'size': 1})
+    assert 'Extra context of partition 1' not in caplog.text
+    assert 'Extra context of partition 2 ignored' in caplog.text
@@ -0,0 +1,219 @@
+import asyncio
+import os
+
+import pytest
+from connect.reports.datamodels import RendererDefinition
+
+from executor.exceptions import RunnerException
+from executor.postprocessing import PostProcessor, get_post_processor
+
+
+ROWS = [
+    ('PR-001', 'VA-001', 'approved', 10),
+    ('PR-002', 'VA-002', 'pending', None),
+    ('PR-003', 'VA-001', 'approved', 5),
+    ('PR-004', 'VA-002', 'approved', 7),
+    ('PR-005', 'VA-003', 'failed', 1),
+]
+COLUMNS = ['id', 'vendor', 'status', 'amount']
+
+
+def _process(steps, rows=ROWS, **kwargs):
+    return list(PostProcessor(steps, COLUMNS, batch_size=2, **kwargs).process(iter(rows)))
+
+
+def _renderer(args):
+    return RendererDefinition(
+        root_path='/reports', id='json', type='json', description='Json', args=args,
+    )
+
+
+@pytest.mark.parametrize(
+    ('operator', 'value', 'expected'),
+    (
+        ('eq', 'approved', ['PR-001', 'PR-003', 'PR-004']),
+        ('ne', 'approved', ['PR-002', 'PR-005']),
+        ('in', ['pending', 'failed'], ['PR-002', 'PR-005']),
+        ('not_in', ['approved', 'failed'], ['PR-002']),
+    ),
+)
+def test_filter(operator, value, expected):
+    steps = [{'type': 'filter', 'column': 'status', 'operator': operator, 'value': value}]
+
+    assert [row[0] for row in _process(steps)] == expected
+
+
+@pytest.mark.parametrize(
+    ('operator', 'value', 'expected'),
+    (
+        ('gt', 5, ['PR-001', 'PR-004']),
+        ('le', 5, ['PR-003', 'PR-005']),
+        ('is_null', None, ['PR-002']),
+        ('not_null', None, ['PR-001', 'PR-003', 'PR-004', 'PR-005']),
+    ),
+)
+def test_filter_nulls(operator, value, expected):
+    steps = [{'type': 'filter', 'column': 3, 'operator': operator, 'value': value}]
+
+    assert [row[0] for row in _process(steps)] == expected
+
+
+def test_select():
+    steps = [
+        {'type': 'select', 'columns': ['amount', 0]},
+        {'type': 'filter', 'column': 'amount', 'operator': 'ge', 'value': 7},
+    ]
+
+    assert _process(steps) == [[10, 'PR-001'], [7, 'PR-004']]
+
+
+def test_sort():
+    steps = [
+        {'type': 'sort', 'keys': ['vendor', {'column': 'amount', 'descending': True}]},
+        {'type': 'select', 'columns': ['id']},
+    ]
+
+    assert _process(steps) == [['PR-001'], ['PR-003'], ['PR-002'], ['PR-004'], ['PR-005']]
+
+
+def test_sort_spills(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_SORT_BUFFER_SIZE', '2')
+    monkeypatch.setenv('REPORTS_SPILL_DIR', str(tmp_path))
+    steps = [{'type': 'sort', 'keys': [{'column': 'id', 'descending': True}]}]
+
+    assert [row[0] for row in _process(steps)] == [
+        'PR-005', 'PR-004', 'PR-003', 'PR-002', 'PR-001',
+    ]
+    assert os.listdir(tmp_path) == []
+
+
+def test_sort_nulls_last():
+    steps = [{'type': 'sort', 'keys': ['amount']}, {'type': 'select', 'columns': ['amount']}]
+
+    assert _process(steps) == [[1], [5], [7], [10], [None]]
+
+
+def test_group_by():
+    steps = [
+        {
+            'type': 'group_by',
+            'columns': ['vendor'],
+            'aggregates': [
+                {'function': 'count'},
+                {'function': 'count', 'column': 'amount'},
+                {'function': 'sum', 'column': 'amount', 'name': 'total'},
+                {'function': 'min', 'column': 'amount'},
+                {'function': 'max', 'column': 'amount'},
+                {'function': 'avg', 'column': 'amount'},
+            ],
+        },
+        {'type': 'sort', 'keys': [{'column': 'total', 'descending': True}]},
+        {
+            'type': 'select',
+            'columns': ['vendor', 'count(*)', 'count(amount)', 'total', 'avg(amount)'],
+        },
+    ]
+
+    assert _process(steps) == [
+        ['VA-001', 2, 2, 15, 7.5],
+        ['VA-002', 2, 1, 7, 7.0],
+        ['VA-003', 1, 1, 1, 1.0],
+    ]
+
+
+def test_group_by_empty_group_aggregates():
+    steps = [
+        {
+            'type': 'group_by',
+            'columns': ['status'],
+            'aggregates': [
+                {'function': 'min', 'column': 'amount'},
+                {'function': 'avg', 'column': 'amount'},
+            ],
+        },
+        {'type': 'filter', 'column': 'status', 'value': 'pending'},
+    ]
+
+    assert _process(steps) == [['pending', None, None]]
+
+
+def test_process_batches():
+    steps = [{'type': 'filter', 'column': 'status', 'value': 'approved'}]
+    batches = [ROWS[:2], {column: list(values) for column, values in zip(COLUMNS, zip(*ROWS[2:]))}]
+
+    rows = _process(steps, batches, batches=True)
+
+    assert [row[0] for row in rows] == ['PR-001', 'PR-003', 'PR-004']
+
+
+def test_process_async():
+    async def generate():
+        for row in ROWS:
+            yield row
+
+    async def collect():
+        processor = PostProcessor(
+            [
+                {'type': 'filter', 'column': 'status', 'value': 'approved'},
+                {'type': 'sort', 'keys': ['amount']},
+            ],
+            COLUMNS,
+            batch_size=2,
+        )
+        return [row[0] async for row in processor.process_async(generate())]
+
+    assert asyncio.run(collect()) == ['PR-003', 'PR-004', 'PR-001']
+
+
+@pytest.mark.parametrize(
+    ('steps', 'message'),
+    (
+        ([{'type': 'pivot'}], 'Unknown post-processing step pivot.'),
+        ([{'type': 'filter', 'column': 'missing'}], 'Unknown post-processing column missing.'),
+        ([{'type': 'filter', 'column': 0, 'operator': 'like'}], 'Unknown filter operator like.'),
+        (
+            [{'type': 'filter', 'column': 0, 'operator': 'in'}],
+            'Post-processing step filter in requires a list of values.',
+        ),
+        (
+            [{'type': 'filter', 'column': 0, 'operator': 'not_in', 'value': 'PR-001'}],
+            'Post-processing step filter not_in requires a list of values.',
+        ),
+        (
+            [{'type': 'filter', 'column': 0, 'operator': 'gt', 'value': None}],
+            'Post-processing step filter gt requires a value.',
+        ),
+        ([{'type': 'select'}], "Post-processing step select requires the 'columns' attribute."),
+        (
+            [{'type': 'group_by', 'columns': [0], 'aggregates': [{'function': 'median'}]}],
+            'Unknown aggregate function median.',
+        ),
+        (
+            [{'type': 'group_by', 'columns': [0], 'aggregates': [{'function': 'sum'}]}],
+            'Aggregate function sum requires a column.',
+        ),
+    ),
+)
+def test_invalid_steps(steps, message):
+    with pytest.raises(RunnerException) as cv:
+        PostProcessor(steps, COLUMNS)
+
+    assert str(cv.value) == message
+
+
+def test_get_post_processor():
+    steps = [{'type': 'select', 'columns': ['id']}]
+
+    assert get_post_processor([_renderer(None)]) is None
+
+    process, _ = get_post_processor([_renderer({'columns': COLUMNS, 'post_processing': steps})])
+    assert list(process(ROWS[:1])) == [['PR-001']]
+
+
+def test_get_post_processor_mismatch():
+    steps = [{'type': 'select', 'columns': [0]}]
+
+    with pytest.raises(RunnerException) as cv:
+        get_post_processor([_renderer({'post_processing': steps}), _renderer(None)])
+
+    assert str(cv.value) == 'All renderers must declare the same post-processing steps.'
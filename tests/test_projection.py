@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+from connect.client import AsyncConnectClient, ConnectClient
+
+from executor.exceptions import RunnerException
+from executor.projection import (
+    Projection,
+    TrackedDict,
+    get_collection_key,
+    mark_used,
+    open_projection,
+)
+
+
+ENDPOINT = 'https://localhost/public/v1'
+PRODUCT = {
+    'id': 'PRD-000-000-001',
+    'name': 'Product',
+    'description': 'Long description',
+    'vendor': {'id': 'VA-000-001', 'name': 'Vendor', 'address': {'city': 'Madrid'}},
+    'media': [{'url': 'https://media'}],
+}
+
+
+def _client(client_class=ConnectClient):
+    return client_class('ApiKey SU-000:123', endpoint=ENDPOINT, use_specs=False, max_retries=0)
+
+
+def _add_products(mocked_responses):
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[PRODUCT],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+
+
+def _learn(path, mocked_responses, use):
+    _add_products(mocked_responses)
+    projection = Projection(path)
+    client = projection.install(_client(), _client())
+    for product in client.products.all():
+        use(product)
+    projection.save()
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def test_get_collection_key():
+    assert get_collection_key('products?limit=10') == 'products'
+    assert get_collection_key('products/PRD-000-000-001/items') == 'products/*/items'
+    assert get_collection_key('subscriptions/assets/AS-0000-0000-0000') == 'subscriptions/assets/*'
+
+
+def test_open_projection(monkeypatch, tmp_path):
+    assert open_projection('TPL-000') is None
+
+    monkeypatch.setenv('REPORTS_PROJECTION_DIR', str(tmp_path))
+    monkeypatch.setenv('COMMIT_ID', 'abc')
+
+    projection = open_projection('TPL-000')
+    assert projection.path == str(tmp_path / 'TPL-000-abc.json')
+    assert projection.learning
+
+
+def test_learn(mocked_responses, tmp_path):
+    def use(product):
+        assert product['name'] == 'Product'
+        assert product.get('vendor').get('id') == 'VA-000-001'
+        assert 'missing' not in product
+
+    profile = _learn(str(tmp_path / 'projections' / 'profile.json'), mocked_responses, use)
+
+    assert profile == {
+        'products': ['description', 'media', 'vendor.address', 'vendor.name'],
+    }
+
+
+def test_learn_full_objects(mocked_responses, tmp_path):
+    def use(product):
+        product['name']
+        assert dict(product['vendor'])
+
+    profile = _learn(str(tmp_path / 'profile.json'), mocked_responses, use)
+    assert profile == {'products': ['description', 'media']}
+
+    mocked_responses.reset()
+    profile = _learn(str(tmp_path / 'other.json'), mocked_responses, mark_used)
+    assert profile == {'products': []}
+
+
+def test_apply(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['description', 'vendor.name']}))
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[{'id': PRODUCT['id'], 'name': 'Product', 'vendor': {'id': 'VA-000-001'}}],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+
+    projection = Projection(str(path))
+    client = projection.install(_client(), _client())
+    products = list(client.products.all())
+    projection.save()
+
+    assert not projection.learning
+    assert 'select(-description,-vendor.name)' in mocked_responses.calls[0].request.url
+    assert products[0]['vendor']['id'] == 'VA-000-001'
+    assert json.loads(path.read_text()) == {'products': ['description', 'vendor.name']}
+
+
+def test_apply_skips_explicit_select(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['description']}))
+    _add_products(mocked_responses)
+
+    client = Projection(str(path)).install(_client(), _client())
+    products = list(client.products.all().select('-media'))
+
+    assert 'select(-media)' in mocked_responses.calls[0].request.url
+    assert not isinstance(products[0], TrackedDict)
+
+
+def test_apply_miss_refetches(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['description', 'vendor.name']}))
+    other = {**PRODUCT, 'id': 'PRD-000-000-002', 'description': 'Other description'}
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[
+            {'id': PRODUCT['id'], 'vendor': {'id': 'VA-000-001'}},
+            {'id': other['id'], 'vendor': {'id': 'VA-000-001'}},
+        ],
+        headers={'Content-Range': 'items 0-1/2'},
+    )
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[PRODUCT, other],
+        headers={'Content-Range': 'items 0-1/2'},
+    )
+
+    projection = Projection(str(path))
+    client = projection.install(_client(), _client())
+    product, other_product = list(client.products.all())
+    vendor = product['vendor']
+
+    assert vendor['name'] == 'Vendor'
+    assert product['description'] == 'Long description'
+    assert other_product['description'] == 'Other description'
+    assert len(mocked_responses.calls) == 2
+    assert 'select' not in mocked_responses.calls[1].request.url
+    assert not path.exists()
+
+    list(client.products.all())
+    list(client.products.all().filter(status='published'))
+    assert all('select' not in call.request.url for call in mocked_responses.calls[2:])
+
+
+def test_apply_miss_refetches_missing_from_page(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['description']}))
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[{'id': PRODUCT['id'], 'name': 'Product'}],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+    mocked_responses.add('GET', f'{ENDPOINT}/products', json=[], headers={'Content-Range': '*/0'})
+    mocked_responses.add('GET', f'{ENDPOINT}/products/{PRODUCT["id"]}', json=PRODUCT)
+
+    client = Projection(str(path)).install(_client(), _client())
+    product = list(client.products.all())[0]
+
+    assert product['description'] == 'Long description'
+    assert mocked_responses.calls[2].request.url.endswith(f'/products/{PRODUCT["id"]}')
+
+
+def test_apply_miss_on_iteration(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['media']}))
+    mocked_responses.add(
+        'GET',
+        f'{ENDPOINT}/products',
+        json=[{key: value for key, value in PRODUCT.items() if key != 'media'}],
+        headers={'Content-Range': 'items 0-0/1'},
+    )
+    _add_products(mocked_responses)
+
+    client = Projection(str(path)).install(_client(), _client())
+    product = list(client.products.all())[0]
+    mark_used([('PR-1', product)])
+
+    assert json.dumps(product) == json.dumps(PRODUCT)
+
+
+def test_apply_miss_without_id(tmp_path):
+    projection = Projection(str(tmp_path / 'profile.json'))
+    tracker = projection.get_tracker('products')
+    tracker.exclude = frozenset({'name'})
+
+    product = TrackedDict({'description': 'Long'}, tracker, fetch=lambda resource_id: {})
+
+    with pytest.raises(RunnerException) as cv:
+        product.get('name')
+
+    assert str(cv.value) == (
+        'Field name was excluded by the learned projection and cannot be fetched.'
+    )
+
+
+def test_async_client(mocked_responses, tmp_path):
+    path = tmp_path / 'profile.json'
+    path.write_text(json.dumps({'products': ['description']}))
+    _add_products(mocked_responses)
+    urls = []
+
+    def handler(request):
+        urls.append(str(request.url))
+        return httpx.Response(
+            200,
+            json=[{'id': PRODUCT['id'], 'name': 'Product'}],
+            headers={'Content-Range': 'items 0-0/1'},
+        )
+
+    async def fetch():
+        client = _client(AsyncConnectClient)
+        client._session.set(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        Projection(str(path)).install(client, _client())
+        return [product async for product in client.products.all()]
+
+    products = asyncio.run(fetch())
+
+    assert 'select(-description)' in urls[0]
+    assert products[0]['description'] == 'Long description'
+    assert not os.path.exists(path)
@@ -0,0 +1,580 @@
+import asyncio
+import csv
+import io
+import os
+import threading
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+import pytz
+from connect.reports.datamodels import Account, Report
+from connect.reports.renderers import (
+    CSVRenderer,
+    Jinja2Renderer,
+    JSONRenderer,
+    PDFRenderer,
+    XLSXRenderer,
+)
+from openpyxl import load_workbook
+
+from executor.exceptions import RunnerException
+from executor.renderers import (
+    XLSX_MAX_ROWS,
+    ArrowRenderer,
+    BatchCSVRenderer,
+    CachedJinja2Renderer,
+    CachedPDFRenderer,
+    MultiRenderer,
+    ParquetRenderer,
+    StreamingXLSXRenderer,
+    accumulates_rows,
+    check_row_shapes,
+    encode_csv_rows,
+    get_renderer,
+    get_renderer_class,
+)
+
+
+ROOT_DIR = './tests/fixtures/reports/report_spec_v2'
+
+
+def _core_renderer(cls):
+    return cls(
+        'test',
+        ROOT_DIR,
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {}),
+    )
+
+
+def _streaming_renderer(**args):
+    renderer = StreamingXLSXRenderer(
+        'test',
+        ROOT_DIR,
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {'param': 'value'}),
+        'super_report/template.xlsx',
+        {'start_row': 2, 'start_col': 1, 'streaming': True, **args},
+    )
+    renderer.start_time = datetime.now(tz=pytz.utc)
+    return renderer
+
+
+def _columnar_renderer(cls, **args):
+    return cls(
+        'test',
+        ROOT_DIR,
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {}),
+        None,
+        args,
+    )
+
+
+def _template_renderer(cls, template):
+    return cls(
+        'test',
+        ROOT_DIR,
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {}),
+        template,
+        {},
+    )
+
+
+@pytest.fixture
+def template_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_TEMPLATE_CACHE_DIR', str(tmp_path / 'templates'))
+    monkeypatch.setenv('COMMIT_ID', 'abcdef')
+    return tmp_path / 'templates' / 'abcdef'
+
+
+def test_get_renderer_class(monkeypatch):
+    monkeypatch.delenv('REPORTS_TEMPLATE_CACHE_DIR', raising=False)
+    assert get_renderer_class('xlsx', {'streaming': True}) is StreamingXLSXRenderer
+    assert get_renderer_class('xlsx', {}) is XLSXRenderer
+    assert get_renderer_class('csv', {}) is BatchCSVRenderer
+    assert get_renderer_class('json', {}) is JSONRenderer
+    assert get_renderer_class('parquet', {}) is ParquetRenderer
+    assert get_renderer_class('arrow', {}) is ArrowRenderer
+    assert get_renderer_class('jinja2', {}) is Jinja2Renderer
+    assert get_renderer_class('pdf', {}) is PDFRenderer
+
+
+def test_accumulates_rows():
+    streaming = _streaming_renderer()
+    json_renderer = _core_renderer(JSONRenderer)
+
+    assert accumulates_rows(json_renderer) is True
+    assert accumulates_rows(streaming) is False
+    assert accumulates_rows(_columnar_renderer(ParquetRenderer)) is False
+    assert accumulates_rows(MultiRenderer([('xlsx', streaming)])) is False
+    assert accumulates_rows(MultiRenderer([('xlsx', streaming), ('json', json_renderer)])) is True
+
+
+def test_get_renderer_class_template_cache(template_cache_dir):
+    assert get_renderer_class('jinja2', {}) is CachedJinja2Renderer
+    assert get_renderer_class('pdf', {}) is CachedPDFRenderer
+    assert get_renderer_class('json', {}) is JSONRenderer
+
+
+def test_cached_jinja2_renderer(template_cache_dir, tmp_path):
+    renderer = _template_renderer(
+        CachedJinja2Renderer, 'super_report/templates/template.html.j2',
+    )
+
+    report_file = renderer.generate_report([['a', 1]], str(tmp_path / 'report'))
+    second_file = renderer.generate_report([['b', 2]], str(tmp_path / 'second'))
+
+    assert report_file == str(tmp_path / 'report.html')
+    with open(second_file) as fp:
+        assert '<td>b</td><td>2</td>' in fp.read()
+    assert len(os.listdir(template_cache_dir / 'sync')) == 1
+
+
+def test_cached_jinja2_renderer_async(template_cache_dir, tmp_path):
+    renderer = _template_renderer(
+        CachedJinja2Renderer, 'super_report/templates/template.html.j2',
+    )
+
+    report_file = asyncio.run(
+        renderer.generate_report_async([['a', 1]], str(tmp_path / 'report')),
+    )
+
+    with open(report_file) as fp:
+        assert '<td>a</td><td>1</td>' in fp.read()
+    assert len(os.listdir(template_cache_dir / 'async')) == 1
+
+
+def test_cached_pdf_renderer(mocker, template_cache_dir, tmp_path):
+    html = mocker.patch('connect.reports.renderers.pdf.HTML')
+    renderer = _template_renderer(CachedPDFRenderer, 'super_report/templates/template.html.j2')
+
+    report_file = renderer.generate_report([['a', 1]], str(tmp_path / 'report'))
+
+    assert report_file == str(tmp_path / 'report.pdf')
+    assert html.call_args.kwargs['filename'] == str(tmp_path / 'report.pdf.html')
+    html.return_value.write_pdf.assert_called_once_with(report_file)
+    assert len(os.listdir(template_cache_dir / 'sync')) == 1
+
+
+def test_get_renderer():
+    renderer = get_renderer(
+        'xlsx',
+        'test',
+        ROOT_DIR,
+        Account('VA-000', 'Account'),
+        Report('report', 'Report', 'Description', {}),
+        'super_report/template.xlsx',
+        {'streaming': True},
+    )
+
+    assert isinstance(renderer, StreamingXLSXRenderer)
+    assert renderer.args == {'streaming': True}
+
+
+def test_streaming_xlsx_renderer(tmp_path):
+    renderer = _streaming_renderer(start_col=2)
+
+    def generate():
+        yield [1, 'a']
+        yield (2, 'b')
+
+    output_file = renderer.generate_report(generate(), str(tmp_path / 'report'))
+
+    wb = load_workbook(output_file)
+    assert wb.sheetnames == ['Data', 'Info']
+    assert [list(row) for row in wb['Data'].values] == [
+        ['Row', None, None],
+        [None, 1, 'a'],
+        [None, 2, 'b'],
+    ]
+    assert wb['Info']['A1'].value == 'Report Execution Information'
+    assert wb['Info']['B5'].value == 'Account'
+    assert 'A1:B1' in wb['Info'].merged_cells
+
+
+def test_streaming_xlsx_renderer_async(tmp_path):
+    renderer = _streaming_renderer()
+
+    async def generate():
+        yield [1]
+        yield [2]
+
+    output_file = asyncio.run(
+        renderer.generate_report_async(generate(), str(tmp_path / 'report')),
+    )
+
+    wb = load_workbook(output_file)
+    assert [list(row) for row in wb['Data'].values] == [['Row'], [1], [2]]
+
+
+def test_streaming_xlsx_renderer_row_limit_precheck(tmp_path):
+    renderer = _streaming_renderer()
+
+    with pytest.raises(ValueError) as e:
+        renderer.generate_report([[1]] * XLSX_MAX_ROWS, str(tmp_path / 'report'))
+
+    assert str(e.value) == (
+        'Row numbers must be between 1 and 1048576. Row number supplied was 1048577'
+    )
+    assert not os.listdir(tmp_path)
+
+
+def test_streaming_xlsx_renderer_row_limit(mocker, tmp_path):
+    mocker.patch('executor.renderers.XLSX_MAX_ROWS', 3)
+    renderer = _streaming_renderer()
+
+    with pytest.raises(ValueError) as e:
+        renderer.generate_report(iter([[1], [2], [3]]), str(tmp_path / 'report'))
+
+    assert 'Row number supplied was 4' in str(e.value)
+
+
+def test_streaming_xlsx_renderer_rollover(mocker, tmp_path):
+    mocker.patch('executor.renderers.XLSX_MAX_ROWS', 3)
+    renderer = _streaming_renderer(overflow='rollover')
+
+    output_file = renderer.generate_report(
+        [[1], [2], [3], [4], [5]],
+        str(tmp_path / 'report'),
+    )
+
+    wb = load_workbook(output_file)
+    assert wb.sheetnames == ['Data', 'Data (2)', 'Data (3)', 'Info']
+    assert [list(row) for row in wb['Data'].values] == [['Row'], [1], [2]]
+    assert [list(row) for row in wb['Data (2)'].values] == [['Row'], [3], [4]]
+    assert [list(row) for row in wb['Data (3)'].values] == [['Row'], [5]]
+
+
+def test_multi_renderer(tmp_path):
+    renderer = MultiRenderer(
+        [
+            ('csv_renderer', _core_renderer(CSVRenderer)),
+            ('json_renderer', _core_renderer(JSONRenderer)),
+        ],
+    )
+
+    def generate():
+        yield ['a', 1]
+        yield ['b', 2]
+
+    renderer.set_extra_context({'key': 'value'})
+    output_file = renderer.render(generate(), str(tmp_path / 'report'))
+
+    assert output_file == str(tmp_path / 'report.zip')
+    assert all(r.extra_context == {'key': 'value'} for _, r in renderer.renderers)
+    with zipfile.ZipFile(output_file) as repzip:
+        assert sorted(repzip.namelist()) == [
+            'csv_renderer/report.csv',
+            'csv_renderer/summary.json',
+            'json_renderer/report.json',
+            'json_renderer/summary.json',
+        ]
+        assert repzip.read('json_renderer/report.json') == b'[["a",1],["b",2]]'
+        assert repzip.read('csv_renderer/report.csv') == b'"a";"1"\r\n"b";"2"\r\n'
+
+
+def test_batch_csv_renderer_matches_core(tmp_path):
+    rows = [['a', 1], ('b;"quoted"', None), ['multi\nline', 2.5], [date(2023, 1, 2), 'ü\r']]
+
+    core_file = _core_renderer(CSVRenderer).generate_report(rows, str(tmp_path / 'core'))
+    batch_file = _core_renderer(BatchCSVRenderer).generate_report(
+        [rows[:2], rows[2:]],
+        str(tmp_path / 'batch'),
+    )
+
+    with open(core_file, 'rb') as core, open(batch_file, 'rb') as batch:
+        assert batch.read() == core.read()
+
+
+def test_encode_csv_rows():
+    rows = [
+        ['plain', 1, 2.5, True, None],
+        ('"quoted"', 'semi;colon', 'multi\r\nline', 'ünïcode', -0.0),
+        ['new\nline', 'carriage\rreturn', '""', 0.1 + 0.2, 1e22, float('nan')],
+        [date(2023, 1, 2), datetime(2023, 1, 2, 3, 4, 5, 6), Decimal('1.10'), 10 ** 20],
+        [datetime(2023, 1, 2, tzinfo=pytz.utc), {'a': 1}, ['b'], b'bytes'],
+        [],
+        [''],
+        [None],
+        iter(['from', 'iterator']),
+    ]
+    expected = io.StringIO()
+    csv.writer(expected, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL).writerows(
+        [list(row) for row in rows[:-1]] + [['from', 'iterator']],
+    )
+
+    assert encode_csv_rows(rows) == expected.getvalue()
+
+
+def test_batch_csv_renderer_async(tmp_path):
+    async def generate():
+        yield [['a', 1]]
+        yield [['b', 2]]
+
+    output_file = asyncio.run(
+        _core_renderer(BatchCSVRenderer).generate_report_async(
+            generate(), str(tmp_path / 'report'),
+        ),
+    )
+
+    with open(output_file, 'rb') as fp:
+        assert fp.read() == b'"a";"1"\r\n"b";"2"\r\n'
+
+
+def test_multi_renderer_batch_renderer(tmp_path):
+    renderer = MultiRenderer(
+        [
+            ('csv_renderer', _core_renderer(BatchCSVRenderer)),
+            ('json_renderer', _core_renderer(JSONRenderer)),
+        ],
+    )
+
+    output_file = renderer.render([['a', 1], ['b', 2]], str(tmp_path / 'report'))
+
+    with zipfile.ZipFile(output_file) as repzip:
+        assert repzip.read('csv_renderer/report.csv') == b'"a";"1"\r\n"b";"2"\r\n'
+
+
+def test_parquet_renderer(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    renderer = _columnar_renderer(
+        ParquetRenderer,
+        columns=['id', 'amount'],
+        types={'amount': 'float64'},
+        row_group_size=2,
+        compression='snappy',
+    )
+
+    output_file = renderer.generate_report(
+        [[('PR-001', 1), ('PR-002', 2)], [('PR-003', None)]],
+        str(tmp_path / 'report'),
+    )
+
+    assert output_file == str(tmp_path / 'report.parquet')
+    parquet_file = pq.ParquetFile(output_file)
+    assert parquet_file.metadata.num_row_groups == 2
+    assert parquet_file.metadata.row_group(0).column(0).compression == 'SNAPPY'
+    assert parquet_file.read().to_pylist() == [
+        {'id': 'PR-001', 'amount': 1.0},
+        {'id': 'PR-002', 'amount': 2.0},
+        {'id': 'PR-003', 'amount': None},
+    ]
+
+
+def test_parquet_renderer_empty(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    renderer = _columnar_renderer(ParquetRenderer, columns=['id'], types={'id': 'string'})
+
+    output_file = renderer.generate_report([], str(tmp_path / 'report'))
+
+    table = pq.read_table(output_file)
+    assert table.num_rows == 0
+    assert table.schema.names == ['id']
+
+
+def test_parquet_renderer_default_columns(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    renderer = _columnar_renderer(ParquetRenderer, columns=['id'])
+
+    output_file = renderer.generate_report([[('PR-001', 'pending')]], str(tmp_path / 'report'))
+
+    assert pq.read_table(output_file).to_pylist() == [{'id': 'PR-001', 'column_2': 'pending'}]
+
+
+def test_parquet_renderer_later_row_group_types(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    renderer = _columnar_renderer(
+        ParquetRenderer,
+        columns=['id', 'status', 'quantity'],
+        row_group_size=1,
+    )
+
+    output_file = renderer.generate_report(
+        [[('PR-001', None, 1)], [('PR-002', 'pending', 2.0)], [(3, None, None)]],
+        str(tmp_path / 'report'),
+    )
+
+    table = pq.read_table(output_file)
+    assert str(table.schema.field('status').type) == 'string'
+    assert table.to_pylist() == [
+        {'id': 'PR-001', 'status': None, 'quantity': 1},
+        {'id': 'PR-002', 'status': 'pending', 'quantity': 2},
+        {'id': '3', 'status': None, 'quantity': None},
+    ]
+
+
+def test_parquet_renderer_later_row_group_incompatible(tmp_path):
+    pytest.importorskip('pyarrow.parquet')
+    renderer = _columnar_renderer(ParquetRenderer, columns=['quantity'], row_group_size=1)
+
+    with pytest.raises(RunnerException) as cv:
+        renderer.generate_report([[(1,)], [(1.5,)]], str(tmp_path / 'report'))
+
+    assert 'Column quantity was written as int64' in str(cv.value)
+
+
+def test_arrow_renderer_async(tmp_path):
+    ipc = pytest.importorskip('pyarrow.ipc')
+
+    async def generate():
+        yield [('PR-001', 1)]
+        yield [('PR-002', 2)]
+
+    renderer = _columnar_renderer(ArrowRenderer, columns=['id', 'value'])
+
+    output_file = asyncio.run(renderer.generate_report_async(generate(), str(tmp_path / 'report')))
+
+    assert output_file == str(tmp_path / 'report.arrow')
+    with ipc.open_file(output_file) as reader:
+        assert reader.read_all().to_pydict() == {'id': ['PR-001', 'PR-002'], 'value': [1, 2]}
+
+
+def test_arrow_renderer_uncompressed(tmp_path):
+    ipc = pytest.importorskip('pyarrow.ipc')
+    renderer = _columnar_renderer(ArrowRenderer, compression='none')
+
+    output_file = renderer.generate_report([[(1,), (2,)]], str(tmp_path / 'report'))
+
+    with ipc.open_file(output_file) as reader:
+        assert reader.read_all().to_pydict() == {'column_1': [1, 2]}
+
+
+def test_columnar_renderer_without_pyarrow(mocker, tmp_path):
+    mocker.patch('executor.renderers.pyarrow', None)
+
+    with pytest.raises(RunnerException) as cv:
+        _columnar_renderer(ParquetRenderer).generate_report([], str(tmp_path / 'report'))
+
+    assert 'requires the pyarrow package' in str(cv.value)
+
+
+def test_multi_renderer_columnar(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    renderer = MultiRenderer(
+        [
+            ('parquet_renderer', _columnar_renderer(ParquetRenderer, columns=['id'])),
+            ('json_renderer', _core_renderer(JSONRenderer)),
+        ],
+    )
+
+    output_file = renderer.render([['a'], ['b']], str(tmp_path / 'report'))
+
+    with zipfile.ZipFile(output_file) as repzip:
+        repzip.extract('parquet_renderer/report.parquet', tmp_path)
+    table = pq.read_table(tmp_path / 'parquet_renderer' / 'report.parquet')
+    assert table.to_pylist() == [{'id': 'a'}, {'id': 'b'}]
+
+
+def test_multi_renderer_async(tmp_path):
+    renderer = MultiRenderer(
+        [
+            ('first', _core_renderer(JSONRenderer)),
+            ('second', _core_renderer(JSONRenderer)),
+        ],
+    )
+
+    async def generate():
+        yield [1]
+        yield [2]
+
+    output_file = asyncio.run(renderer.render_async(generate(), str(tmp_path / 'report')))
+
+    with zipfile.ZipFile(output_file) as repzip:
+        assert sorted(repzip.namelist()) == [
+            'first/report.json',
+            'first/summary.json',
+            'second/report.json',
+            'second/summary.json',
+        ]
+
+
+def test_multi_renderer_async_sync_data(tmp_path):
+    renderer = MultiRenderer([('first', _core_renderer(JSONRenderer))])
+
+    output_file = asyncio.run(renderer.render_async([[1]], str(tmp_path / 'report.zip')))
+
+    with zipfile.ZipFile(output_file) as repzip:
+        assert repzip.read('first/report.json') == b'[[1]]'
+
+
+def test_multi_renderer_async_does_not_block_loop(mocker, tmp_path):
+    mocker.patch('executor.renderers.TEE_QUEUE_SIZE', 1)
+    released = threading.Event()
+    slow = _core_renderer(JSONRenderer)
+    render = slow.render
+    waits = []
+
+    def slow_render(data, output_file, start_time=None):
+        waits.append(released.wait(5))
+        return render(data, output_file, start_time=start_time)
+
+    mocker.patch.object(slow, 'render', side_effect=slow_render)
+    renderer = MultiRenderer([('slow', slow)])
+
+    async def generate():
+        for idx in range(5):
+            yield [idx]
+
+    async def release():
+        await asyncio.sleep(0.05)
+        released.set()
+
+    async def run():
+        output_file, _ = await asyncio.gather(
+            renderer.render_async(generate(), str(tmp_path / 'report')),
+            release(),
+        )
+        return output_file
+
+    output_file = asyncio.run(run())
+
+    assert waits == [True]
+    with zipfile.ZipFile(output_file) as repzip:
+        assert repzip.read('slow/report.json') == b'[[0],[1],[2],[3],[4]]'
+
+
+def test_multi_renderer_error(mocker, tmp_path):
+    failing = _core_renderer(JSONRenderer)
+    mocker.patch.object(failing, 'render', side_effect=ValueError('render error'))
+    renderer = MultiRenderer(
+        [
+            ('csv_renderer', _core_renderer(CSVRenderer)),
+            ('json_renderer', failing),
+        ],
+    )
+
+    with pytest.raises(ValueError) as e:
+        renderer.render(iter([[1]] * 5000), str(tmp_path / 'report'))
+
+    assert str(e.value) == 'render error'
+
+
+@pytest.mark.parametrize(
+    'types',
+    (
+        ('xlsx',),
+        ('xlsx', 'csv', 'parquet', 'arrow'),
+        ('json', 'json'),
+    ),
+)
+def test_check_row_shapes(mocker, types):
+    definitions = [mocker.MagicMock(id=f'r{idx}', type=type_) for idx, type_ in enumerate(types)]
+
+    check_row_shapes(definitions)
+
+
+@pytest.mark.parametrize('types', (('csv', 'json'), ('pdf', 'jinja')))
+def test_check_row_shapes_mixed(mocker, types):
+    definitions = [mocker.MagicMock(id=f'r{idx}', type=type_) for idx, type_ in enumerate(types)]
+
+    with pytest.raises(RunnerException) as cv:
+        check_row_shapes(definitions)
+
+    assert str(cv.value) == (
+        f'Renderers r0 ({types[0]}) and r1 ({types[1]}) expect differently shaped rows '
+        'and cannot be combined in one execution.'
+    )
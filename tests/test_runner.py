@@ -1,7 +1,10 @@
 import logging
+import os
 
+import pytest
 from connect.client import ClientError
 
+from executor.outbox import Outbox
 from executor.runner import run_executor
 
 
@@ -79,3 +82,83 @@ def test_runner_exit_ko_fail_fail(mocker, mocked_env, caplog):
     )
     assert caplog.records[2].message.endswith(' to fail status: test error')
     fail_mock.assert_called_once()
+
+
+def test_runner_exit_ko_json_logging(mocker, mocked_env, monkeypatch, caplog):
+    monkeypatch.setenv('REPORTS_LOG_FORMAT', 'json')
+    mocker.patch('executor.runner.configure_logging')
+    mocker.patch('executor.runner.LOG_OUTPUT_TAIL', 5)
+    communicate_mock = mocker.MagicMock(
+        return_value=(
+            bytes('stdout', 'utf-8'),
+            bytes('some stack trace', 'utf-8'),
+        ),
+    )
+    mocker.patch(
+        'executor.runner.subprocess.Popen',
+        return_value=mocker.MagicMock(
+            communicate=communicate_mock,
+            returncode=127,
+        ),
+    )
+    mocker.patch('executor.runner.fail_report')
+
+    with caplog.at_level(logging.INFO):
+        run_executor()
+
+    assert caplog.records[1].message == 'Executor process has exited with 127.'
+    assert caplog.records[1].stdout == 'tdout'
+    assert caplog.records[1].stderr == 'trace'
+
+
+def test_runner_exit_ko_terminal_status_delivered(
+    mocker, mocked_env, mocked_responses, monkeypatch, tmp_path, caplog,
+):
+    monkeypatch.setenv('REPORTS_OUTBOX_DIR', str(tmp_path))
+    outbox = Outbox(str(tmp_path), 'REC-000-000-0000-000000')
+    outbox.add('fail', {'notes': 'error', 'block': False, 'traceback': ''})
+    mocked_responses.add(
+        'POST',
+        'https://localhost/public/v1/reporting/reports/REC-000-000-0000-000000/fail',
+        json={},
+    )
+    mocker.patch(
+        'executor.runner.subprocess.Popen',
+        return_value=mocker.MagicMock(
+            communicate=mocker.MagicMock(return_value=(b'stdout', b'stderr')),
+            returncode=1,
+        ),
+    )
+    fail_mock = mocker.patch('executor.runner.fail_report')
+
+    with caplog.at_level(logging.INFO):
+        run_executor()
+
+    assert caplog.records[1].message == (
+        'Delivered 1 pending actions of report REC-000-000-0000-000000.'
+    )
+    assert caplog.records[-1].message == (
+        'Report REC-000-000-0000-000000 has already been switched to a final status.'
+    )
+    fail_mock.assert_not_called()
+    assert not os.path.exists(outbox.directory)
+
+
+def test_runner_exit_reschedule(mocker, mocked_env, caplog):
+    mocker.patch(
+        'executor.runner.subprocess.Popen',
+        return_value=mocker.MagicMock(
+            communicate=mocker.MagicMock(return_value=(b'stdout', b'stderr')),
+            returncode=75,
+        ),
+    )
+    fail_mock = mocker.patch('executor.runner.fail_report')
+
+    with caplog.at_level(logging.INFO), pytest.raises(SystemExit) as cv:
+        run_executor()
+
+    assert cv.value.code == 75
+    assert caplog.records[-1].message == (
+        'Report REC-000-000-0000-000000 must be rescheduled on a larger resource class.'
+    )
+    fail_mock.assert_not_called()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+from executor.sort import (
+    ExternalSorter,
+    external_sort,
+    external_sort_async,
+    get_sort_buffer_size,
+)
+
+
+def test_get_sort_buffer_size(monkeypatch):
+    assert get_sort_buffer_size() == 100000
+    monkeypatch.setenv('REPORTS_SORT_BUFFER_SIZE', '10')
+    assert get_sort_buffer_size() == 10
+
+
+def test_external_sort_in_memory(tmp_path):
+    assert list(external_sort([3, 1, 2], directory=tmp_path)) == [1, 2, 3]
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_spills_runs(mocker, tmp_path):
+    mocker.patch('executor.sort.RUN_CHUNK_SIZE', 3)
+    rows = [(random.randint(0, 50), idx) for idx in range(1000)]
+
+    sorter = ExternalSorter(key=lambda row: row[0], buffer_size=100, directory=tmp_path)
+    sorter.extend(rows)
+
+    assert len(sorter.runs) == 10
+    assert len(os.listdir(tmp_path)) == 10
+    assert list(sorter.sorted()) == sorted(rows, key=lambda row: row[0])
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_reverse(tmp_path):
+    rows = list(range(25))
+    random.shuffle(rows)
+
+    assert list(external_sort(rows, reverse=True, buffer_size=7, directory=tmp_path)) == list(
+        range(24, -1, -1),
+    )
+
+
+def test_external_sort_spill_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_SPILL_DIR', str(tmp_path))
+
+    sorter = ExternalSorter(buffer_size=2)
+    sorter.extend([2, 1, 3])
+
+    assert os.listdir(tmp_path) == [os.path.basename(sorter.runs[0])]
+    sorter.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_partial_iteration(tmp_path):
+    rows = external_sort(range(10, 0, -1), buffer_size=3, directory=tmp_path)
+
+    assert next(rows) == 1
+    rows.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_error(tmp_path):
+    def generate():
+        yield from range(5)
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        external_sort(generate(), buffer_size=2, directory=tmp_path)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_async(tmp_path):
+    async def generate():
+        for row in (3, 1, 2, 5, 4):
+            yield row
+
+    async def collect(rows):
+        return [row async for row in external_sort_async(rows, buffer_size=2, directory=tmp_path)]
+
+    assert asyncio.run(collect(generate())) == [1, 2, 3, 4, 5]
+    assert asyncio.run(collect([2, 1])) == [1, 2]
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_async_error(tmp_path):
+    async def generate():
+        yield 2
+        yield 1
+        raise ValueError('boom')
+
+    async def collect():
+        rows = external_sort_async(generate(), buffer_size=1, directory=tmp_path)
+        return [row async for row in rows]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
+
+    assert os.listdir(tmp_path) == []
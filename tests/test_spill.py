@@ -0,0 +1,93 @@
+import asyncio
+import inspect
+import os
+import pickle
+import tempfile
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from executor.spill import (
+    RowStore,
+    get_spill_dir,
+    is_spill_enabled,
+    spill_rows,
+    spill_rows_async,
+)
+
+
+def test_get_spill_dir(monkeypatch):
+    monkeypatch.delenv('REPORTS_SPILL_DIR', raising=False)
+    assert get_spill_dir() == tempfile.gettempdir()
+
+    monkeypatch.setenv('REPORTS_SPILL_DIR', '/spill')
+    assert get_spill_dir() == '/spill'
+
+
+def test_is_spill_enabled(monkeypatch):
+    monkeypatch.delenv('REPORTS_SPILL_TO_DISK', raising=False)
+
+    assert is_spill_enabled(MagicMock(args=None)) is False
+    assert is_spill_enabled(MagicMock(args={'spill_to_disk': True})) is True
+
+    monkeypatch.setenv('REPORTS_SPILL_TO_DISK', '1')
+    assert is_spill_enabled(MagicMock(args={})) is True
+
+
+def test_row_store(tmp_path):
+    store = RowStore(str(tmp_path), batch_size=2)
+    store.extend([[1, 'a'], [2, 'b'], [3, datetime(2023, 1, 1)]])
+
+    assert len(store) == 3
+    assert list(store.rows()) == [[1, 'a'], [2, 'b'], [3, datetime(2023, 1, 1)]]
+    assert list(store.rows()) == [[1, 'a'], [2, 'b'], [3, datetime(2023, 1, 1)]]
+
+    store.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_rows(tmp_path):
+    rows = spill_rows([[1], [2]], str(tmp_path))
+
+    assert inspect.isgenerator(rows)
+    assert len(os.listdir(tmp_path)) == 1
+    assert list(rows) == [[1], [2]]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_rows_streamed(tmp_path):
+    def generate():
+        yield [1]
+
+    rows = generate()
+
+    assert spill_rows(rows, str(tmp_path)) is rows
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_rows_error(tmp_path):
+    with pytest.raises((pickle.PicklingError, AttributeError)):
+        spill_rows([[1], [lambda: None]], str(tmp_path))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_rows_async(tmp_path):
+    async def generate():
+        yield [1]
+        yield [2]
+
+    async def collect(data):
+        rows = await spill_rows_async(data, str(tmp_path))
+        assert inspect.isasyncgen(rows)
+        return [row async for row in rows]
+
+    async def streamed():
+        data = generate()
+        assert await spill_rows_async(data, str(tmp_path)) is data
+        return [row async for row in data]
+
+    assert asyncio.run(collect([[3], [4]])) == [[3], [4]]
+    assert asyncio.run(streamed()) == [[1], [2]]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,42 @@
+import os
+
+from executor.templates import get_bytecode_cache, get_template_cache_dir, warm_template_cache
+
+
+REPORTS_DIR = './tests/fixtures/reports/report_spec_v2'
+
+
+def test_get_template_cache_dir(monkeypatch):
+    monkeypatch.delenv('REPORTS_TEMPLATE_CACHE_DIR', raising=False)
+    assert get_template_cache_dir() is None
+    assert get_bytecode_cache() is None
+
+    monkeypatch.setenv('REPORTS_TEMPLATE_CACHE_DIR', '/cache')
+    monkeypatch.delenv('COMMIT_ID', raising=False)
+    assert get_template_cache_dir() == '/cache/default'
+
+    monkeypatch.setenv('COMMIT_ID', 'abcdef')
+    assert get_template_cache_dir() == '/cache/abcdef'
+
+
+def test_warm_template_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_TEMPLATE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('COMMIT_ID', 'abcdef')
+
+    assert warm_template_cache(REPORTS_DIR) == 1
+    assert len(os.listdir(tmp_path / 'abcdef' / 'sync')) == 1
+    assert len(os.listdir(tmp_path / 'abcdef' / 'async')) == 1
+
+
+def test_warm_template_cache_invalid_template(monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_TEMPLATE_CACHE_DIR', str(tmp_path / 'cache'))
+    (tmp_path / 'reports').mkdir()
+    (tmp_path / 'reports' / 'broken.html.j2').write_text('{% for %}')
+
+    assert warm_template_cache(str(tmp_path / 'reports')) == 0
+
+
+def test_warm_template_cache_disabled(monkeypatch):
+    monkeypatch.delenv('REPORTS_TEMPLATE_CACHE_DIR', raising=False)
+
+    assert warm_template_cache(REPORTS_DIR) == 0
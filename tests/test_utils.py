@@ -1,5 +1,6 @@
 import json
 import os
+import shutil
 import tempfile
 
 import pytest
@@ -10,6 +11,7 @@ from responses import matchers
 from executor.exceptions import RunnerException
 from executor.utils import (
     get_default_reports_dir,
+    get_definition_cache_file,
     get_report,
     get_report_definition,
     get_report_entrypoint,
@@ -18,6 +20,8 @@ from executor.utils import (
     get_user_agent,
     get_version,
     load_descriptor_file,
+    load_repository_definition,
+    store_repository_definition,
     upload_file,
 )
 
@@ -171,6 +175,20 @@ def test_load_descriptor_repo_validation_fail(mocker, mocked_reports_json_v2):
         assert 'Invalid `reports.json`' in str(error.value)
 
 
+def test_load_descriptor_runner_report_spec(mocked_reports_json_v2):
+    mocked_reports_json_v2['reports'][0]['report_spec'] = '3'
+
+    with tempfile.TemporaryDirectory() as tmp_data:
+        project_dir = f'{tmp_data}/project_dir'
+        shutil.copytree('./tests/fixtures/reports/report_spec_v2', project_dir)
+        with open(f'{project_dir}/reports.json', 'w') as fp:
+            json.dump(mocked_reports_json_v2, fp)
+
+        descriptor = load_descriptor_file(project_dir)
+
+    assert descriptor.reports[0].report_spec == '3'
+
+
 @pytest.mark.parametrize(
     ('set_env'),
     ('custom_path', ''),
@@ -218,3 +236,45 @@ def test_get_user_agent(mocker):
     expected_ua = 'connect-reports-runner/22.0 1/3.15 Linux/1.0 REC-000-000-0000-000000'
     os.environ['REPORT_ID'] = 'REC-000-000-0000-000000'
     assert get_user_agent() == {'User-Agent': expected_ua}
+
+
+def test_load_repository_definition_cached(mocker, monkeypatch, tmp_path):
+    root_path = './tests/fixtures/reports/report_spec_v2'
+    monkeypatch.setenv('REPORTS_DEFINITION_CACHE_DIR', str(tmp_path))
+    repository_definition = load_descriptor_file(root_path)
+
+    cache_file = store_repository_definition(root_path, repository_definition)
+    load_descriptor = mocker.patch('executor.utils.load_descriptor_file')
+
+    assert os.path.dirname(cache_file) == str(tmp_path)
+    cached = load_repository_definition(root_path)
+    assert cached.reports[0].entrypoint == repository_definition.reports[0].entrypoint
+    load_descriptor.assert_not_called()
+
+    with open(cache_file, 'wb') as fp:
+        fp.write(b'')
+    assert load_repository_definition(root_path) == load_descriptor.return_value
+
+    # Pickles referencing classes that no longer exist fail with errors other than unpickling.
+    with open(cache_file, 'wb') as fp:
+        fp.write(b'cconnect.reports.datamodels\nMissingClass\n.')
+    assert load_repository_definition(root_path) == load_descriptor.return_value
+
+
+def test_get_definition_cache_file_version(mocker, monkeypatch, tmp_path):
+    root_path = './tests/fixtures/reports/report_spec_v2'
+    monkeypatch.setenv('REPORTS_DEFINITION_CACHE_DIR', str(tmp_path))
+    mocker.patch('executor.utils.get_version', return_value='1.0.0')
+    cache_file = get_definition_cache_file(root_path)
+
+    mocker.patch('executor.utils.get_version', return_value='1.1.0')
+
+    assert get_definition_cache_file(root_path) != cache_file
+
+
+def test_load_repository_definition_no_cache(mocker, monkeypatch):
+    monkeypatch.delenv('REPORTS_DEFINITION_CACHE_DIR', raising=False)
+    load_descriptor = mocker.patch('executor.utils.load_descriptor_file')
+
+    assert store_repository_definition('/reports', None) is None
+    assert load_repository_definition('/reports') == load_descriptor.return_value
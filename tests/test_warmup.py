@@ -0,0 +1,41 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+from executor.utils import load_repository_definition
+from executor.warmup import resolve_entrypoints, warm_up
+
+
+def test_warm_up(monkeypatch, tmp_path):
+    reports_dir = str(tmp_path / 'reports')
+    shutil.copytree('./tests/fixtures/reports/report_spec_v2', reports_dir)
+    monkeypatch.setenv('REPORTS_DEFINITION_CACHE_DIR', str(tmp_path / 'definitions'))
+    monkeypatch.setenv('REPORTS_TEMPLATE_CACHE_DIR', str(tmp_path / 'templates'))
+    monkeypatch.syspath_prepend(reports_dir)
+
+    assert warm_up(reports_dir) == {}
+
+    assert os.listdir(os.path.join(reports_dir, 'super_report', '__pycache__'))
+    assert len(os.listdir(tmp_path / 'definitions')) == 1
+    assert os.listdir(tmp_path / 'templates')
+    definition = load_repository_definition(reports_dir)
+    assert definition.reports[0].entrypoint == 'super_report.entrypoint_v2.generate'
+
+
+def test_resolve_entrypoints_errors(tmp_path):
+    repository_definition = SimpleNamespace(
+        reports=[
+            SimpleNamespace(entrypoint='super_report.entrypoint_v2.generate'),
+            SimpleNamespace(entrypoint='missing_report.entrypoint.generate'),
+            SimpleNamespace(entrypoint='super_report.entrypoint_v2.missing'),
+        ],
+    )
+
+    errors = resolve_entrypoints(repository_definition, './tests/fixtures/reports/report_spec_v2')
+
+    assert list(errors) == [
+        'missing_report.entrypoint.generate',
+        'super_report.entrypoint_v2.missing',
+    ]
+    assert isinstance(errors['missing_report.entrypoint.generate'], ImportError)
+    assert isinstance(errors['super_report.entrypoint_v2.missing'], AttributeError)